@@ -0,0 +1,208 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import asyncio
+import time
+from typing import Any, Optional, Tuple
+
+from .gstreamer.exception import ConnectionLostError, PipelineBuildError
+from .gstreamer.stream import GstStreamBuilder, InternalMessage, InternalMessageKind, _GstStream
+from .restart_handler import Restart, RestartAction, RestartHandlerBase, Stop
+
+__all__ = [
+    "AsyncGstreamerCapture",
+]
+
+
+class AsyncGstreamerCapture:
+    _builder: GstStreamBuilder
+    _restart_handler: RestartHandlerBase
+    _connection_lost_threshold: Optional[float]
+    _loop: Optional[asyncio.AbstractEventLoop]
+    _queue: "Optional[asyncio.Queue[Tuple[int, InternalMessage]]]"
+    _stream: Optional[_GstStream]
+    # Incremented on every (re)start.  Notifications from older pipelines are ignored.
+    _generation: int
+    _last_sample: float
+    _first_frame_pending: bool
+    _closed: bool
+
+    def __init__(self, builder: GstStreamBuilder, restart_handler: RestartHandlerBase):
+        """
+        asyncio counterpart of :class:`~GstreamerCapture`: an async context manager and async iterator of outputs of
+        `ConverterBase` in `builder`.
+
+        ```
+        async with AsyncGstreamerCapture(builder, restart_handler) as capture:
+            async for frame in capture:
+                ...
+        ```
+
+        `new-sample` signals and bus messages are forwarded to the event loop by `call_soon_threadsafe()`, so no
+        thread blocks for each stream.  Samples are pulled and converted on the event loop.  Starting and stopping
+        pipelines, which may block, run in the default executor.
+
+        Errors are handled by `restart_handler` as :class:`~GstreamerCapture` does.  Iteration ends when it says
+        :class:`~Stop`, and errors raised by it are propagated.  If the pipeline is finite (see
+        :meth:`~PipelineGenerator.is_finite`), iteration also ends at EOS without restarting.
+
+        `mode` of `builder` is ignored.
+
+        args:
+            - builder: :class:`~GstStreamBuilder`
+            - restart_handler: :class:`~RestartHandlerBase`
+        """
+
+        assert isinstance(
+            builder, GstStreamBuilder
+        ), f"builder should be instance of GstStreamBuilder, but got: {type(builder)}"
+        assert isinstance(
+            restart_handler, RestartHandlerBase
+        ), f"restart_handler should be instance of RestartHandler, but got: {type(restart_handler)}"
+
+        self._builder = builder
+        self._restart_handler = restart_handler
+        self._connection_lost_threshold = restart_handler.connection_lost_secs_threshold()
+        self._loop = None
+        self._queue = None
+        self._stream = None
+        self._generation = 0
+        self._last_sample = 0.0
+        self._first_frame_pending = False
+        self._closed = False
+
+    async def __aenter__(self) -> "AsyncGstreamerCapture":
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self._closed = False
+        await self._start()
+        return self
+
+    async def __aexit__(self, _ex_type: Any, _ex_value: Any, _trace: Any) -> bool:
+        self._closed = True
+        await self._close_stream()
+        return False
+
+    def __aiter__(self) -> "AsyncGstreamerCapture":
+        return self
+
+    # Here, Any = ConverterBase::ConvertResult.
+    async def __anext__(self) -> Any:
+        assert self._queue is not None, "use AsyncGstreamerCapture in `async with`"
+
+        while not self._closed:
+            if self._stream is None:
+                await self._start()
+                continue
+
+            try:
+                value = await self._next_value()
+            except ConnectionLostError as e:
+                logger.debug(e)
+                await self._close_stream()
+                await self._handle_action(lambda e=e: self._restart_handler.connection_lost(e))
+                continue
+
+            if value is not None:
+                if self._first_frame_pending:
+                    self._first_frame_pending = False
+                    self._restart_handler.streaming_started()
+                return value
+
+        raise StopAsyncIteration()
+
+    async def _next_value(self) -> Optional[Any]:
+        """
+        Wait for a notification of the current stream and handle it.  Returns `None` if it gave no frame.
+
+        exceptions:
+            - :class:`~ConnectionLostError`
+        """
+
+        assert self._queue is not None
+        assert self._stream is not None
+
+        timeout = None
+        if self._connection_lost_threshold is not None:
+            timeout = self._connection_lost_threshold - (time.monotonic() - self._last_sample)
+            if timeout <= 0:
+                raise ConnectionLostError("no frames")
+
+        try:
+            # Waiting here means the consumer wants frames: demand for the decode gate.
+            with self._stream._demand():
+                generation, im = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            raise ConnectionLostError("no frames")
+        if generation != self._generation:
+            return None
+
+        try:
+            if im.kind == InternalMessageKind.FROM_NEW_SAMPLE:
+                value = self._stream.capture(timeout_secs=0)
+                if value is not None:
+                    self._last_sample = time.monotonic()
+                return value
+            elif im.kind == InternalMessageKind.FROM_MESSAGE:
+                self._stream._handle_message(im.payload)
+                if not self._stream.is_running():
+                    if self._builder.is_finite():
+                        # EOS, i.e., completion.  Iteration ends without restarting.
+                        self._closed = True
+                        return None
+                    raise ConnectionLostError("EOS")
+                return None
+            else:
+                raise RuntimeError("unreachable")
+        except ConnectionLostError:
+            raise
+        except Exception as e:
+            # Errors from the pipeline, e.g., bus ERROR.
+            raise ConnectionLostError(e) from e
+
+    async def _start(self) -> None:
+        assert self._loop is not None
+
+        while not self._closed:
+            self._generation += 1
+            notify = lambda im, generation=self._generation: self._loop.call_soon_threadsafe(  # type: ignore  # noqa E731
+                self._queue.put_nowait, (generation, im)  # type: ignore
+            )
+            try:
+                stream = self._builder._start_streaming_dispatched(notify)
+                await self._loop.run_in_executor(None, stream.__enter__)
+            except PipelineBuildError as e:
+                logger.debug(e)
+
+                await self._handle_action(lambda e=e: self._restart_handler.pipeline_build_error(e))
+                continue
+
+            self._stream = stream
+            self._last_sample = time.monotonic()
+            self._first_frame_pending = True
+            return
+
+    async def _handle_action(self, f: Any) -> None:
+        """
+        Ask restart handler by `f` and close unless :class:`~Restart`.  Errors raised by `f` are propagated.
+        """
+
+        action: RestartAction = f()
+        if isinstance(action, Stop):
+            self._closed = True
+        elif isinstance(action, Restart):
+            if action.delay_secs > 0:
+                await asyncio.sleep(action.delay_secs)
+        else:
+            raise RuntimeError("unreachable")
+
+    async def _close_stream(self) -> None:
+        stream = self._stream
+        self._stream = None
+        if stream is not None:
+            assert self._loop is not None
+            await self._loop.run_in_executor(None, stream.__exit__, None, None, None)
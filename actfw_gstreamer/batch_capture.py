@@ -0,0 +1,233 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import contextlib
+import time
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from actfw_core.task import Producer
+
+from .capture import _run_with_restart
+from .gstreamer.converter import NumPyFrame
+from .gstreamer.exception import ConnectionLostError
+from .gstreamer.frame import FrameEnvelope, LazyFrame
+from .gstreamer.stream import GstStreamBuilder, _GstStream, start_streaming_concurrently
+from .restart_handler import RestartHandlerBase
+from .util import _get_gst
+
+__all__ = [
+    "Batch",
+    "GstreamerBatchCapture",
+]
+
+
+# If there are several streams and none of them has a frame, wait for one of them this seconds before polling others.
+_POLL_SLICE_SECS = 0.005
+
+
+class Batch(NamedTuple):
+    """
+    A batch of frames generated by :class:`~GstreamerBatchCapture`.
+
+    `frames` is a C-contiguous array of shape `(n, height, width, channels)` with `1 <= n <= batch_size`.
+    The other fields are lists of length `n`, where the i-th element describes `frames[i]`.
+    """
+
+    frames: np.ndarray  # type: ignore
+    # Buffer PTS in nanoseconds, `None` if the buffer has no PTS.
+    pts: List[Optional[int]]
+    # `time.monotonic()` when the frame was captured.
+    capture_times: List[float]
+    # Index of `builders` given to :class:`~GstreamerBatchCapture`.
+    source_ids: List[int]
+
+    def size(self) -> int:
+        return len(self.source_ids)
+
+
+class GstreamerBatchCapture(Producer[Batch]):
+    _Gst: "Gst"  # type: ignore  # noqa F821
+    _builders: List[GstStreamBuilder]
+    _restart_handler: RestartHandlerBase
+    _batch_size: int
+    _max_wait_secs: float
+    _next_source: int
+
+    def __init__(
+        self,
+        builders: Union[GstStreamBuilder, Sequence[GstStreamBuilder]],
+        restart_handler: RestartHandlerBase,
+        batch_size: int,
+        max_wait_secs: float,
+    ):
+        """
+        Captured Frame Producer using GStreamer, which generates :class:`~Batch`es for batched inference.
+
+        Collects up to `batch_size` frames from `builders` into a preallocated array.  A batch is emitted when it is
+        full or `max_wait_secs` passed since its first frame, so the latency of a frame is bounded even if frames
+        arrive slowly.
+
+        Converters of `builders` should generate :class:`~NumPyFrame` (e.g. :class:`~ConverterNumPy`) or
+        `numpy.ndarray`, optionally in :class:`~FrameEnvelope` or :class:`~LazyFrame`, and all streams should have
+        the same shape and format.  Frames are copied once into the batch and released immediately.
+
+        If any of streams fails, all streams are restarted according to `restart_handler`.  Use
+        :class:`~GstreamerMultiCapture` if you need per-stream restarts.
+
+        args:
+            - builders: :class:`~GstStreamBuilder` or a sequence of them
+            - restart_handler: :class:`~RestartHandlerBase`
+            - batch_size: `int`, maximum number of frames in a batch
+            - max_wait_secs: `float`, maximum seconds to wait for a batch to be full
+        """
+
+        if isinstance(builders, GstStreamBuilder):
+            builders = [builders]
+        builders = list(builders)
+
+        assert len(builders) > 0, "builders should not be empty"
+        for builder in builders:
+            assert isinstance(
+                builder, GstStreamBuilder
+            ), f"builder should be instance of GstStreamBuilder, but got: {type(builder)}"
+        assert isinstance(
+            restart_handler, RestartHandlerBase
+        ), f"restart_handler should be instance of RestartHandler, but got: {type(restart_handler)}"
+        assert batch_size > 0, f"batch_size should be positive, but got: {batch_size}"
+        assert max_wait_secs >= 0, f"max_wait_secs should be non-negative, but got: {max_wait_secs}"
+
+        super().__init__()
+
+        self._Gst = _get_gst()
+        self._builders = builders
+        self._restart_handler = restart_handler
+        self._batch_size = batch_size
+        self._max_wait_secs = max_wait_secs
+        self._next_source = 0
+
+    def run(self) -> None:
+        try:
+            _run_with_restart(self._restart_handler, self._loop, is_running=self._is_running)
+        finally:
+            self.stop()
+
+    def _loop(self, connection_lost_threshold: Optional[float]) -> None:
+        with contextlib.ExitStack() as stack:
+            streams = start_streaming_concurrently(self._builders)
+            for stream in streams:
+                stack.callback(stream.__exit__, None, None, None)
+            last_sample = [time.monotonic()] * len(streams)
+            first_batch = True
+            while self._is_running():
+                for stream in streams:
+                    if not stream.is_running():
+                        raise ConnectionLostError()
+
+                if connection_lost_threshold is not None:
+                    now = time.monotonic()
+                    for i, t in enumerate(last_sample):
+                        if (now - t) > connection_lost_threshold:
+                            raise ConnectionLostError(f"no frames from source {i} for {now - t:.1f} secs")
+
+                batch = self._collect(streams, last_sample)
+                if batch is not None:
+                    if first_batch:
+                        first_batch = False
+                        self._restart_handler.streaming_started()
+                    self._outlet(batch)
+
+    def _collect(self, streams: List[_GstStream], last_sample: List[float]) -> Optional[Batch]:
+        """
+        Collect a batch.  Returns `None` if no frames arrived within a second.
+        """
+
+        frames: Optional[np.ndarray] = None  # type: ignore
+        pts: List[Optional[int]] = []
+        capture_times: List[float] = []
+        source_ids: List[int] = []
+        deadline = time.monotonic() + 1.0
+
+        while self._is_running() and len(source_ids) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            got = self._capture_any(streams, remaining)
+            if got is None:
+                continue
+            source_id, value = got
+
+            now = time.monotonic()
+            last_sample[source_id] = now
+            if frames is None:
+                deadline = now + self._max_wait_secs
+
+            with _as_array(value) as (array, pts_):
+                if frames is None:
+                    frames = np.empty((self._batch_size, *array.shape), dtype=array.dtype)
+                elif frames.shape[1:] != array.shape:
+                    raise ValueError(
+                        f"all frames in a batch should have the same shape: {frames.shape[1:]} != {array.shape}"
+                        f" (source {source_id})"
+                    )
+                np.copyto(frames[len(source_ids)], array)
+            pts.append(None if pts_ == self._Gst.CLOCK_TIME_NONE else pts_)
+            capture_times.append(now)
+            source_ids.append(source_id)
+
+        if frames is None:
+            return None
+        else:
+            return Batch(frames[: len(source_ids)], pts, capture_times, source_ids)
+
+    def _capture_any(self, streams: List[_GstStream], timeout_secs: float) -> Optional[Tuple[int, Any]]:
+        """
+        Capture a frame from one of `streams`, visiting them round-robin.
+        """
+
+        n = len(streams)
+        if n == 1:
+            value = streams[0].capture(timeout_secs=min(timeout_secs, 1.0))
+            return None if value is None else (0, value)
+
+        # Do not wait if someone has a frame.
+        for _ in range(n):
+            i = self._next_source
+            self._next_source = (i + 1) % n
+            value = streams[i].capture(timeout_secs=0)
+            if value is not None:
+                return (i, value)
+
+        i = self._next_source
+        self._next_source = (i + 1) % n
+        value = streams[i].capture(timeout_secs=min(timeout_secs, _POLL_SLICE_SECS))
+        return None if value is None else (i, value)
+
+
+@contextlib.contextmanager
+def _as_array(value: Any):  # type: ignore
+    """
+    Yields `(array, pts)` of a converted frame and releases the frame after use.
+    """
+
+    if isinstance(value, FrameEnvelope):
+        with _as_array(value.value) as (array, _):
+            yield (array, value.meta.pts)
+    elif isinstance(value, LazyFrame):
+        try:
+            with _as_array(value.value) as (array, pts):
+                yield (array, value.sample.get_buffer().pts if pts is None else pts)
+        finally:
+            value.release()
+    elif isinstance(value, NumPyFrame):
+        with value:
+            yield (value.array, value.sample.get_buffer().pts)
+    elif isinstance(value, np.ndarray):
+        yield (value, None)
+    else:
+        raise TypeError(f"converter should generate NumPyFrame or numpy.ndarray, but got: {type(value)}")
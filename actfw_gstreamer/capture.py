@@ -6,33 +6,71 @@ if True:
     logger.addHandler(_logging.NullHandler())
 
 import time
-from typing import Optional
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
 
 from actfw_core.task import Producer
 from PIL.Image import Image as PIL_Image
 
 from .gstreamer.exception import ConnectionLostError, PipelineBuildError
-from .gstreamer.stream import GstStreamBuilder
+from .gstreamer.stream import GstStreamBuilder, WarmRestart, _GstStream
 from .restart_handler import Restart, RestartHandlerBase, Stop
+from .stats import StreamStats
 
 __all__ = [
+    "RestartTiming",
     "GstreamerCapture",
+    "GstreamerBranchCapture",
 ]
 
 
+# Interval to wait for the stream of the parent capture to (re)start.
+_BRANCH_WAIT_SECS = 0.1
+# Interval to check stop while waiting `Restart.delay_secs`.
+_RESTART_DELAY_SLICE_SECS = 0.1
+
+
+class RestartTiming(NamedTuple):
+    """
+    Time to the first frame after a restart of :class:`~GstreamerCapture`.
+    """
+
+    # `None` means a cold restart, i.e., the pipeline is rebuilt.
+    warm_restart: Optional[WarmRestart]
+    time_to_first_frame_secs: float
+
+
 class GstreamerCapture(Producer[PIL_Image]):
     _builder: GstStreamBuilder
     _restart_handler: RestartHandlerBase
+    _warm_restart: Optional[WarmRestart]
+    _stream: Optional[_GstStream]
+    _restart_pending: bool
+    _restart_started: Optional[Tuple[Optional[WarmRestart], float]]
+    _last_restart_timing: Optional[RestartTiming]
+    # Whether :meth:`~RestartHandlerBase.streaming_started` should be called on the next frame.
+    _first_frame_pending: bool
+    _stats: StreamStats
 
-    def __init__(self, builder: GstStreamBuilder, restart_handler: RestartHandlerBase):
+    def __init__(
+        self,
+        builder: GstStreamBuilder,
+        restart_handler: RestartHandlerBase,
+        warm_restart: Optional[WarmRestart] = None,
+    ):
         """
         Captured Frame Producer using GStreamer.
 
         Genrates `Frame`s of given `GonverterBase::ConvertResult`, where `ConverterBase` is in `builder`.
 
+        If the pipeline is finite (see :meth:`~PipelineGenerator.is_finite`), e.g., `preconfigured_pipeline.file()`,
+        this stops at EOS without restarting.
+
         args:
             - builder: :class:`~GstStreamBuilder`
             - restart_handler: :class:`~RestartHandlerBase`
+            - warm_restart: :class:`~WarmRestart`, optional.  If given, restarts on :class:`~ConnectionLostError`
+              reuse the running pipeline instead of rebuilding it.  It falls back to rebuilding if a warm restart
+              fails.  Restarts on :class:`~PipelineBuildError` always rebuild the pipeline.
         """
 
         assert isinstance(
@@ -41,59 +79,242 @@ class GstreamerCapture(Producer[PIL_Image]):
         assert isinstance(
             restart_handler, RestartHandlerBase
         ), f"restart_handler should be instance of RestartHandler, but got: {type(restart_handler)}"
+        assert (warm_restart is None) or isinstance(
+            warm_restart, WarmRestart
+        ), f"warm_restart should be instance of WarmRestart, but got: {type(warm_restart)}"
 
         super().__init__()
 
         self._builder = builder
         self._restart_handler = restart_handler
+        self._warm_restart = warm_restart
+        self._stream = None
+        self._restart_pending = False
+        self._restart_started = None
+        self._last_restart_timing = None
+        self._first_frame_pending = False
+        self._stats = StreamStats()
 
-    def run(self) -> None:
-        connection_lost_threshold = self._restart_handler.connection_lost_secs_threshold()
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of statistics, e.g., delivered fps, drops, time spent in conversion and restarts.
+        Can be called from any thread.  See :meth:`~StreamStats.snapshot` for the format.
+        """
+
+        return self._stats.snapshot()
+
+    def last_restart_timing(self) -> Optional[RestartTiming]:
+        """
+        Time to the first frame after the last restart.  `None` if not restarted yet or no frame after restart yet.
+        """
+
+        return self._last_restart_timing
+
+    def branch(self, name: str) -> "GstreamerBranchCapture":
+        """
+        Make a Producer of frames of a non-primary branch `name` of the pipeline.  See :meth:`~PipelineBuilder.tee`.
+
+        Frames of the primary branch are generated by this.  The returned task should be registered to the
+        application as well.
+        """
+
+        return GstreamerBranchCapture(self, name)
 
+    def run(self) -> None:
         try:
-            while True:
-                try:
-                    self._loop(connection_lost_threshold)
-                except PipelineBuildError as e:
-                    logger.debug(e)
-
-                    action = self._restart_handler.pipeline_build_error(e)
-                    if isinstance(action, Stop):
-                        return None
-                    elif isinstance(action, Restart):
-                        continue
-                    else:
-                        raise RuntimeError("unreachable")
-                except ConnectionLostError as e:
-                    logger.debug(e)
-
-                    action = self._restart_handler.connection_lost(e)
-                    if isinstance(action, Stop):
-                        return None
-                    elif isinstance(action, Restart):
-                        continue
-                    else:
-                        raise RuntimeError("unreachable")
-
-                break
+            _run_with_restart(self._restart_handler, self._loop, self._stats, self._is_running)
         finally:
+            self._close_stream()
             self.stop()
 
     def _loop(self, connection_lost_threshold: Optional[float]) -> None:
+        try:
+            stream = self._prepare_stream()
+            self._capture_loop(stream, connection_lost_threshold)
+        except ConnectionLostError:
+            self._restart_pending = True
+            if (self._warm_restart is None) or (self._stream is None) or (not self._stream.is_running()):
+                self._close_stream()
+            raise
+        except BaseException:
+            self._restart_pending = True
+            self._close_stream()
+            raise
+        else:
+            self._close_stream()
+
+    def _prepare_stream(self) -> _GstStream:
+        """
+        exceptions:
+            - :class:`~PipelineBuildError`
+        """
+
+        restarting = self._restart_pending
+        self._restart_pending = False
+        self._first_frame_pending = True
+
+        if self._stream is not None:
+            assert self._warm_restart is not None
+            started = time.monotonic()
+            res = self._stream.warm_restart(self._warm_restart)
+            if res.is_ok():
+                self._restart_started = (self._warm_restart, started)
+                return self._stream
+            logger.info(f"warm restart failed, rebuilding pipeline: {res.unwrap_err()}")
+            self._close_stream()
+            self._restart_started = (None, started)
+        elif restarting:
+            self._restart_started = (None, time.monotonic())
+
+        stream = self._builder.start_streaming(stats=self._stats)
+        stream.__enter__()
+        self._stream = stream
+        return stream
+
+    def _close_stream(self) -> None:
+        stream = self._stream
+        self._stream = None
+        if stream is not None:
+            stream.__exit__(None, None, None)
+
+    def _capture_loop(self, stream: _GstStream, connection_lost_threshold: Optional[float]) -> None:
         no_sample_start: Optional[float] = None
-        with self._builder.start_streaming() as stream:
-            while self._is_running():
-                if not stream.is_running():
+        while self._is_running():
+            if not stream.is_running():
+                if self._builder.is_finite():
+                    # EOS, i.e., completion.
+                    return
+                raise ConnectionLostError()
+
+            if (connection_lost_threshold is not None) and (no_sample_start is not None):
+                if (time.time() - no_sample_start) > connection_lost_threshold:
                     raise ConnectionLostError()
 
-                if (connection_lost_threshold is not None) and (no_sample_start is not None):
-                    if (time.time() - no_sample_start) > connection_lost_threshold:
-                        raise ConnectionLostError()
+            value = stream.capture(timeout_secs=1)
+            if value is None:
+                if no_sample_start is None:
+                    no_sample_start = time.time()
+            else:
+                no_sample_start = None
+                if self._restart_started is not None:
+                    self._record_restart_timing()
+                if self._first_frame_pending:
+                    self._first_frame_pending = False
+                    self._restart_handler.streaming_started()
+                self._outlet(value)
 
-                value = stream.capture(timeout_secs=1)
-                if value is None:
-                    if no_sample_start is None:
-                        no_sample_start = time.time()
-                else:
-                    no_sample_start = None
+    def _record_restart_timing(self) -> None:
+        assert self._restart_started is not None
+        warm_restart, started = self._restart_started
+        self._restart_started = None
+        timing = RestartTiming(warm_restart, time.monotonic() - started)
+        self._last_restart_timing = timing
+        self._stats.record_restart_ttff(timing.time_to_first_frame_secs)
+        kind = "cold" if warm_restart is None else warm_restart.name
+        logger.info(f"restarted ({kind}): first frame in {timing.time_to_first_frame_secs:.3f} secs")
+
+
+class GstreamerBranchCapture(Producer[Any]):
+    _parent: GstreamerCapture
+    _name: str
+
+    def __init__(self, parent: GstreamerCapture, name: str):
+        """
+        Captured Frame Producer of a branch of the pipeline of :class:`~GstreamerCapture`.  Use
+        :meth:`~GstreamerCapture.branch` to make an instance.
+
+        Pipelines and restarts are owned by `parent`, and this follows them: frames are generated while the stream of
+        `parent` is running.  This stops when `parent` stops.
+
+        args:
+            - parent: :class:`~GstreamerCapture`
+            - name: `str`, name of branch
+        """
+
+        assert isinstance(parent, GstreamerCapture), f"parent should be instance of GstreamerCapture, but got: {type(parent)}"
+        branch_names = parent._builder.branch_names()
+        assert name in branch_names, f"unknown branch: {name}, branches are: {branch_names}"
+        assert name != branch_names[0], f"branch {name} is the primary stream, which is generated by parent"
+
+        super().__init__()
+
+        self._parent = parent
+        self._name = name
+
+    def run(self) -> None:
+        try:
+            while self._is_running() and self._parent._is_running():
+                stream = self._parent._stream
+                if (stream is None) or (not stream.is_running()):
+                    time.sleep(_BRANCH_WAIT_SECS)
+                    continue
+
+                # Stopping the pipeline flushes `appsink`, which wakes this up.
+                value = stream.capture_branch(self._name, timeout_secs=1)
+                if value is not None:
                     self._outlet(value)
+        finally:
+            self.stop()
+
+
+def _run_with_restart(
+    restart_handler: RestartHandlerBase,
+    loop: Callable[[Optional[float]], None],
+    stats: Optional[StreamStats] = None,
+    is_running: Callable[[], bool] = lambda: True,
+) -> None:
+    """
+    Call `loop(connection_lost_secs_threshold)` until it returns normally or `restart_handler` says :class:`~Stop`.
+    Waits `Restart.delay_secs` before restarting, and returns if `is_running()` becomes false meanwhile.
+    """
+
+    connection_lost_threshold = restart_handler.connection_lost_secs_threshold()
+
+    while True:
+        try:
+            loop(connection_lost_threshold)
+        except PipelineBuildError as e:
+            logger.debug(e)
+
+            action = restart_handler.pipeline_build_error(e)
+            if isinstance(action, Stop):
+                return None
+            elif isinstance(action, Restart):
+                if stats is not None:
+                    stats.record_restart("pipeline_build_error")
+                if not _wait_restart_delay(action.delay_secs, is_running):
+                    return None
+                continue
+            else:
+                raise RuntimeError("unreachable")
+        except ConnectionLostError as e:
+            logger.debug(e)
+
+            action = restart_handler.connection_lost(e)
+            if isinstance(action, Stop):
+                return None
+            elif isinstance(action, Restart):
+                if stats is not None:
+                    stats.record_restart("connection_lost")
+                if not _wait_restart_delay(action.delay_secs, is_running):
+                    return None
+                continue
+            else:
+                raise RuntimeError("unreachable")
+
+        break
+
+
+def _wait_restart_delay(delay_secs: float, is_running: Callable[[], bool]) -> bool:
+    """
+    Sleep `delay_secs` in slices.  Returns `False` if `is_running()` became false.
+    """
+
+    deadline = time.monotonic() + delay_secs
+    while True:
+        if not is_running():
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, _RESTART_DELAY_SLICE_SECS))
@@ -0,0 +1,76 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+__all__ = [
+    "BufferingPolicy",
+    "LatestOnly",
+    "BoundedFifo",
+    "Lossless",
+]
+
+
+class BufferingPolicy(ABC):
+    """
+    How many frames are buffered between `appsink` and the consumer, and what happens when they are full.
+
+    Given to :class:`~GstStreamBuilder`, a policy overrides `max-buffers` and `drop` of the primary (decoded) `appsink`
+    of the pipeline; branches such as the encoded branch keep their own.  The internal queue of the stream is sized
+    accordingly, so that no sample is left unnotified.
+
+    Dropped frames are counted in `dropped_appsink` and `dropped_queue` of :class:`~StreamStats` and
+    :class:`~FrameMeta`.
+    """
+
+    @abstractmethod
+    def appsink_props(self) -> Dict[str, Any]:
+        """
+        returns:
+            - `dict`, properties set to the primary `appsink`.
+        """
+
+        raise NotImplementedError()
+
+
+class LatestOnly(BufferingPolicy):
+    """
+    Keep only the latest frame.  Lowest latency; older frames are dropped if the consumer is slow.
+    This is what :mod:`~preconfigured_pipeline` does for live sources.
+    """
+
+    def appsink_props(self) -> Dict[str, Any]:
+        return {"max-buffers": 1, "drop": True}
+
+
+class BoundedFifo(BufferingPolicy):
+    """
+    Keep up to `size` frames in order, dropping the oldest one when full.  Absorbs jitter of the consumer at the cost
+    of latency up to `size` frames.
+    """
+
+    _size: int
+
+    def __init__(self, size: int) -> None:
+        assert size > 0, f"size should be positive, but got: {size}"
+
+        self._size = size
+
+    def appsink_props(self) -> Dict[str, Any]:
+        return {"max-buffers": self._size, "drop": True}
+
+
+class Lossless(BufferingPolicy):
+    """
+    Keep up to `size` frames and block upstream when full, i.e., backpressure to the decoder.  No frames are dropped
+    by `appsink`.  Suitable for finite sources, e.g., files.  For live sources, upstream elements may drop or the
+    source may fail instead.
+    """
+
+    _size: int
+
+    def __init__(self, size: int = 4) -> None:
+        assert size > 0, f"size should be positive, but got: {size}"
+
+        self._size = size
+
+    def appsink_props(self) -> Dict[str, Any]:
+        return {"max-buffers": self._size, "drop": False}
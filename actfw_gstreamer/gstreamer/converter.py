@@ -5,20 +5,30 @@ if True:
     logger = _logging.getLogger(__name__)
     logger.addHandler(_logging.NullHandler())
 
+import weakref
 from abc import ABC, abstractmethod
-from typing import Any, Union
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple, Union
 
+import numpy as np
 import PIL
 from PIL.Image import Image as PIL_Image
 from result import Err, Ok, Result
 
-from ..util import _get_gst
+from ..util import _clock_time_or_none, _get_gst, _get_gst_video
 from .pipeline import AppsinkColorFormat
 
 __all__ = [
     "ConverterBase",
     "ConverterRaw",
     "ConverterPIL",
+    "ConverterNumPy",
+    "NumPyFrame",
+    "ConverterPlanes",
+    "PlanarFrame",
+    "nv12_to_rgb",
+    "i420_to_rgb",
+    "EncodedFrame",
+    "ConverterEncoded",
 ]
 
 
@@ -46,6 +56,86 @@ class ConverterBase(ABC):
         raise NotImplementedError()
 
 
+# Number of caps whose plans are kept by a converter, e.g., for a converter shared between branches.
+_PLAN_CACHE_SIZE = 4
+
+
+class _PlanCache:
+    """
+    Conversion plans compiled from caps, reused until caps renegotiate.
+
+    Keyed on caps equality; `gst_caps_is_equal()` returns immediately for the same caps, which is the usual case.
+    Entries are replaced at once, so a converter may be shared between threads.
+    """
+
+    _compile: Callable[[Any], Result[Any, Exception]]
+    _entries: Tuple[Tuple["GstCaps", Result[Any, Exception]], ...]  # type: ignore  # noqa F821
+
+    def __init__(self, compile_: Callable[[Any], Result[Any, Exception]]) -> None:
+        self._compile = compile_
+        self._entries = ()
+
+    def get(self, caps: "GstCaps") -> Result[Any, Exception]:  # type: ignore  # noqa F821
+        entries = self._entries
+        for cached_caps, plan in entries:
+            if cached_caps is caps or cached_caps.is_equal(caps):
+                return plan
+
+        plan = self._compile(caps)
+        logger.debug(f"compiled conversion plan for caps {caps}: {plan}")
+        self._entries = ((caps, plan), *entries[: _PLAN_CACHE_SIZE - 1])
+        return plan
+
+
+def _caps_format_and_size(
+    caps: "GstCaps",  # type: ignore  # noqa F821
+) -> Result[Tuple[AppsinkColorFormat, int, int], ValueError]:
+    structure = caps.get_structure(0)
+    format_ = AppsinkColorFormat._from_caps_format(structure.get_value("format"))
+    if format_.is_err():
+        return Err(format_.unwrap_err())
+    return Ok((format_.unwrap(), structure.get_value("width"), structure.get_value("height")))
+
+
+# Offsets and strides of planes in bytes.
+_Layout = Tuple[List[int], List[int]]
+
+
+def _caps_layout(
+    GstVideo: "GstVideo",  # type: ignore  # noqa F821
+    caps: "GstCaps",  # type: ignore  # noqa F821
+) -> Optional[_Layout]:
+    """
+    Layout of planes by `GstVideoInfo`, i.e., with the default alignment, e.g., RGB rows padded to 4 bytes.
+    `None` if caps cannot be parsed.
+    """
+
+    video_info = GstVideo.VideoInfo()
+    if not video_info.from_caps(caps):
+        return None
+    n_planes = video_info.finfo.n_planes
+    return (list(video_info.offset)[:n_planes], list(video_info.stride)[:n_planes])
+
+
+def _buffer_layout(
+    GstVideo: "GstVideo",  # type: ignore  # noqa F821
+    caps: "GstCaps",  # type: ignore  # noqa F821
+    caps_layout: Optional[_Layout],
+    buf: "GstBuffer",  # type: ignore  # noqa F821
+) -> Result[_Layout, ValueError]:
+    """
+    Layout of planes of `buf`: by `GstVideoMeta` if any, e.g., from hardware decoders, or by caps otherwise.
+    """
+
+    meta = GstVideo.buffer_get_video_meta(buf)
+    if meta is not None:
+        return Ok((list(meta.offset)[: meta.n_planes], list(meta.stride)[: meta.n_planes]))
+    elif caps_layout is not None:
+        return Ok(caps_layout)
+    else:
+        return Err(ValueError(f"failed to parse caps: {caps}"))
+
+
 class ConverterRaw(ConverterBase):
     # type ConvertResult = bytes;
 
@@ -71,42 +161,644 @@ class ConverterRaw(ConverterBase):
             return Err(RuntimeError("`gst_buffer_map()` failed"))
 
 
+class _PILPlan(NamedTuple):
+    format: AppsinkColorFormat
+    mode: str
+    raw_mode: str
+    # (width, height)
+    size: Tuple[int, int]
+    layout: Optional[_Layout]
+
+
+class EncodedFrame(NamedTuple):
+    """
+    An encoded access unit, e.g., of H.264, generated by :class:`~ConverterEncoded`.  Times are in nanoseconds and
+    `None` if unknown.
+    """
+
+    data: bytes
+    pts: Optional[int]
+    dts: Optional[int]
+    duration: Optional[int]
+    # True unless the buffer is a delta unit, i.e., decodable without preceding buffers.
+    keyframe: bool
+    # Caps of the stream, e.g., `video/x-h264,stream-format=byte-stream,...`.
+    caps: str
+
+
+class ConverterEncoded(ConverterBase):
+    # type ConvertResult = EncodedFrame;
+
+    _Gst: "Gst"  # type: ignore  # noqa F821
+    # Caps strings.
+    _plans: _PlanCache
+
+    def __init__(self) -> None:
+        """
+        Converter of encoded buffers, e.g., of a branch by :func:`~preconfigured_pipeline.encoded_h264_branch`.
+        The data are copied, so frames may be kept, e.g., by :class:`~ClipRecorder`.
+        """
+
+        self._Gst = _get_gst()
+        self._plans = _PlanCache(lambda caps: Ok(caps.to_string()))
+
+    def convert_sample(  # type: ignore  # reason: incompatible return type, but actually compatible
+        self,
+        sample: "GstSample",  # type: ignore  # noqa F821
+    ) -> Result[EncodedFrame, RuntimeError]:
+        Gst = self._Gst
+        caps_string = self._plans.get(sample.get_caps()).unwrap()
+
+        buf = sample.get_buffer()
+        success, info = buf.map(Gst.MapFlags.READ)
+        if not success:
+            return Err(RuntimeError("`gst_buffer_map()` failed"))
+        data = bytes(info.data)
+        buf.unmap(info)
+
+        pts = _clock_time_or_none(Gst, buf.pts)
+        dts = _clock_time_or_none(Gst, buf.dts)
+        duration = _clock_time_or_none(Gst, buf.duration)
+        keyframe = not buf.has_flags(Gst.BufferFlags.DELTA_UNIT)
+        return Ok(EncodedFrame(data, pts, dts, duration, keyframe, caps_string))
+
+
 class ConverterPIL(ConverterBase):
     # type ConvertResult = PIL_Image;
 
     _Gst: "Gst"  # type: ignore  # noqa F821
+    _GstVideo: "GstVideo"  # type: ignore  # noqa F821
+    _plans: _PlanCache
 
     def __init__(self) -> None:
+        """
+        Converter to `PIL.Image.Image`.  Padded rows (see :class:`~NumPyFrame`) are honored.
+        """
+
         self._Gst = _get_gst()
+        self._GstVideo = _get_gst_video()
+        self._plans = _PlanCache(self._compile_plan)
 
     def convert_sample(  # type: ignore  # reason: incompatible return type, but actually compatible
         self,
         sample: "GstSample",  # type: ignore  # noqa F821
     ) -> Result[PIL_Image, Union[RuntimeError, ValueError]]:
         caps = sample.get_caps()
-        structure = caps.get_structure(0)
-        logger.debug(f"structure: {structure}")
-        format_ = structure.get_value("format")
-        logger.debug(f"format: {format_}")
-        format__ = AppsinkColorFormat._from_caps_format(format_)
-        if format__.is_err():
-            return Err(format__.unwrap_err())
-        raw_mode = format__.unwrap()._to_PIL_raw_mode()
-        shape = (structure.get_value("width"), structure.get_value("height"))
-        logger.debug(f"shape: {shape}")
+        plan = self._plans.get(caps)
+        if plan.is_err():
+            return Err(plan.unwrap_err())
+        format_, mode, raw_mode, size, caps_layout = plan.unwrap()
+
+        buf = sample.get_buffer()
+        layout = _buffer_layout(self._GstVideo, caps, caps_layout, buf)
+        if layout.is_err():
+            return Err(layout.unwrap_err())
+        specs = _plane_specs(buf.get_size(), format_, size[0], size[1], *layout.unwrap())
+        if specs.is_err():
+            return Err(specs.unwrap_err())
+        offset, (rows, cols, pixel_stride), stride = specs.unwrap()[0]
+        end = offset + stride * (rows - 1) + cols * pixel_stride
 
         # Note that `gst_buffer_extract_dup()` cause a memory leak.
         # c.f. https://github.com/beetbox/audioread/pull/84
-        buf = sample.get_buffer()
         success, info = buf.map(self._Gst.MapFlags.READ)
         if success:
-            data = info.data
+            data = info.data[offset:end]
             # memoryview classの場合、Python 3.9以降でbytearrayに変換する必要がある
             # dataが無限長の場合、tobytesが終了しなくなるのでmemoryview classの場合のみ変換する
             if isinstance(data, memoryview):
                 data = data.tobytes()
-            ret = PIL.Image.frombytes("RGB", shape, data, "raw", raw_mode)
+            ret = PIL.Image.frombytes(mode, size, data, "raw", raw_mode, stride)
             buf.unmap(info)
             return Ok(ret)
         else:
             return Err(RuntimeError("`gst_buffer_map()` failed"))
+
+    def _compile_plan(self, caps: "GstCaps") -> Result[_PILPlan, ValueError]:  # type: ignore  # noqa F821
+        res = _caps_format_and_size(caps)
+        if res.is_err():
+            return Err(res.unwrap_err())
+        format_, width, height = res.unwrap()
+        mode = format_._to_PIL_mode()
+        raw_mode = format_._to_PIL_raw_mode()
+        if mode is None or raw_mode is None:
+            return Err(ValueError(f"ConverterPIL does not support format: {format_}"))
+        return Ok(_PILPlan(format_, mode, raw_mode, (width, height), _caps_layout(self._GstVideo, caps)))
+
+
+class _MappedFrame(ABC):
+    """
+    Base of frames holding a mapped `GstBuffer`.  See :class:`~NumPyFrame`.
+    """
+
+    _Gst: "Gst"  # type: ignore  # noqa F821
+    _sample: Optional["GstSample"]  # type: ignore  # noqa F821
+    _buffer: Optional["GstBuffer"]  # type: ignore  # noqa F821
+    _info: Optional["GstMapInfo"]  # type: ignore  # noqa F821
+    # The array made on the mapped memory, which views derive from.
+    _data: Optional[np.ndarray]  # type: ignore
+    _format: AppsinkColorFormat
+
+    def __init__(
+        self,
+        Gst: "Gst",  # type: ignore  # noqa F821
+        sample: "GstSample",  # type: ignore  # noqa F821
+        buffer: "GstBuffer",  # type: ignore  # noqa F821
+        info: "GstMapInfo",  # type: ignore  # noqa F821
+        data: np.ndarray,  # type: ignore
+        format_: AppsinkColorFormat,
+    ) -> None:
+        self._Gst = Gst
+        self._sample = sample
+        self._buffer = buffer
+        self._info = info
+        self._data = data
+        self._format = format_
+
+    def __enter__(self) -> "_MappedFrame":
+        return self
+
+    def __exit__(self, _ex_type: Any, _ex_value: Any, _trace: Any) -> bool:  # type: ignore
+        self.release()
+
+        return False
+
+    def __del__(self) -> None:
+        self.release()
+
+    @property
+    def format(self) -> AppsinkColorFormat:
+        return self._format
+
+    @property
+    def sample(self) -> "GstSample":  # type: ignore  # noqa F821
+        assert self._sample is not None, f"{type(self).__name__} is already released"
+        return self._sample
+
+    def is_released(self) -> bool:
+        return self._info is None
+
+    def release(self) -> None:
+        """
+        Unmap the buffer.  Idempotent.
+
+        If views derived from ours are still alive, e.g. slices kept by consumers, the buffer is unmapped when the last
+        of them is gone rather than leaving them dangling.
+        """
+
+        info = self._info
+        if info is None:
+            return
+
+        buf = self._buffer
+        data = self._data
+        assert buf is not None and data is not None
+        self._drop_views()
+        self._info = None
+        self._buffer = None
+        self._sample = None
+        self._data = None
+
+        # Every view of `data` refers to the memory through its base (or `data` itself if it has none).
+        owner = data if data.base is None else data.base
+        del data
+        try:
+            finalizer = weakref.finalize(owner, _unmap, buf, info)
+        except TypeError:
+            # Not weak-referable, e.g. `bytes` copied by old PyGObject, so no view refers to the mapped memory.
+            _unmap(buf, info)
+            return
+        # Do not touch `Gst` on interpreter shutdown.  The finalizer is called by `del` below if no view is alive.
+        finalizer.atexit = False
+        del owner
+
+    @abstractmethod
+    def _drop_views(self) -> None:
+        """
+        Drop views onto the mapped memory held by this object.
+        """
+
+        raise NotImplementedError()
+
+
+# Mappings whose memory was still exported out of numpy when unmapping.  Retried on later unmapping.
+_pending_unmaps: List[Tuple[Any, Any]] = []
+
+
+def _unmap(
+    buf: "GstBuffer",  # type: ignore  # noqa F821
+    info: "GstMapInfo",  # type: ignore  # noqa F821
+) -> None:
+    mappings = [(buf, info)]
+    while _pending_unmaps:
+        try:
+            mappings.append(_pending_unmaps.pop())
+        except IndexError:
+            break
+    for buf_, info_ in mappings:
+        try:
+            buf_.unmap(info_)
+        except BufferError as e:
+            if buf_ is buf:
+                logger.warning(f"deferred unmapping buffer; its memory is still exported: {e}")
+            _pending_unmaps.append((buf_, info_))
+
+
+class NumPyFrame(_MappedFrame):
+    """
+    A frame of :class:`~ConverterNumPy`.
+
+    :attr:`array` is a `numpy.ndarray` view onto the memory of the mapped `GstBuffer`, i.e., no copy is made.
+    Rows may be padded, e.g., GStreamer aligns rows of RGB to 4 bytes, in which case the view is strided and not
+    C-contiguous.  Give `contiguous=True` to :class:`~ConverterNumPy` if consumers need C-contiguous arrays.
+    The buffer is kept mapped while this object is alive and unmapped by :meth:`release` or garbage collection, or
+    when the last view derived from :attr:`array` is gone if any is still alive then.
+    You can also use this object as a context manager that releases it on exit.
+
+    Still, copy it (e.g. `frame.array.copy()`) if you need pixels longer than the frame, since buffers held this way
+    are not returned to the buffer pool of the pipeline.
+    """
+
+    _array: Optional[np.ndarray]  # type: ignore
+
+    def __init__(
+        self,
+        Gst: "Gst",  # type: ignore  # noqa F821
+        sample: "GstSample",  # type: ignore  # noqa F821
+        buffer: "GstBuffer",  # type: ignore  # noqa F821
+        info: "GstMapInfo",  # type: ignore  # noqa F821
+        data: np.ndarray,  # type: ignore
+        array: np.ndarray,  # type: ignore
+        format_: AppsinkColorFormat,
+    ) -> None:
+        """
+        Users should make instances of this class through :class:`~ConverterNumPy`.
+        """
+
+        self._array = array
+        super().__init__(Gst, sample, buffer, info, data, format_)
+
+    def __enter__(self) -> "NumPyFrame":
+        return self
+
+    @property
+    def array(self) -> np.ndarray:  # type: ignore
+        """
+        Read-only array of shape `(height, width, channels)`, channels are ordered as :attr:`format`.
+        """
+
+        assert self._array is not None, "NumPyFrame is already released"
+        return self._array
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.array.shape  # type: ignore
+
+    def _drop_views(self) -> None:
+        self._array = None
+
+
+class PlanarFrame(_MappedFrame):
+    """
+    A frame of :class:`~ConverterPlanes`.
+
+    :attr:`planes` are read-only `numpy.ndarray` views onto planes of the mapped `GstBuffer`, honoring strides and
+    offsets, i.e., rows may be padded and views may not be C-contiguous.  Lifetime is the same as :class:`~NumPyFrame`.
+
+    Planes are:
+
+    - `GRAY8`: `[Y]`, where `Y` is of shape `(height, width)`.
+    - `I420`: `[Y, U, V]`, where `U` and `V` are of shape `(ceil(height / 2), ceil(width / 2))`.
+    - `NV12`: `[Y, UV]`, where `UV` is of shape `(ceil(height / 2), ceil(width / 2), 2)`.
+    """
+
+    _planes: Optional[List[np.ndarray]]  # type: ignore
+    _width: int
+    _height: int
+
+    def __init__(
+        self,
+        Gst: "Gst",  # type: ignore  # noqa F821
+        sample: "GstSample",  # type: ignore  # noqa F821
+        buffer: "GstBuffer",  # type: ignore  # noqa F821
+        info: "GstMapInfo",  # type: ignore  # noqa F821
+        data: np.ndarray,  # type: ignore
+        planes: List[np.ndarray],  # type: ignore
+        format_: AppsinkColorFormat,
+        width: int,
+        height: int,
+    ) -> None:
+        """
+        Users should make instances of this class through :class:`~ConverterPlanes`.
+        """
+
+        self._planes = planes
+        self._width = width
+        self._height = height
+        super().__init__(Gst, sample, buffer, info, data, format_)
+
+    def __enter__(self) -> "PlanarFrame":
+        return self
+
+    @property
+    def planes(self) -> List[np.ndarray]:  # type: ignore
+        assert self._planes is not None, "PlanarFrame is already released"
+        return self._planes
+
+    @property
+    def width(self) -> int:
+        return self._width
+
+    @property
+    def height(self) -> int:
+        return self._height
+
+    def to_rgb(self, out: Optional[np.ndarray] = None) -> np.ndarray:  # type: ignore
+        """
+        Convert to a new RGB array of shape `(height, width, 3)`.  See :func:`~nv12_to_rgb`.
+        """
+
+        planes = self.planes
+        if self._format == AppsinkColorFormat.NV12:
+            return nv12_to_rgb(planes[0], planes[1], out)
+        elif self._format == AppsinkColorFormat.I420:
+            return i420_to_rgb(planes[0], planes[1], planes[2], out)
+        elif self._format == AppsinkColorFormat.GRAY8:
+            if out is None:
+                out = np.empty((self._height, self._width, 3), dtype=np.uint8)
+            out[...] = planes[0][:, :, np.newaxis]
+            return out
+        else:
+            raise RuntimeError("unreachable")
+
+    def _drop_views(self) -> None:
+        self._planes = None
+
+
+class _NumPyPlan(NamedTuple):
+    format: AppsinkColorFormat
+    width: int
+    height: int
+    layout: Optional[_Layout]
+
+
+class ConverterNumPy(ConverterBase):
+    # type ConvertResult = NumPyFrame;
+
+    _Gst: "Gst"  # type: ignore  # noqa F821
+    _GstVideo: "GstVideo"  # type: ignore  # noqa F821
+    _contiguous: bool
+    _plans: _PlanCache
+
+    def __init__(self, contiguous: bool = False) -> None:
+        """
+        Converter to zero-copy `numpy.ndarray` views.  See :class:`~NumPyFrame` for lifetime of frames.
+
+        Supports :class:`~AppsinkColorFormat` `BGR`, `RGB` and `RGBx`.  Strides and offsets are taken from
+        `GstVideoMeta` of buffers if any, or from caps otherwise, so any resolution works.
+
+        args:
+            - contiguous: `bool`, defaults to false.  If true, frames with padded rows are compacted by one copy, so
+              that :attr:`~NumPyFrame.array` is always C-contiguous.  Frames without padding are never copied.
+        """
+
+        self._Gst = _get_gst()
+        self._GstVideo = _get_gst_video()
+        self._contiguous = contiguous
+        self._plans = _PlanCache(self._compile_plan)
+
+    def convert_sample(  # type: ignore  # reason: incompatible return type, but actually compatible
+        self,
+        sample: "GstSample",  # type: ignore  # noqa F821
+    ) -> Result[NumPyFrame, Union[RuntimeError, ValueError]]:
+        caps = sample.get_caps()
+        plan = self._plans.get(caps)
+        if plan.is_err():
+            return Err(plan.unwrap_err())
+        format__, width, height, caps_layout = plan.unwrap()
+
+        buf = sample.get_buffer()
+        layout = _buffer_layout(self._GstVideo, caps, caps_layout, buf)
+        if layout.is_err():
+            return Err(layout.unwrap_err())
+        specs = _plane_specs(buf.get_size(), format__, width, height, *layout.unwrap())
+        if specs.is_err():
+            return Err(specs.unwrap_err())
+
+        success, info = buf.map(self._Gst.MapFlags.READ)
+        if not success:
+            return Err(RuntimeError("`gst_buffer_map()` failed"))
+
+        # No copy: `info.data` refers to the mapped memory (memoryview) in recent PyGObject/gst-python.
+        data = np.frombuffer(info.data, dtype=np.uint8)
+        (array,) = _plane_views(data, specs.unwrap())
+        if self._contiguous and not array.flags.c_contiguous:
+            array = np.ascontiguousarray(array)
+            array.flags.writeable = False
+        return Ok(NumPyFrame(self._Gst, sample, buf, info, data, array, format__))
+
+    def _compile_plan(self, caps: "GstCaps") -> Result[_NumPyPlan, ValueError]:  # type: ignore  # noqa F821
+        res = _caps_format_and_size(caps)
+        if res.is_err():
+            return Err(res.unwrap_err())
+        format_, width, height = res.unwrap()
+        if format_._to_numpy_channels() is None:
+            return Err(ValueError(f"ConverterNumPy does not support planar format: {format_}.  Use ConverterPlanes."))
+        return Ok(_NumPyPlan(format_, width, height, _caps_layout(self._GstVideo, caps)))
+
+
+class _PlanesPlan(NamedTuple):
+    format: AppsinkColorFormat
+    width: int
+    height: int
+    layout: Optional[_Layout]
+
+
+class ConverterPlanes(ConverterBase):
+    # type ConvertResult = PlanarFrame;
+
+    _Gst: "Gst"  # type: ignore  # noqa F821
+    _GstVideo: "GstVideo"  # type: ignore  # noqa F821
+    _plans: _PlanCache
+
+    def __init__(self) -> None:
+        """
+        Converter to zero-copy per-plane `numpy.ndarray` views.  See :class:`~PlanarFrame`.
+
+        Supports :class:`~AppsinkColorFormat` `I420`, `NV12` and `GRAY8`, which decoders usually output without
+        `videoconvert`.  Strides and offsets are taken from `GstVideoMeta` of buffers if any, or from caps otherwise.
+        """
+
+        self._Gst = _get_gst()
+        self._GstVideo = _get_gst_video()
+        self._plans = _PlanCache(self._compile_plan)
+
+    def convert_sample(  # type: ignore  # reason: incompatible return type, but actually compatible
+        self,
+        sample: "GstSample",  # type: ignore  # noqa F821
+    ) -> Result[PlanarFrame, Union[RuntimeError, ValueError]]:
+        caps = sample.get_caps()
+        plan = self._plans.get(caps)
+        if plan.is_err():
+            return Err(plan.unwrap_err())
+        format__, width, height, caps_layout = plan.unwrap()
+
+        buf = sample.get_buffer()
+        layout = _buffer_layout(self._GstVideo, caps, caps_layout, buf)
+        if layout.is_err():
+            return Err(layout.unwrap_err())
+        offsets, strides = layout.unwrap()
+        specs = _plane_specs(buf.get_size(), format__, width, height, offsets, strides)
+        if specs.is_err():
+            return Err(specs.unwrap_err())
+
+        success, info = buf.map(self._Gst.MapFlags.READ)
+        if not success:
+            return Err(RuntimeError("`gst_buffer_map()` failed"))
+
+        data = np.frombuffer(info.data, dtype=np.uint8)
+        planes = _plane_views(data, specs.unwrap())
+        return Ok(PlanarFrame(self._Gst, sample, buf, info, data, planes, format__, width, height))
+
+    def _compile_plan(self, caps: "GstCaps") -> Result[_PlanesPlan, ValueError]:  # type: ignore  # noqa F821
+        res = _caps_format_and_size(caps)
+        if res.is_err():
+            return Err(res.unwrap_err())
+        format_, width, height = res.unwrap()
+        if not format_._is_planar():
+            return Err(ValueError(f"ConverterPlanes does not support packed format: {format_}.  Use ConverterNumPy."))
+        return Ok(_PlanesPlan(format_, width, height, _caps_layout(self._GstVideo, caps)))
+
+
+_N_PLANES = {
+    AppsinkColorFormat.GRAY8: 1,
+    AppsinkColorFormat.I420: 3,
+    AppsinkColorFormat.NV12: 2,
+}
+
+
+class _PlaneSpec(NamedTuple):
+    offset: int
+    # (rows, cols, bytes per pixel)
+    shape: Tuple[int, int, int]
+    stride: int
+
+
+def _plane_specs(
+    size: int,
+    format_: AppsinkColorFormat,
+    width: int,
+    height: int,
+    offsets: Sequence[int],
+    strides: Sequence[int],
+) -> Result[List[_PlaneSpec], ValueError]:
+    """
+    Validate the layout of planes in a buffer of `size` bytes.  Packed formats have one plane.
+    """
+
+    n = _N_PLANES.get(format_, 1)
+    if len(offsets) < n or len(strides) < n:
+        return Err(ValueError(f"{format_} needs {n} planes, but got offsets {list(offsets)} and strides {list(strides)}"))
+
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+    if format_ == AppsinkColorFormat.GRAY8:
+        shapes = [(height, width, 1)]
+    elif format_ == AppsinkColorFormat.I420:
+        shapes = [(height, width, 1), (ch, cw, 1), (ch, cw, 1)]
+    elif format_ == AppsinkColorFormat.NV12:
+        shapes = [(height, width, 1), (ch, cw, 2)]
+    else:
+        # Packed formats.
+        channels = format_._to_numpy_channels()
+        assert channels is not None
+        shapes = [(height, width, channels)]
+
+    specs = []
+    for shape, offset, stride in zip(shapes, offsets, strides):
+        rows, cols, pixel_stride = shape
+        end = offset + stride * (rows - 1) + cols * pixel_stride
+        if stride < cols * pixel_stride or end > size:
+            return Err(
+                ValueError(
+                    f"buffer of {size} bytes is too short for {format_} {width}x{height}: offset {offset}, stride {stride}"
+                )
+            )
+        specs.append(_PlaneSpec(offset, shape, stride))
+    return Ok(specs)
+
+
+def _plane_views(data: np.ndarray, specs: List[_PlaneSpec]) -> List[np.ndarray]:  # type: ignore
+    """
+    Make read-only views of planes onto `data`, a 1-D `uint8` array validated by :func:`_plane_specs`.
+    """
+
+    planes = []
+    for offset, (rows, cols, pixel_stride), stride in specs:
+        plane = np.lib.stride_tricks.as_strided(
+            data[offset:], shape=(rows, cols, pixel_stride), strides=(stride, pixel_stride, 1), writeable=False
+        )
+        planes.append(plane[:, :, 0] if pixel_stride == 1 else plane)
+    return planes
+
+
+def nv12_to_rgb(
+    y: np.ndarray,  # type: ignore
+    uv: np.ndarray,  # type: ignore
+    out: Optional[np.ndarray] = None,  # type: ignore
+) -> np.ndarray:  # type: ignore
+    """
+    Convert NV12 planes (see :class:`~PlanarFrame`) to RGB in BT.601 limited range.
+
+    Vectorized with integer arithmetic.  Chroma is computed at half resolution and upsampled by nearest neighbor.
+
+    args:
+        - y: array of shape `(height, width)`
+        - uv: array of shape `(ceil(height / 2), ceil(width / 2), 2)`
+        - out: optional `uint8` array of shape `(height, width, 3)` to write to
+    returns:
+        - `uint8` array of shape `(height, width, 3)`
+    """
+
+    return _yuv420_to_rgb(y, uv[:, :, 0], uv[:, :, 1], out)
+
+
+def i420_to_rgb(
+    y: np.ndarray,  # type: ignore
+    u: np.ndarray,  # type: ignore
+    v: np.ndarray,  # type: ignore
+    out: Optional[np.ndarray] = None,  # type: ignore
+) -> np.ndarray:  # type: ignore
+    """
+    Convert I420 planes (see :class:`~PlanarFrame`) to RGB.  See :func:`~nv12_to_rgb`.
+    """
+
+    return _yuv420_to_rgb(y, u, v, out)
+
+
+def _yuv420_to_rgb(
+    y: np.ndarray,  # type: ignore
+    u: np.ndarray,  # type: ignore
+    v: np.ndarray,  # type: ignore
+    out: Optional[np.ndarray],  # type: ignore
+) -> np.ndarray:  # type: ignore
+    height, width = y.shape
+    ch, cw = (height + 1) // 2, (width + 1) // 2
+    assert u.shape == (ch, cw) and v.shape == (ch, cw), f"chroma should be of shape {(ch, cw)}, but got {u.shape}, {v.shape}"
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.uint8)
+    assert out.shape == (height, width, 3), f"out should be of shape {(height, width, 3)}, but got {out.shape}"
+
+    # Fixed-point coefficients scaled by 256.
+    d = u.astype(np.int32) - 128
+    e = v.astype(np.int32) - 128
+    chroma = (
+        409 * e,
+        -100 * d - 208 * e,
+        516 * d,
+    )
+    luma = 298 * (y.astype(np.int32) - 16) + 128
+    for i, c in enumerate(chroma):
+        c = np.repeat(np.repeat(c, 2, axis=0), 2, axis=1)[:height, :width]
+        np.clip((luma + c) >> 8, 0, 255, out=c)
+        out[:, :, i] = c
+    return out
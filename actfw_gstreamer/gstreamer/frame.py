@@ -0,0 +1,136 @@
+import threading
+from typing import Any, NamedTuple, Optional
+
+from result import Result
+
+from .converter import ConverterBase, _MappedFrame
+
+__all__ = [
+    "FrameMeta",
+    "FrameEnvelope",
+    "LazyFrame",
+]
+
+
+class FrameMeta(NamedTuple):
+    """
+    Metadata of a captured frame.  Times are in nanoseconds and `None` if unknown.
+    """
+
+    # Buffer timestamps.
+    pts: Optional[int]
+    dts: Optional[int]
+    duration: Optional[int]
+    # Running time of the buffer, i.e., when it should be rendered in pipeline clock.
+    running_time: Optional[int]
+    # Running time of the pipeline clock when the frame was captured.
+    pipeline_time: Optional[int]
+    # `time.monotonic()` when the frame was captured.
+    capture_time: float
+    # Monotonically increasing number of frames delivered from the stream, starting from 1.
+    sequence: int
+    # Number of frames dropped since the previous frame at `appsink` and at the internal queue.
+    # `dropped_appsink` is estimated from PTS and duration, so it also counts frames dropped upstream, e.g., by the
+    # decode gate.  Streams do not discard samples after pulling them from `appsink`, so `dropped_queue` is 0.
+    dropped_appsink: int
+    dropped_queue: int
+
+    def latency(self) -> Optional[int]:
+        """
+        Nanoseconds from when the buffer should have been rendered to when it was captured.
+        """
+
+        if self.running_time is None or self.pipeline_time is None:
+            return None
+        else:
+            return self.pipeline_time - self.running_time
+
+
+class FrameEnvelope(NamedTuple):
+    """
+    A converted frame with :class:`~FrameMeta`.  See `with_meta` of :class:`~GstStreamBuilder`.
+    """
+
+    # Here, Any = ConverterBase::ConvertResult.
+    value: Any
+    meta: FrameMeta
+
+
+class LazyFrame:
+    """
+    A frame converted on first access of :attr:`value`.  See `lazy` of :class:`~GstStreamBuilder`.
+
+    The frame holds the `Gst.Sample` until released, and the result of conversion is cached, so that consumers
+    which do not need pixels, or frames dropped downstream, cost no conversion.  :attr:`value` may be accessed from
+    any thread; the conversion runs at most once.
+    """
+
+    _sample: Optional["Gst.Sample"]  # type: ignore  # noqa F821
+    _converter: ConverterBase
+    _meta: Optional[FrameMeta]
+    _lock: threading.Lock
+    # Here, Any = ConverterBase::ConvertResult.
+    _result: Optional[Result[Any, Exception]]
+
+    def __init__(
+        self,
+        sample: "Gst.Sample",  # type: ignore  # noqa F821
+        converter: ConverterBase,
+        meta: Optional[FrameMeta] = None,
+    ) -> None:
+        self._sample = sample
+        self._converter = converter
+        self._meta = meta
+        self._lock = threading.Lock()
+        self._result = None
+
+    @property
+    def sample(self) -> "Gst.Sample":  # type: ignore  # noqa F821
+        assert self._sample is not None, "the frame is already released"
+        return self._sample
+
+    @property
+    def meta(self) -> Optional[FrameMeta]:
+        """
+        :class:`~FrameMeta` if `with_meta` of :class:`~GstStreamBuilder` is true, `None` otherwise.
+        """
+
+        return self._meta
+
+    @property
+    def value(self) -> Any:
+        """
+        Output of `ConverterBase`, converted on the first access.
+
+        exceptions:
+            - Errors of the conversion, raised on every access.
+        """
+
+        res = self._result
+        if res is None:
+            with self._lock:
+                res = self._result
+                if res is None:
+                    res = self._converter.convert_sample(self.sample)
+                    self._result = res
+        if res.is_ok():
+            return res.unwrap()
+        else:
+            raise res.unwrap_err()
+
+    def is_converted(self) -> bool:
+        return self._result is not None
+
+    def release(self) -> None:
+        """
+        Drop the sample, and release the converted value if it is a mapped frame, e.g., :class:`~NumPyFrame`.
+        """
+
+        with self._lock:
+            res = self._result
+            self._result = None
+            self._sample = None
+        if res is not None and res.is_ok():
+            value = res.unwrap()
+            if isinstance(value, _MappedFrame):
+                value.release()
@@ -24,6 +24,10 @@ class AppsinkColorFormat(enum.Enum):
     BGR = enum.auto()
     RGB = enum.auto()
     RGBx = enum.auto()
+    # Planar formats.  Use :class:`~ConverterPlanes`.
+    I420 = enum.auto()
+    NV12 = enum.auto()
+    GRAY8 = enum.auto()
 
     @classmethod
     def _from_caps_format(cls, format_: str) -> Result["AppsinkColorFormat", ValueError]:
@@ -35,30 +39,55 @@ class AppsinkColorFormat(enum.Enum):
     def _to_caps_format(self) -> str:
         return self._TO_CAPS_FORMAT[self]  # type: ignore
 
-    def _to_PIL_raw_mode(self) -> str:
-        return self._TO_PIL_RAW_MODE[self]  # type: ignore
+    def _to_PIL_mode(self) -> Optional[str]:
+        """
+        `None` if PIL does not support the format.
+        """
+
+        return self._TO_PIL_MODE[self][0]  # type: ignore
+
+    def _to_PIL_raw_mode(self) -> Optional[str]:
+        return self._TO_PIL_MODE[self][1]  # type: ignore
+
+    def _to_numpy_channels(self) -> Optional[int]:
+        """
+        `None` if the format is not packed into a single plane.
+        """
+
+        return self._TO_NUMPY_CHANNELS[self]  # type: ignore
+
+    def _is_planar(self) -> bool:
+        return self in (AppsinkColorFormat.I420, AppsinkColorFormat.NV12, AppsinkColorFormat.GRAY8)
 
 
 # I know metaclass trick, but it's enough.
 _CORR = {
-    AppsinkColorFormat.BGR: ("BGR", "BGR"),
-    AppsinkColorFormat.RGB: ("RGB", "RGB"),
-    AppsinkColorFormat.RGBx: ("RGBx", "RGBX"),
+    AppsinkColorFormat.BGR: ("BGR", ("RGB", "BGR"), 3),
+    AppsinkColorFormat.RGB: ("RGB", ("RGB", "RGB"), 3),
+    AppsinkColorFormat.RGBx: ("RGBx", ("RGB", "RGBX"), 4),
+    AppsinkColorFormat.I420: ("I420", (None, None), None),
+    AppsinkColorFormat.NV12: ("NV12", (None, None), None),
+    AppsinkColorFormat.GRAY8: ("GRAY8", ("L", "L"), None),
 }
 AppsinkColorFormat._FROM_CAPS_FORMAT = (  # type: ignore
     # fmt: off
     dict((caps_format, x)
-         for (x, (caps_format, _)) in _CORR.items())
+         for (x, (caps_format, _, _)) in _CORR.items())
 )
 AppsinkColorFormat._TO_CAPS_FORMAT = (  # type: ignore
     # fmt: off
     dict((x, caps_format)
-         for (x, (caps_format, _)) in _CORR.items())
+         for (x, (caps_format, _, _)) in _CORR.items())
+)
+AppsinkColorFormat._TO_PIL_MODE = (  # type: ignore
+    # fmt: off
+    dict((x, modes)
+         for (x, (_, modes, _)) in _CORR.items())
 )
-AppsinkColorFormat._TO_PIL_RAW_MODE = (  # type: ignore
+AppsinkColorFormat._TO_NUMPY_CHANNELS = (  # type: ignore
     # fmt: off
-    dict((x, raw_mode)
-         for (x, (_, raw_mode)) in _CORR.items())
+    dict((x, channels)
+         for (x, (_, _, channels)) in _CORR.items())
 )
 
 
@@ -89,16 +118,58 @@ def _make_capsfilter(Gst: "Gst", caps_string: str) -> "Gst.Element":  # type: ig
     return _make_element(Gst, "capsfilter", {"caps": caps})
 
 
+# Name of the element added by `PipelineBuilder.add_decode_gate()`.  Streams find it by this name and control it.
+_DECODE_GATE_NAME = "actfw-decode-gate"
+
+
+def _make_keyframe_filter(Gst: "Gst", interval_ns: int) -> "Gst.Element":  # type: ignore  # noqa F821
+    """
+    `identity` whose pad probe drops delta units, and keyframes less than `interval_ns` after the last passed one.
+
+    exceptions:
+        - :class:`~PipelineBuildError`
+    """
+
+    x = _make_element(Gst, "identity", {})
+    # PTS of the last passed keyframe.
+    last: List[Optional[int]] = [None]
+
+    def probe(_pad: "Gst.Pad", info: "Gst.PadProbeInfo") -> "Gst.PadProbeReturn":  # type: ignore  # noqa F821
+        buf = info.get_buffer()
+        if buf.has_flags(Gst.BufferFlags.DELTA_UNIT):
+            return Gst.PadProbeReturn.DROP
+        pts = buf.pts
+        if pts != Gst.CLOCK_TIME_NONE:
+            if last[0] is not None and last[0] <= pts < last[0] + interval_ns:
+                return Gst.PadProbeReturn.DROP
+            last[0] = pts
+        return Gst.PadProbeReturn.OK
+
+    x.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, probe)
+    return x
+
+
 class PipelineBuilder:
     _Gst: "Gst"  # type: ignore  # noqa F821
     _thunks: List[Any]
     _caps_string: Optional[str]
+    _branches: Dict[str, "_Branch"]  # noqa F821 (Hey linter, see below.)
+    _finite: bool
     _finalized: bool
 
-    def __init__(self, force_format: Optional[AppsinkColorFormat] = None):
+    def __init__(self, force_format: Optional[AppsinkColorFormat] = None, finite: bool = False):
+        """
+        args:
+            - force_format: :class:`~AppsinkColorFormat`, optional.  Defaults to one of `BGR`, `RGB` and `RGBx`.
+            - finite: `bool`, defaults to false.  True if the source ends, e.g., a file.  Then EOS means completion
+              rather than connection lost.  See :meth:`~PipelineGenerator.is_finite`.
+        """
+
         self._Gst = _get_gst()
         self._thunks = []
         self._caps_string = None
+        self._branches = {}
+        self._finite = finite
         self._finalized = False
 
         if force_format is None:
@@ -118,6 +189,40 @@ class PipelineBuilder:
         self._thunks.append(lambda: _make_capsfilter(self._Gst, caps_string))
         return self
 
+    def add_keyframe_filter(self, interval_secs: float = 0.0) -> "PipelineBuilder":
+        """
+        Pass only keyframes of an encoded stream, at least `interval_secs` apart.  Put this before the decoder, e.g.,
+        after `h264parse`, so that decoding runs only for frames to be captured and its CPU scales with the sampling
+        rate rather than the frame rate of the source.
+
+        Do not put `videorate` after this; it would duplicate frames to fill the frame rate.
+
+        args:
+            - interval_secs: `float`, defaults to 0, i.e., every keyframe.  Intervals are in PTS and quantized by the
+              GOP of the source.
+        """
+
+        assert interval_secs >= 0, f"interval_secs should be non-negative, but got: {interval_secs}"
+
+        interval_ns = int(interval_secs * 1e9)
+        self._thunks.append(lambda: _make_keyframe_filter(self._Gst, interval_ns))
+        return self
+
+    def add_decode_gate(self) -> "PipelineBuilder":
+        """
+        Add a gate of an encoded stream controlled by the demand of the consumer.  Put this before the decoder, e.g.,
+        after `h264parse`.  While the consumer does not capture frames, e.g., inference is busy, encoded data is dropped
+        here instead of being decoded and then dropped by `appsink`.  See `decode_gate_idle_secs` of
+        :class:`~GstStreamBuilder`.
+
+        The gate opens and closes only at keyframes, so the decoder never starts in the middle of a GOP.
+
+        At most one gate in a pipeline is used.
+        """
+
+        self._thunks.append(lambda: _make_element(self._Gst, "identity", {"name": _DECODE_GATE_NAME}))
+        return self
+
     def add_appsink_with_caps(self, props: Dict[str, Any] = {}, caps: Dict[str, Any] = {}) -> "PipelineBuilder":  # noqa B006
         """
         Effect: Change `self.is_finalized()` to be true.
@@ -149,6 +254,55 @@ class PipelineBuilder:
 
         return self
 
+    def add_appsink_with_caps_string(self, props: Dict[str, Any] = {}, caps_string: str = "") -> "PipelineBuilder":  # noqa B006
+        """
+        Same as :meth:`add_appsink_with_caps`, but with raw caps, e.g., `video/x-h264` for encoded streams.
+        `force_format` is ignored.  Effect: Change `self.is_finalized()` to be true.
+        """
+
+        assert caps_string != "", "caps_string should not be empty"
+
+        self.add("appsink", props)
+        self._caps_string = caps_string
+        self._finalized = True
+
+        return self
+
+    def tee(self, branches: Dict[str, "PipelineBuilder"]) -> "PipelineBuilder":
+        """
+        Split the stream by `tee` into `branches`.  Effect: Change `self.is_finalized()` to be true.
+
+        Elements before `tee`, e.g., source and decoder, are shared by branches.  A `queue` is inserted at the head of
+        each branch, so that each branch, e.g., scaling and color conversion, runs in its own streaming thread.
+
+        Branches finalized by :meth:`add_appsink_with_caps` are exposed as streams named by the keys of `branches`.
+        The first one is the primary stream, which is captured by :meth:`~_GstStream.capture`, and the others are
+        captured by :meth:`~_GstStream.capture_branch`.  Other branches should end with a sink element, e.g.,
+        `fakesink`.  Appsinks of branches which may not be consumed should have `drop=True` and `max-buffers`, or
+        they stall the whole pipeline.
+
+        args:
+            - branches: `dict` of `str` to :class:`~PipelineBuilder`, in which builders have no branches.
+        """
+
+        assert not self._finalized
+        assert len(self._thunks) > 0, "tee needs an upstream element"
+        assert len(branches) > 0, "branches should not be empty"
+        for name, branch in branches.items():
+            assert isinstance(branch, PipelineBuilder), f"branch should be instance of PipelineBuilder, but got: {type(branch)}"
+            assert len(branch._thunks) > 0, f"branch {name} is empty"
+            assert not branch._branches, f"branch {name} should not have branches"
+        assert any(branch.is_finalized() for branch in branches.values()), "at least one branch should have appsink"
+
+        self.add("tee")
+        self._branches = dict(
+            (name, _Branch(branch._thunks, branch._caps_string if branch.is_finalized() else None))
+            for (name, branch) in branches.items()
+        )
+        self._finalized = True
+
+        return self
+
     def finalize(self) -> "PipelineGenerator":  # noqa F821 (Hey linter, see below.)
         """
         returns:
@@ -157,7 +311,13 @@ class PipelineBuilder:
 
         assert self._finalized
 
-        return PipelineGenerator(self._thunks, self._caps_string)  # type: ignore
+        return PipelineGenerator(self._thunks, self._caps_string, self._branches, self._finite)  # type: ignore
+
+
+class _Branch(NamedTuple):
+    thunks: List[Any]
+    # `None` if the branch is not exposed, i.e., does not end with appsink.
+    caps_string: Optional[str]
 
 
 class PipelineGenerator:
@@ -168,39 +328,72 @@ class PipelineGenerator:
     _Gst: "Gst"  # type: ignore  # noqa F821
     _thunks: List[Any]
     _caps_string: Optional[str]
-
-    def __init__(self, thunks: List[Any], caps_string: str):
-        # It definitely contains `appsink`.
+    _branches: Dict[str, _Branch]
+    _finite: bool
+
+    def __init__(
+        self,
+        thunks: List[Any],
+        caps_string: Optional[str],
+        branches: Dict[str, _Branch] = {},  # noqa B006
+        finite: bool = False,
+    ):
+        # It definitely contains `appsink` or `tee`.
         assert len(thunks) > 0
 
         self._Gst = _get_gst()
         self._thunks = thunks
         self._caps_string = caps_string
+        self._branches = branches
+        self._finite = finite
+
+    def is_finite(self) -> bool:
+        """
+        True if the source ends, e.g., a file.  Streams of finite pipelines are captured losslessly by default, and
+        :class:`~GstreamerCapture` finishes at EOS instead of restarting.
+        """
+
+        return self._finite
+
+    def branch_names(self) -> List[str]:
+        """
+        Names of branches exposed as streams.  The first one is the primary stream.  Empty if no `tee`.
+        """
+
+        return [name for (name, branch) in self._branches.items() if branch.caps_string is not None]
 
     def build(self) -> Result["_BuiltPipeline", PipelineBuildError]:  # noqa F821 (Hey linter, see below.)
         try:
             elements = [f() for f in self._thunks]
-            logger.debug(f"_caps_string: {self._caps_string}")
-            caps = self._Gst.caps_from_string(self._caps_string)
-            elements[-1].set_property("caps", caps)
+            if not self._branches:
+                self._set_caps(elements[-1], self._caps_string)  # type: ignore
             pipeline = self._Gst.Pipeline()
             for x in elements:
                 pipeline.add(x)
-            for x, y in zip(elements, elements[1:]):
-                # c.f. http://gstreamer-devel.966125.n4.nabble.com/Problem-linking-rtspsrc-to-any-other-element-td3051725.html
-                if x.get_static_pad("src"):
-                    logger.info(f"get static pad of src of {x}")
-                    if not x.link(y):
-                        return Err(PipelineBuildError(f"failed to link {x} {y}"))
-                else:
-
-                    def f(x: "Gst.Element", y: "Gst.Element") -> None:  # type: ignore  # noqa F821
-                        logger.info(f"linking {x} and {y}")
-                        x.link(y)
-
-                    x.connect("pad-added", lambda _a, _b, x=x, y=y: f(x, y))
-
-            return Ok(_BuiltPipeline(pipeline=pipeline, sink=elements[-1]))
+            res = _link_chain(elements)
+            if res.is_err():
+                return res  # type: ignore
+
+            sinks: Dict[str, Any] = {}
+            if self._branches:
+                for name, branch in self._branches.items():
+                    branch_elements = [_make_element(self._Gst, "queue", {})] + [f() for f in branch.thunks]
+                    if branch.caps_string is not None:
+                        self._set_caps(branch_elements[-1], branch.caps_string)
+                        sinks[name] = branch_elements[-1]
+                    for x in branch_elements:
+                        pipeline.add(x)
+                    res = _link_chain(branch_elements)
+                    if res.is_err():
+                        return res  # type: ignore
+                    # `tee` has only request pads, which `link()` requests.
+                    if not elements[-1].link(branch_elements[0]):
+                        return Err(PipelineBuildError(f"failed to link tee to branch {name}"))
+                sink = next(iter(sinks.values()))
+            else:
+                sink = elements[-1]
+
+            return Ok(_BuiltPipeline(pipeline=pipeline, sink=sink, elements=elements, thunks=self._thunks, sinks=sinks))
         except PipelineBuildError as err:
             return Err(err)
         except Exception as err:
@@ -209,7 +402,76 @@ class PipelineGenerator:
             except PipelineBuildError as err:
                 return Err(err)
 
+    def _set_caps(self, appsink: "Gst.Element", caps_string: str) -> None:  # type: ignore  # noqa F821
+        logger.debug(f"_caps_string: {caps_string}")
+        caps = self._Gst.caps_from_string(caps_string)
+        appsink.set_property("caps", caps)
+
+
+def _link_chain(elements: List["Gst.Element"]) -> Result[None, PipelineBuildError]:  # type: ignore  # noqa F821
+    for x, y in zip(elements, elements[1:]):
+        res = _link(x, y)
+        if res.is_err():
+            return res
+    return Ok(None)
+
+
+def _link(x: "Gst.Element", y: "Gst.Element") -> Result[None, PipelineBuildError]:  # type: ignore  # noqa F821
+    # c.f. http://gstreamer-devel.966125.n4.nabble.com/Problem-linking-rtspsrc-to-any-other-element-td3051725.html
+    if x.get_static_pad("src"):
+        logger.info(f"get static pad of src of {x}")
+        if not x.link(y):
+            return Err(PipelineBuildError(f"failed to link {x} {y}"))
+    else:
+
+        def f(x: "Gst.Element", y: "Gst.Element") -> None:  # type: ignore  # noqa F821
+            logger.info(f"linking {x} and {y}")
+            x.link(y)
+
+        x.connect("pad-added", lambda _a, _b, x=x, y=y: f(x, y))
+
+    return Ok(None)
+
 
 class _BuiltPipeline(NamedTuple):
     pipeline: "Gst.Pipeline"  # type: ignore  # noqa F821
+    # Appsink of the primary stream.
     sink: "Gst.GstAppSink"  # type: ignore  # noqa F821
+    # Elements in the order of `PipelineBuilder.add*()` and thunks to create them.  Branches are not included.
+    elements: List[Any]
+    thunks: List[Any]
+    # Appsinks of branches exposed as streams, including the primary one.  Empty if no `tee`.
+    sinks: Dict[str, Any]
+
+    def rebuild_source(self) -> Result[None, PipelineBuildError]:
+        """
+        Replace the first element (source) with a new one, keeping the others.
+
+        The pipeline should be in READY or NULL state.
+        """
+
+        if len(self.elements) < 2:
+            return Err(PipelineBuildError("pipeline has no source element to rebuild"))
+
+        try:
+            new = self.thunks[0]()
+        except PipelineBuildError as err:
+            return Err(err)
+        except Exception as err:
+            try:
+                raise PipelineBuildError(err) from err
+            except PipelineBuildError as err:
+                return Err(err)
+
+        old = self.elements[0]
+        Gst = _get_gst()
+        old.set_state(Gst.State.NULL)
+        # Removing from a bin unlinks pads.
+        self.pipeline.remove(old)
+        self.pipeline.add(new)
+        self.elements[0] = new
+        res = _link(new, self.elements[1])
+        if res.is_err():
+            return res
+        new.sync_state_with_parent()
+        return Ok(None)
@@ -6,13 +6,19 @@ if True:
     logger.addHandler(_logging.NullHandler())
 
 import copy
+from pathlib import Path
 from typing import Any, Dict, Optional
 
+from .buffering import BoundedFifo, LatestOnly, Lossless
 from .pipeline import AppsinkColorFormat, PipelineBuilder, PipelineGenerator
 
 __all__ = [
     "videotestsrc",
     "rtsp_h264",
+    "file",
+    "encoded_h264_branch",
+    "DECODED_BRANCH",
+    "ENCODED_BRANCH",
 ]
 
 
@@ -21,6 +27,10 @@ DEFAULT_CAPS = {
     "height": 480,
 }
 
+# Branch names of `rtsp_h264(..., record=True)`.
+DECODED_BRANCH = "decoded"
+ENCODED_BRANCH = "encoded"
+
 
 def videotestsrc(pattern: str = "smpte", caps: Dict[str, Any] = DEFAULT_CAPS) -> PipelineGenerator:
     """
@@ -56,8 +66,7 @@ def videotestsrc(pattern: str = "smpte", caps: Dict[str, Any] = DEFAULT_CAPS) ->
         .add("videoscale")
         .add_appsink_with_caps(
             {
-                "max-buffers": 1,
-                "drop": True,
+                **LatestOnly().appsink_props(),
                 "emit-signals": True,
             },
             caps,
@@ -72,6 +81,9 @@ def rtsp_h264(
     protocols: str,
     decoder_type: str,
     caps: Dict[str, Any] = DEFAULT_CAPS,
+    record: bool = False,
+    keyframe_interval_secs: Optional[float] = None,
+    decode_gate: bool = False,
 ) -> PipelineGenerator:
     """
     Create a pipeline like:
@@ -84,6 +96,19 @@ def rtsp_h264(
         <decoder> = v4l2h264dec (if decoder_type == 'v4l2')
                   = omxh264dec (if decoder_type == 'omx')
 
+    If `record` is true, the stream is split after `h264parse` into branches `DECODED_BRANCH`, the primary one as
+    above, and `ENCODED_BRANCH` by :func:`encoded_h264_branch`, whose H.264 access units can be kept by
+    :class:`~ClipRecorder` without re-encoding.  Give :class:`~ConverterEncoded` to the encoded branch by
+    `branch_converters` of :class:`~GstStreamBuilder`.
+
+    If `keyframe_interval_secs` is given, only keyframes at least that seconds apart are decoded, by
+    :meth:`~PipelineBuilder.add_keyframe_filter` before the decoder, and `videorate` is omitted.  Decoding CPU then
+    scales with the sampling rate, e.g., for analytics at 1 fps or less.  `framerate` of `caps` is ignored.
+    Frames are sampled at the GOP boundaries of the camera.
+
+    If `decode_gate` is true, :meth:`~PipelineBuilder.add_decode_gate` is put before the decoder, so that GOPs are not
+    decoded while the consumer is busy.  The encoded branch is not gated.
+
     args:
         - proxy: proxy URL 'tcp://...'
         - location: rtsp resource location URL 'rtsp://<host>:<port>/<path>'
@@ -94,6 +119,9 @@ def rtsp_h264(
                 'height': int,
                 'framerate': Option[int], // Default: 10
             }
+        - record: `bool`, defaults to false.
+        - keyframe_interval_secs: `float`, optional.  Defaults to decoding all frames.
+        - decode_gate: `bool`, defaults to false.
     returns:
         - :class:`~PipelineGenerator`
     """
@@ -107,7 +135,7 @@ def rtsp_h264(
     else:
         raise ValueError(f"decoder_type should be 'v4l2' | 'omx' | 'libav', but got: {decoder_type}")
 
-    return _rtsp_h264(proxy, location, protocols, decoder, caps)
+    return _rtsp_h264(proxy, location, protocols, decoder, caps, record, keyframe_interval_secs, decode_gate)
 
 
 def _rtsp_h264(
@@ -116,6 +144,9 @@ def _rtsp_h264(
     protocols: str,
     decoder: str,
     caps: Dict[str, Any],
+    record: bool = False,
+    keyframe_interval_secs: Optional[float] = None,
+    decode_gate: bool = False,
 ) -> PipelineGenerator:
     assert "width" in caps
     assert "height" in caps
@@ -131,13 +162,14 @@ def _rtsp_h264(
     if proxy is not None:
         rtspsrc_props["proxy"] = proxy
 
-    return (
-        PipelineBuilder(force_format=AppsinkColorFormat.RGB)
-        .add("rtspsrc", rtspsrc_props)
-        .add("rtph264depay")
-        .add("h264parse")
-        .add(decoder)
-        .add(
+    source = (
+        PipelineBuilder(force_format=AppsinkColorFormat.RGB).add("rtspsrc", rtspsrc_props).add("rtph264depay").add("h264parse")
+    )
+    decoded = PipelineBuilder(force_format=AppsinkColorFormat.RGB) if record else source
+    if decode_gate:
+        decoded = decoded.add_decode_gate()
+    if keyframe_interval_secs is None:
+        decoded = decoded.add(decoder).add(
             "videorate",
             {
                 # We don't use `drop-only` because omxh264dec generates a frame with `framerate=0/1`
@@ -146,15 +178,107 @@ def _rtsp_h264(
                 "skip-to-first": True,
             },
         )
-        .add("videoscale")
+    else:
+        caps = {**caps, "framerate": None}
+        decoded = decoded.add_keyframe_filter(keyframe_interval_secs).add(decoder)
+    decoded = (
+        decoded.add("videoscale")
         .add("videoconvert")
         .add_appsink_with_caps(
             {
-                "max-buffers": 1,
-                "drop": True,
+                **LatestOnly().appsink_props(),
                 "emit-signals": True,
             },
             caps,
         )
+    )
+    if record:
+        return source.tee({DECODED_BRANCH: decoded, ENCODED_BRANCH: encoded_h264_branch()}).finalize()
+    else:
+        return decoded.finalize()
+
+
+def encoded_h264_branch(max_buffers: int = 120) -> PipelineBuilder:
+    """
+    Create a branch for :meth:`~PipelineBuilder.tee` after `h264parse`, which passes H.264 access units to `appsink`
+    without decoding:
+        h264parse config-interval=-1 \
+        ! video/x-h264,stream-format=byte-stream,alignment=au \
+        ! appsink max-buffers=<max_buffers> drop=true
+
+    SPS/PPS are inserted before each keyframe, so that any keyframe can start a clip.  Capture it with
+    :class:`~ConverterEncoded`.
+
+    args:
+        - max_buffers: `int`, number of buffers kept while the consumer is busy, defaults to 120.  Dropped buffers
+          break clips, so it should cover some seconds of the stream.
+    returns:
+        - :class:`~PipelineBuilder`
+    """
+
+    return (
+        PipelineBuilder()
+        .add("h264parse", {"config-interval": -1})
+        .add_appsink_with_caps_string(
+            {
+                **BoundedFifo(max_buffers).appsink_props(),
+                "emit-signals": True,
+                "sync": False,
+            },
+            "video/x-h264,stream-format=byte-stream,alignment=au",
+        )
+    )
+
+
+def file(location: str, caps: Dict[str, Any] = DEFAULT_CAPS, max_buffers: int = 4) -> PipelineGenerator:
+    """
+    Create a finite pipeline which decodes a video file as fast as possible:
+        uridecodebin uri=<location> \
+        ! videoconvert ! videoscale \
+        ! video/x-raw,format=RGB,... \
+        ! appsink sync=false drop=false max-buffers=<max_buffers>
+
+    `appsink` does not synchronize to the clock and does not drop frames.  When `max_buffers` frames are not consumed,
+    it blocks the decoder, i.e., the speed is limited by the consumer.  EOS means completion.  See
+    :meth:`~PipelineGenerator.is_finite`.
+
+    args:
+        - location: `str`, path to the file or URI.
+        - caps: `dict`
+            {
+                'width': int,
+                'height': int,
+                'framerate': Option[int], // Default: None, i.e., all frames of the file.
+            }
+        - max_buffers: `int`, number of decoded frames buffered in `appsink`, defaults to 4.
+    returns:
+        - :class:`~PipelineGenerator`
+    """
+
+    caps = copy.copy(caps)
+    assert "width" in caps
+    assert "height" in caps
+    if "framerate" not in caps:
+        caps["framerate"] = None
+    assert max_buffers > 0, f"max_buffers should be positive, but got: {max_buffers}"
+
+    if "://" in location:
+        uri = location
+    else:
+        uri = Path(location).resolve().as_uri()
+
+    builder = PipelineBuilder(force_format=AppsinkColorFormat.RGB, finite=True).add("uridecodebin", {"uri": uri})
+    if caps["framerate"] is not None:
+        builder = builder.add("videorate")
+    return (
+        builder.add("videoconvert")
+        .add("videoscale")
+        .add_appsink_with_caps(
+            {
+                **Lossless(max_buffers).appsink_props(),
+                "sync": False,
+            },
+            caps,
+        )
         .finalize()
     )
@@ -1,27 +1,109 @@
-from queue import Empty, Full, Queue
-from typing import Any, NamedTuple, Optional
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import enum
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from queue import Empty, Full, PriorityQueue, Queue
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 from result import Err, Ok, Result
 
-from ..util import _get_gst
+from ..stats import StreamStats
+from ..util import _clock_time_or_none, _get_gst
+from .buffering import BufferingPolicy
 from .converter import ConverterBase, ConverterRaw
-from .exception import PipelineBuildError
-from .pipeline import PipelineGenerator, _BuiltPipeline
+from .exception import ConnectionLostError, PipelineBuildError
+from .frame import FrameEnvelope, FrameMeta, LazyFrame
+from .pipeline import _DECODE_GATE_NAME, PipelineGenerator, _BuiltPipeline
 
 __all__ = [
+    "AppsinkMode",
+    "WarmRestart",
     "GstStreamBuilder",
+    "start_streaming_concurrently",
 ]
 
 
+DEFAULT_STATE_CHANGE_TIMEOUT_SECS = 20.0
+DEFAULT_DECODE_GATE_IDLE_SECS = 0.5
+
+
+class AppsinkMode(enum.Enum):
+    """
+    How to get samples from `appsink`.
+
+    - `SIGNAL`: Get notified by `new-sample` signal (a Python callback on the streaming thread) and `pull-sample`.
+    - `PULL`: Block on `try-pull-sample` with timeout.  No Python callback runs on the streaming thread.
+    """
+
+    SIGNAL = enum.auto()
+    PULL = enum.auto()
+
+
+class WarmRestart(enum.Enum):
+    """
+    How to restart a running stream without building a new pipeline.  See :meth:`~_GstStream.warm_restart`.
+
+    - `CYCLE_STATE`: Cycle the pipeline through READY to PLAYING.  All elements are kept.
+    - `REBUILD_SOURCE`: Additionally, replace the source element (e.g. `rtspsrc`) with a new one.  The rest, e.g.,
+      depayloader, decoder and converters, are kept.
+    """
+
+    CYCLE_STATE = enum.auto()
+    REBUILD_SOURCE = enum.auto()
+
+
 class GstStreamBuilder:
     _pipeline_generator: PipelineGenerator
     _converter: ConverterBase
+    _mode: AppsinkMode
+    _buffering: Optional[BufferingPolicy]
+    _options: "_InnerOptions"  # noqa F821 (Hey linter, see below.)
 
-    def __init__(self, pipeline_generator: PipelineGenerator, converter: Optional[ConverterBase] = None):
+    def __init__(
+        self,
+        pipeline_generator: PipelineGenerator,
+        converter: Optional[ConverterBase] = None,
+        mode: Optional[AppsinkMode] = None,
+        with_meta: bool = False,
+        branch_converters: Dict[str, ConverterBase] = {},  # noqa B006
+        buffering: Optional[BufferingPolicy] = None,
+        state_change_timeout_secs: Optional[float] = DEFAULT_STATE_CHANGE_TIMEOUT_SECS,
+        lazy: bool = False,
+        decode_gate_idle_secs: float = DEFAULT_DECODE_GATE_IDLE_SECS,
+    ):
         """
         args:
             - pipeline_generator: :class:`~PipelineGenerator`
             - converter: :class:`~ConverterBase`, defaults to :class:`~ConverterRaw`.
+            - mode: :class:`~AppsinkMode`, defaults to `AppsinkMode.SIGNAL`, or `AppsinkMode.PULL` if the pipeline is
+              finite.
+            - with_meta: `bool`, defaults to false.  If true, streams generate :class:`~FrameEnvelope`s, i.e., outputs
+              of `converter` with :class:`~FrameMeta`.
+            - branch_converters: `dict` of branch name to :class:`~ConverterBase`, for pipelines with
+              :meth:`~PipelineBuilder.tee`.  Branches not in this use `converter`.  `with_meta` and statistics apply
+              only to the primary branch.
+            - buffering: :class:`~BufferingPolicy`, optional.  If given, it overrides `max-buffers` and `drop` of
+              the primary (decoded) `appsink` of the pipeline.  Branches keep their own.
+            - state_change_timeout_secs: `float`, defaults to 20.  Starting, restarting and stopping the pipeline fail
+              with :class:`~PipelineBuildError` if its state does not change in this seconds, e.g., when a camera is
+              unreachable.  `None` means waiting forever.
+            - lazy: `bool`, defaults to false.  If true, streams generate :class:`~LazyFrame`s, which run `converter`
+              on the first access, instead of outputs of `converter`.  Their `meta` is given if `with_meta` is true.
+              `convert_secs` of statistics then excludes the conversion.  Applies only to the primary branch.
+            - decode_gate_idle_secs: `float`, defaults to 0.5.  For pipelines with
+              :meth:`~PipelineBuilder.add_decode_gate`: the gate closes at a keyframe if no one is in `capture()` and
+              the last `capture()` returned more than this seconds ago.  For :class:`~GstreamerMultiCapture` and
+              :class:`~AsyncGstreamerCapture`, waiting for the next frame counts as being in `capture()`.  It opens at the next keyframe after
+              `capture()` is called again, so the first frame after a busy period waits up to a GOP.
         """
 
         if converter is None:
@@ -30,42 +112,182 @@ class GstStreamBuilder:
         assert isinstance(
             pipeline_generator, PipelineGenerator
         ), f"pipeline_generator should be instance of PipelineGenerator, but got: {type(pipeline_generator)}"
+        if mode is None:
+            mode = AppsinkMode.PULL if pipeline_generator.is_finite() else AppsinkMode.SIGNAL
         assert isinstance(
             converter, ConverterBase
         ), f"converter should be instance of ConverterBase, but got: {type(converter)}"
+        assert isinstance(mode, AppsinkMode), f"mode should be instance of AppsinkMode, but got: {type(mode)}"
+        assert (buffering is None) or isinstance(
+            buffering, BufferingPolicy
+        ), f"buffering should be instance of BufferingPolicy, but got: {type(buffering)}"
+        assert (
+            state_change_timeout_secs is None or state_change_timeout_secs >= 0
+        ), f"state_change_timeout_secs should be non-negative, but got: {state_change_timeout_secs}"
+        assert decode_gate_idle_secs >= 0, f"decode_gate_idle_secs should be non-negative, but got: {decode_gate_idle_secs}"
+        branch_names = pipeline_generator.branch_names()
+        for name, branch_converter in branch_converters.items():
+            assert name in branch_names, f"unknown branch: {name}, branches are: {branch_names}"
+            assert isinstance(
+                branch_converter, ConverterBase
+            ), f"converter should be instance of ConverterBase, but got: {type(branch_converter)}"
 
         self._pipeline_generator = pipeline_generator
         self._converter = converter
+        self._mode = mode
+        self._buffering = buffering
+        self._options = _InnerOptions(
+            with_meta=with_meta,
+            branch_converters=dict(branch_converters),
+            state_change_timeout_secs=state_change_timeout_secs,
+            lazy=lazy,
+            decode_gate_idle_secs=decode_gate_idle_secs,
+        )
+
+    def branch_names(self) -> List[str]:
+        """
+        See :meth:`~PipelineGenerator.branch_names`.
+        """
+
+        return self._pipeline_generator.branch_names()
 
-    def start_streaming(self) -> "_GstStream":  # noqa F821 (Hey linter, see below.)
+    def is_finite(self) -> bool:
         """
+        See :meth:`~PipelineGenerator.is_finite`.
+        """
+
+        return self._pipeline_generator.is_finite()
+
+    def start_streaming(self, stats: Optional[StreamStats] = None) -> "_GstStream":  # noqa F821 (Hey linter, see below.)
+        """
+        Build a stream.  The pipeline starts when entering the returned stream, i.e., `with`.
+
+        args:
+            - stats: :class:`~StreamStats`, optional.  If given, the stream records statistics to it.
         return:
             - :class:`~_GstStream`
         exceptions:
             - :class:`~PipelineBuildError`
         """
 
+        built_pipeline = self._build()
+        inner: Union[Inner, PullInner]
+        if self._mode == AppsinkMode.SIGNAL:
+            inner = Inner(built_pipeline, self._converter, self._options)
+        elif self._mode == AppsinkMode.PULL:
+            inner = PullInner(built_pipeline, self._converter, self._options)
+        else:
+            raise RuntimeError("unreachable")
+        inner._stats = stats
+        return _GstStream(inner)
+
+    # Here, Any = ConverterBase::ConvertResult.
+    def frames(self, prefetch: int = 1, connection_lost_secs: Optional[float] = None) -> Iterator[Any]:
+        """
+        Generator of frames, usable without `actfw_core.Application`.
+
+        ```
+        for image in builder.frames(prefetch=2):
+            ...
+        ```
+
+        If `prefetch > 0`, a background thread captures and converts up to `prefetch` frames ahead, so that conversion of
+        the next frame overlaps processing of the current one.  Otherwise, frames are captured on the caller's thread.
+
+        The pipeline is built on the first `next()` and torn down when the generator finishes or is closed, e.g., by
+        `close()`, `break` or garbage collection, after joining the background thread.  Prefetched frames are discarded.
+        The generator finishes at EOS.  There are no restarts; use :class:`~GstreamerCapture` if you need them.
+
+        args:
+            - prefetch: `int`, number of frames to convert ahead, defaults to 1.
+            - connection_lost_secs: `float`, optional.  If given, raise :class:`~ConnectionLostError` if no frames
+              arrive this seconds.
+        exceptions:
+            - :class:`~PipelineBuildError`
+            - :class:`~ConnectionLostError`
+        """
+
+        assert prefetch >= 0, f"prefetch should be non-negative, but got: {prefetch}"
+
+        return _iter_frames(self, prefetch, connection_lost_secs)
+
+    def _start_streaming_dispatched(
+        self, notify: Callable[["InternalMessage"], None]  # noqa F821 (Hey linter, see below.)
+    ) -> "_GstStream":  # noqa F821 (Hey linter, see below.)
+        """
+        Same as :meth:`start_streaming`, but notifications of the stream are sent to `notify` instead of an internal
+        queue.  See :class:`~DispatchedInner`.  `mode` is ignored.
+
+        exceptions:
+            - :class:`~PipelineBuildError`
+        """
+
+        built_pipeline = self._build()
+        return _GstStream(DispatchedInner(built_pipeline, self._converter, self._options, notify))
+
+    def _build(self) -> _BuiltPipeline:
+        """
+        exceptions:
+            - :class:`~PipelineBuildError`
+        """
+
         built_pipeline_ = self._pipeline_generator.build()
         if built_pipeline_.is_err():
             raise built_pipeline_.unwrap_err()
         built_pipeline = built_pipeline_.unwrap()
-        inner = Inner(built_pipeline, self._converter)
-        return _GstStream(inner)
+
+        if self._buffering is not None:
+            props = self._buffering.appsink_props()
+            # Only the primary (decoded) sink: branches, e.g., the encoded branch for recording, keep their own.
+            for k, v in props.items():
+                built_pipeline.sink.set_property(k, v)
+
+        return built_pipeline
 
 
 class _GstStream:
-    _inner: "Inner"  # noqa F821 (Hey linter, see below.)
+    _inner: "_InnerBase"  # noqa F821 (Hey linter, see below.)
 
-    def __init__(self, inner: "Inner"):  # noqa F821 (Hey linter, see below.)
+    def __init__(self, inner: "_InnerBase"):  # noqa F821 (Hey linter, see below.)
         self._inner = inner
 
     def __enter__(self) -> "_GstStream":  # noqa F821 (Hey linter, see above.)
+        """
+        Start the pipeline and wait for it to be PLAYING.  If this fails, the pipeline is stopped.
+
+        exceptions:
+            - :class:`~PipelineBuildError`
+        """
+
         err = self._inner.start()
         if err.is_err():
             raise err.unwrap_err()
 
         return self
 
+    def _begin_start(self) -> Result[None, PipelineBuildError]:
+        """
+        First half of `__enter__`: request PLAYING without waiting.  Call :meth:`_poll_start` until it's done.
+        """
+
+        return self._inner.begin_start()
+
+    def _poll_start(self, timeout_secs: float) -> Result[bool, PipelineBuildError]:
+        """
+        Second half of `__enter__`.  Wait up to `timeout_secs` for the pipeline to be PLAYING.
+
+        returns:
+            - `True` if PLAYING, i.e., the stream is entered.  `False` if still changing state.
+        """
+
+        return self._inner.poll_start(timeout_secs)
+
+    def _abort_start(self) -> None:
+        self._inner.abort_start()
+
+    def _state_change_timeout_secs(self) -> Optional[float]:
+        return self._inner._options.state_change_timeout_secs
+
     def __exit__(self, _ex_type: Any, _ex_value: Any, _trace: Any) -> bool:  # type: ignore
         # Forgot errors in stopping pipeline.
         _err = self._inner.stop()  # noqa F841
@@ -75,19 +297,179 @@ class _GstStream:
     def is_running(self) -> bool:
         return self._inner.is_running()
 
+    @contextmanager
+    def _demand(self) -> Iterator[None]:
+        """
+        Mark demand for the decode gate while in this context, i.e., while someone waits for a frame.  `capture` does
+        it by itself.  Dispatchers of `_start_streaming_dispatched` call `capture` only after a notification, so they
+        should wrap their waits for notifications in this; otherwise the gate stays closed once it closes.
+        """
+
+        inner = self._inner
+        inner._demand_waiting = True
+        try:
+            yield
+        finally:
+            inner._demand_waiting = False
+            inner._last_demand = time.monotonic()
+
     # Here, Any = ConverterBase::ConvertResult, but we can't yet express associated types.
     # c.f. https://github.com/python/mypy/issues/7790
     def capture(self, timeout_secs: float) -> Any:
-        res = self._inner.capture(timeout_secs)
+        inner = self._inner
+        stats = inner._stats
+        with self._demand():
+            if stats is None:
+                res = inner.capture(timeout_secs)
+            else:
+                start = time.monotonic()
+                frames = stats.frames()
+                res = inner.capture(timeout_secs)
+                # Exclude conversion.
+                end = stats.last_frame_time() if stats.frames() != frames else time.monotonic()
+                stats.record_wait(end - start)  # type: ignore
         if res.is_ok():
             return res.unwrap()
         else:
             raise res.unwrap_err()
 
+    def capture_branch(self, name: str, timeout_secs: float) -> Any:
+        """
+        Capture a frame from a non-primary branch `name`.  See :meth:`~PipelineBuilder.tee`.
+
+        Each branch may be captured on its own thread, concurrently with :meth:`capture`.
+        """
+
+        res = self._inner.capture_branch(name, timeout_secs)
+        if res.is_ok():
+            return res.unwrap()
+        else:
+            raise res.unwrap_err()
+
+    def _handle_message(self, message: Any) -> None:
+        res = self._inner._handle_message(message)
+        if res.is_err():
+            raise res.unwrap_err()
+
+    def warm_restart(self, kind: WarmRestart) -> Result[None, PipelineBuildError]:
+        """
+        Restart the pipeline in place.  Pending samples and bus messages are discarded.
+
+        If this fails, the stream is not running and should be exited.
+        """
+
+        return self._inner.warm_restart(kind)
+
+
+def start_streaming_concurrently(
+    builders: Sequence[GstStreamBuilder],
+    stats: Optional[Sequence[Optional[StreamStats]]] = None,
+) -> List[_GstStream]:
+    """
+    Build streams and bring all of them to PLAYING concurrently, so that the time to start is that of the slowest one
+    rather than the sum.  Returned streams are entered, i.e., exit them by `__exit__`.
+
+    If any of them fails, all of them are stopped and the first error is raised.
+
+    args:
+        - builders: sequence of :class:`~GstStreamBuilder`
+        - stats: sequence of :class:`~StreamStats` or `None`, optional.  See :meth:`~GstStreamBuilder.start_streaming`.
+    returns:
+        - `list` of :class:`~_GstStream`
+    exceptions:
+        - :class:`~PipelineBuildError`
+    """
+
+    assert (stats is None) or len(stats) == len(builders), "stats should have the same length as builders"
+
+    streams: List[_GstStream] = []
+    try:
+        for i, builder in enumerate(builders):
+            stream = builder.start_streaming(stats=None if stats is None else stats[i])
+            streams.append(stream)
+            res = stream._begin_start()
+            if res.is_err():
+                raise res.unwrap_err()
+
+        started = time.monotonic()
+        for stream in streams:
+            timeout_secs = stream._state_change_timeout_secs()
+            remaining = None if timeout_secs is None else max(0.0, started + timeout_secs - time.monotonic())
+            done = stream._poll_start(remaining)
+            if done.is_err():
+                raise done.unwrap_err()
+            elif not done.unwrap():
+                raise PipelineBuildError(f"timed out in starting pipeline: timeout = {timeout_secs} secs")
+    except BaseException:
+        for stream in streams:
+            stream._abort_start()
+        raise
+
+    return streams
+
+
+# Timeout of capture in `GstStreamBuilder.frames()`, which bounds the time to notice the generator is closed.
+_FRAMES_POLL_SECS = 0.1
+_END_OF_FRAMES = object()
+
+
+def _iter_frames(builder: GstStreamBuilder, prefetch: int, connection_lost_secs: Optional[float]) -> Iterator[Any]:
+    with builder.start_streaming() as stream:
+        if prefetch == 0:
+            yield from _capture_frames(stream, connection_lost_secs, lambda: True)
+            return
+
+        queue: "Queue[Tuple[Any, Optional[Exception]]]" = Queue(prefetch)
+        closed = threading.Event()
+
+        def put(item: Tuple[Any, Optional[Exception]]) -> None:
+            while not closed.is_set():
+                try:
+                    queue.put(item, timeout=_FRAMES_POLL_SECS)
+                    return
+                except Full:
+                    pass
+
+        def prefetch_frames() -> None:
+            try:
+                for value in _capture_frames(stream, connection_lost_secs, lambda: not closed.is_set()):
+                    put((value, None))
+            except Exception as e:
+                put((None, e))
+            finally:
+                put((_END_OF_FRAMES, None))
+
+        thread = threading.Thread(target=prefetch_frames, name="actfw-gstreamer-prefetch", daemon=True)
+        thread.start()
+        try:
+            while True:
+                value, err = queue.get()
+                if err is not None:
+                    raise err
+                if value is _END_OF_FRAMES:
+                    return
+                yield value
+        finally:
+            closed.set()
+            thread.join()
+
+
+def _capture_frames(stream: _GstStream, connection_lost_secs: Optional[float], is_running: Callable[[], bool]) -> Iterator[Any]:
+    last_sample = time.monotonic()
+    while is_running() and stream.is_running():
+        value = stream.capture(timeout_secs=_FRAMES_POLL_SECS)
+        if value is not None:
+            last_sample = time.monotonic()
+            yield value
+        elif (connection_lost_secs is not None) and (time.monotonic() - last_sample) > connection_lost_secs:
+            raise ConnectionLostError(f"no frames for {connection_lost_secs} secs")
+
 
 class InternalMessageKind:
     FROM_NEW_SAMPLE = 0
     FROM_MESSAGE = 1
+    # Wake up the capturing thread to check the control channel.  See `_InnerBase._poll_control`.
+    WAKE = 2
 
 
 class InternalMessage(NamedTuple):
@@ -95,26 +477,64 @@ class InternalMessage(NamedTuple):
     payload: Any
 
 
-class Inner:
+class _InnerOptions(NamedTuple):
+    with_meta: bool = False
+    branch_converters: Dict[str, ConverterBase] = {}
+    state_change_timeout_secs: Optional[float] = DEFAULT_STATE_CHANGE_TIMEOUT_SECS
+    lazy: bool = False
+    decode_gate_idle_secs: float = DEFAULT_DECODE_GATE_IDLE_SECS
+
+
+# Interval to check the control channel while waiting samples in `PullInner`, which bounds fault detection latency.
+_CONTROL_POLL_SECS = 0.05
+
+
+class _InnerBase(ABC):
     _Gst: "Gst"  # type: ignore  # noqa F821
     _built_pipeline: _BuiltPipeline
     _converter: ConverterBase
-    _queue: "Queue[InternalMessage]"
+    _options: _InnerOptions
     _is_running: bool
     _bus: "Gst.Bus"  # type: ignore  # noqa F821
+    # Control channel: bus messages as `(priority, seq, posted time, message)`, lower priority first.
+    _control: "PriorityQueue[Tuple[int, int, float, Any]]"
+    _control_seq: "itertools.count[int]"
+    _control_priorities: Dict[Any, int]
+    _sequence: int
+    # PTS of the previous frame, to estimate drops.
+    _last_pts: Optional[int]
+    _stats: Optional[StreamStats]
+    # Demand of the consumer, written by the capturing thread and read by the decode gate on a GStreamer thread.
+    _demand_waiting: bool
+    _last_demand: float
+    _gate_open: bool
 
-    def __init__(self, built_pipeline: _BuiltPipeline, converter: ConverterBase):
+    def __init__(self, built_pipeline: _BuiltPipeline, converter: ConverterBase, options: _InnerOptions):
         self._Gst = _get_gst()
         self._built_pipeline = built_pipeline
         self._converter = converter
-        self._queue = Queue(1)
+        self._options = options
         self._is_running = False
-
-        self._built_pipeline.sink.connect("new-sample", self._cb_new_sample)
         self._bus = self._built_pipeline.pipeline.get_bus()
-        self._bus.add_signal_watch()
-        self._bus.connect("message::eos", self._cb_message)
-        self._bus.connect("message::error", self._cb_message)
+        self._control = PriorityQueue()
+        self._control_seq = itertools.count()
+        MessageType = self._Gst.MessageType
+        self._control_priorities = {
+            MessageType.ERROR: 0,
+            MessageType.EOS: 1,
+            MessageType.WARNING: 2,
+            MessageType.LATENCY: 3,
+            MessageType.BUFFERING: 3,
+            MessageType.QOS: 4,
+            MessageType.STATE_CHANGED: 4,
+        }
+        self._sequence = 0
+        self._last_pts = None
+        self._stats = None
+        self._demand_waiting = False
+        self._last_demand = time.monotonic()
+        self._gate_open = True
+        self._install_decode_gate()
 
     def is_running(self) -> bool:
         return self._is_running
@@ -124,46 +544,405 @@ class Inner:
         desired: "Gst.State",  # type: ignore  # noqa F821
     ) -> Result[None, PipelineBuildError]:
         """
-        Blocking function to change pipeline state to be `desired` or fail.
+        Blocking function to change pipeline state to be `desired` or fail, waiting up to
+        `state_change_timeout_secs`.
 
         args:
             - desired: One of enum `~Gst.State`.
         """
 
-        self._built_pipeline.pipeline.set_state(desired)
+        if self._built_pipeline.pipeline.set_state(desired) == self._Gst.StateChangeReturn.FAILURE:
+            return Err(PipelineBuildError(f"failed to change state of pipeline: desired = {desired}"))
+
+        res = self._wait_pipeline_state(desired, self._options.state_change_timeout_secs)
+        if res.is_err():
+            return res  # type: ignore
+        elif res.unwrap():
+            return Ok(None)
+        else:
+            return Err(
+                PipelineBuildError(
+                    f"timed out in changing state of pipeline: desired = {desired}, "
+                    f"timeout = {self._options.state_change_timeout_secs} secs"
+                )
+            )
+
+    def _wait_pipeline_state(
+        self,
+        desired: "Gst.State",  # type: ignore  # noqa F821
+        timeout_secs: Optional[float],
+    ) -> Result[bool, PipelineBuildError]:
+        """
+        Wait up to `timeout_secs` (forever if `None`) for the pending state change to `desired`.
+
+        returns:
+            - `True` if done, `False` if timed out.
+        """
+
+        Gst = self._Gst
+        timeout = Gst.CLOCK_TIME_NONE if timeout_secs is None else int(timeout_secs * Gst.SECOND)
         # Note that x is _ResultTuple of type (<Gst.StateChangeReturn>, state=<Gst.State>, pending=<Gst.State>).
-        x = self._built_pipeline.pipeline.get_state(self._Gst.CLOCK_TIME_NONE)
-        if x[0] == self._Gst.StateChangeReturn.FAILURE:
+        x = self._built_pipeline.pipeline.get_state(timeout)
+        if x[0] == Gst.StateChangeReturn.FAILURE:
             return Err(PipelineBuildError(f"failed to change state of pipeline: desired = {desired}, {x}"))
+        elif x[0] == Gst.StateChangeReturn.ASYNC:
+            # Still prerolling, e.g., waiting for data from a camera.
+            return Ok(False)
         elif x.state == desired:
-            return Ok(None)
+            # SUCCESS, or NO_PREROLL for live sources, which do not preroll in PAUSED.
+            return Ok(True)
         else:
-            raise RuntimeError("unreachable")
+            return Err(PipelineBuildError(f"unexpected state of pipeline: desired = {desired}, {x}"))
 
     def start(self) -> Result[None, PipelineBuildError]:
-        res = self._change_pipeline_state(self._Gst.State.PLAYING)
+        res = self.begin_start()
         if res.is_err():
             return res
 
-        self._is_running = True
+        timeout_secs = self._options.state_change_timeout_secs
+        done = self.poll_start(timeout_secs)
+        if done.is_err():
+            return done  # type: ignore
+        elif not done.unwrap():
+            self.abort_start()
+            return Err(PipelineBuildError(f"timed out in starting pipeline: timeout = {timeout_secs} secs"))
+        return Ok(None)
+
+    def begin_start(self) -> Result[None, PipelineBuildError]:
+        self._gate_open = True
+        if self._built_pipeline.pipeline.set_state(self._Gst.State.PLAYING) == self._Gst.StateChangeReturn.FAILURE:
+            self.abort_start()
+            return Err(PipelineBuildError(f"failed to change state of pipeline: desired = {self._Gst.State.PLAYING}"))
         return Ok(None)
 
+    def poll_start(self, timeout_secs: Optional[float]) -> Result[bool, PipelineBuildError]:
+        res = self._wait_pipeline_state(self._Gst.State.PLAYING, timeout_secs)
+        if res.is_err():
+            self.abort_start()
+        elif res.unwrap():
+            # Consumers have not captured yet.
+            self._last_demand = time.monotonic()
+            self._is_running = True
+        return res
+
+    def abort_start(self) -> None:
+        """
+        Stop a pipeline which failed to start.
+        """
+
+        self._is_running = False
+        self._teardown()
+        self._built_pipeline.pipeline.set_state(self._Gst.State.NULL)
+
     def stop(self) -> Result[None, PipelineBuildError]:
         if self._is_running:
             self._is_running = False
-            self._bus.remove_signal_watch()
+            self._teardown()
             return self._change_pipeline_state(self._Gst.State.NULL)
         else:
             return Ok(None)
 
+    def _teardown(self) -> None:
+        # All implementations use sync handlers of the bus.
+        self._bus.set_sync_handler(None)
+
+    def warm_restart(self, kind: WarmRestart) -> Result[None, PipelineBuildError]:
+        if not self._is_running:
+            return Err(PipelineBuildError("cannot warm restart a stopped pipeline"))
+
+        res = self._warm_restart(kind)
+        if res.is_err():
+            # Leave it stopped.  `stop()` is no-op after this.
+            self.abort_start()
+        return res
+
+    def _warm_restart(self, kind: WarmRestart) -> Result[None, PipelineBuildError]:
+        res = self._change_pipeline_state(self._Gst.State.READY)
+        if res.is_err():
+            return res
+
+        self._flush()
+        if kind == WarmRestart.REBUILD_SOURCE:
+            res = self._built_pipeline.rebuild_source()
+            if res.is_err():
+                return res
+
+        return self.start()
+
+    def _flush(self) -> None:
+        """
+        Discard notifications of the previous run.
+        """
+
+        while self._bus.pop() is not None:
+            pass
+        while True:
+            try:
+                self._control.get_nowait()
+            except Empty:
+                break
+        # Timestamps may start over.
+        self._last_pts = None
+
+    def _install_decode_gate(self) -> None:
+        """
+        Control the gate added by `PipelineBuilder.add_decode_gate()`, if any, by a pad probe.
+        """
+
+        gate = self._built_pipeline.pipeline.get_by_name(_DECODE_GATE_NAME)
+        if gate is not None:
+            gate.get_static_pad("src").add_probe(self._Gst.PadProbeType.BUFFER, self._cb_decode_gate)
+
+    def _cb_decode_gate(self, _pad: Any, info: Any) -> "Gst.PadProbeReturn":  # type: ignore  # noqa F821
+        Gst = self._Gst
+        if not info.get_buffer().has_flags(Gst.BufferFlags.DELTA_UNIT):
+            # Decide only at keyframes so that decoding starts at a GOP boundary.  Always open while starting, since
+            # sinks may need a buffer to preroll.
+            demanded = (
+                not self._is_running
+                or self._demand_waiting
+                or (time.monotonic() - self._last_demand <= self._options.decode_gate_idle_secs)
+            )
+            if demanded != self._gate_open:
+                logger.debug(f"decode gate {'opened' if demanded else 'closed'}")
+                self._gate_open = demanded
+            if not demanded and self._stats is not None:
+                self._stats.record_gated_gop()
+        return Gst.PadProbeReturn.OK if self._gate_open else Gst.PadProbeReturn.DROP
+
+    def _install_control_channel(self) -> None:
+        """
+        Route bus messages to the control channel by a sync handler, i.e., on the posting thread, without a GLib main
+        loop.  The channel is unbounded, so posting never blocks.  Remove it by `_teardown`.
+        """
+
+        self._bus.set_sync_handler(self._cb_sync_control)
+
+    def _cb_sync_control(self, _: Any, message: Any) -> "Gst.BusSyncReply":  # type: ignore  # noqa F821
+        priority = self._control_priorities.get(message.type)
+        if priority is not None:
+            self._control.put((priority, next(self._control_seq), time.monotonic(), message))
+            if priority <= 1:
+                self._wake()
+        # No one pops this bus.
+        return self._Gst.BusSyncReply.DROP
+
+    def _wake(self) -> None:
+        """
+        Wake up the capturing thread waiting samples.  Called on GStreamer threads when a fatal message is posted.
+        """
+
+        pass
+
+    def _poll_control(self) -> Optional[Result[Optional[Any], Exception]]:
+        """
+        Handle pending messages in the control channel, most urgent first.
+
+        returns:
+            - `None` if capturing can continue, or the result of `capture` for EOS/ERROR.
+        """
+
+        while True:
+            try:
+                priority, _, posted, message = self._control.get_nowait()
+            except Empty:
+                return None
+
+            if priority <= 1:
+                if self._stats is not None:
+                    self._stats.record_fault_detection(time.monotonic() - posted)
+                return self._handle_message(message)
+            self._handle_control_message(message)
+
+    def _handle_control_message(self, message: Any) -> None:
+        """
+        Handle non-fatal bus messages.
+        """
+
+        MessageType = self._Gst.MessageType
+        if message.type == MessageType.WARNING:
+            err, debug = message.parse_warning()
+            logger.warning(f"warning from {message.src.get_name()}: {err.message} ({debug})")
+            if self._stats is not None:
+                self._stats.record_bus_warning()
+        elif message.type == MessageType.LATENCY:
+            # Latency of some element changed.
+            # c.f. https://gstreamer.freedesktop.org/documentation/additional/design/latency.html
+            self._built_pipeline.pipeline.recalculate_latency()
+        elif message.type == MessageType.BUFFERING:
+            logger.debug(f"buffering {message.parse_buffering()}% by {message.src.get_name()}")
+        elif message.type == MessageType.QOS:
+            logger.debug(f"QoS from {message.src.get_name()}: {message.parse_qos_stats()}")
+        elif message.type == MessageType.STATE_CHANGED:
+            if message.src == self._built_pipeline.pipeline:
+                old, new, _pending = message.parse_state_changed()
+                logger.debug(f"pipeline state changed: {old.value_nick} -> {new.value_nick}")
+        else:
+            raise RuntimeError("unreachable")
+
+    @abstractmethod
     def capture(self, timeout_secs: float) -> Result[Optional[Any], Exception]:
+        """
+        Wait a sample of the primary branch for at most `timeout_secs` and convert it.
+
+        returns:
+            - `Ok(None)` if timed out or stopped by EOS
+            - :class:`~Exception`, e.g., :class:`~ConnectionLostError` for bus ERROR
+        """
+
+        raise NotImplementedError()
+
+    def capture_branch(self, name: str, timeout_secs: float) -> Result[Optional[Any], Exception]:
+        sink = self._built_pipeline.sinks.get(name)
+        if sink is None:
+            return Err(ValueError(f"unknown branch: {name}"))
+        if sink is self._built_pipeline.sink:
+            return Err(ValueError(f"branch {name} is the primary stream.  Use `capture()`."))
+
+        sample = sink.emit("try-pull-sample", int(timeout_secs * self._Gst.SECOND))
+        if sample is None:
+            return Ok(None)
+        else:
+            return self._options.branch_converters.get(name, self._converter).convert_sample(sample)  # type: ignore
+
+    def _deliver(self, sample: "GstSample") -> Result[Optional[Any], Exception]:  # type: ignore  # noqa F821
+        """
+        Convert a pulled sample.
+        """
+
+        capture_time = time.monotonic()
+        self._sequence += 1
+        lazy = self._options.lazy
+        if lazy:
+            res = None
+        else:
+            res = self._converter.convert_sample(sample)
+        convert_secs = time.monotonic() - capture_time
+
+        stats = self._stats
+        if (not self._options.with_meta) and (stats is None):
+            return Ok(LazyFrame(sample, self._converter)) if lazy else res  # type: ignore
+
+        buf = sample.get_buffer()
+        pts = _clock_time_or_none(self._Gst, buf.pts)
+        duration = _clock_time_or_none(self._Gst, buf.duration)
+        dropped_appsink = self._count_drops(pts, duration)
+        # Samples are pulled from `appsink` one by one and never discarded after that.  Notifications of `new-sample`
+        # may be coalesced, but the samples stay in `appsink`.
+        dropped_queue = 0
+        if stats is not None:
+            stats.record_frame(capture_time, convert_secs, dropped_appsink, dropped_queue)
+
+        meta = None
+        if self._options.with_meta:
+            meta = self._make_meta(sample, buf, pts, duration, capture_time, dropped_appsink, dropped_queue)
+        if lazy:
+            return Ok(LazyFrame(sample, self._converter, meta))
+        if (meta is None) or res.is_err():  # type: ignore
+            return res  # type: ignore
+        return Ok(FrameEnvelope(res.unwrap(), meta))  # type: ignore
+
+    def _count_drops(self, pts: Optional[int], duration: Optional[int]) -> int:
+        """
+        Estimate frames dropped at `appsink` from the gap of PTS to the previous call, in all modes.
+        Arrivals of samples are not counted, since `appsink` may hold several samples not pulled yet.
+
+        returns:
+            - Number of frames dropped since the previous call.  0 if PTS or duration is unknown.
+        """
+
+        last_pts = self._last_pts
+        self._last_pts = pts
+        if (pts is None) or (last_pts is None) or (not duration):
+            return 0
+        return max(0, round((pts - last_pts) / duration) - 1)
+
+    def _make_meta(
+        self,
+        sample: "GstSample",  # type: ignore  # noqa F821
+        buf: "GstBuffer",  # type: ignore  # noqa F821
+        pts: Optional[int],
+        duration: Optional[int],
+        capture_time: float,
+        dropped_appsink: int,
+        dropped_queue: int,
+    ) -> FrameMeta:
+        Gst = self._Gst
+
+        running_time = None
+        if pts is not None:
+            running_time = _clock_time_or_none(Gst, sample.get_segment().to_running_time(Gst.Format.TIME, pts))
+        pipeline = self._built_pipeline.pipeline
+        clock = pipeline.get_clock()
+        pipeline_time = None if clock is None else clock.get_time() - pipeline.get_base_time()
+
+        return FrameMeta(
+            pts=pts,
+            dts=_clock_time_or_none(Gst, buf.dts),
+            duration=duration,
+            running_time=running_time,
+            pipeline_time=pipeline_time,
+            capture_time=capture_time,
+            sequence=self._sequence,
+            dropped_appsink=dropped_appsink,
+            dropped_queue=dropped_queue,
+        )
+
+    def _handle_message(self, message: Any) -> Result[Optional[Any], Exception]:
+        if message.type == self._Gst.MessageType.EOS:
+            self.stop()
+            return Ok(None)
+        elif message.type == self._Gst.MessageType.ERROR:
+            # Restart handlers decide whether to restart, as for timeouts.
+            err, debug = message.parse_error()
+            e = ConnectionLostError(f"error from {message.src.get_name()}: {err.message} ({debug})")
+            e.__cause__ = err
+            return Err(e)
+        else:
+            raise RuntimeError("unreachable")
+
+
+class Inner(_InnerBase):
+    """
+    Implementation of :class:`~AppsinkMode.SIGNAL`.
+    """
+
+    _queue: "Queue[InternalMessage]"
+
+    def __init__(self, built_pipeline: _BuiltPipeline, converter: ConverterBase, options: _InnerOptions):
+        super().__init__(built_pipeline, converter, options)
+        # One token for each sample `appsink` can hold, so that no sample is left without a token.  (0 = unbounded)
+        self._queue = Queue(self._built_pipeline.sink.get_property("max-buffers"))
+
+        self._built_pipeline.sink.set_property("emit-signals", True)
+        self._built_pipeline.sink.connect("new-sample", self._cb_new_sample)
+        self._install_control_channel()
+
+    def _flush(self) -> None:
+        super()._flush()
+        while True:
+            try:
+                self._queue.get_nowait()
+            except Empty:
+                break
+
+    def capture(self, timeout_secs: float) -> Result[Optional[Any], Exception]:
+        # Control channel first, so that errors are not behind samples.
+        res = self._poll_control()
+        if res is not None:
+            return res
+
         im: Optional[InternalMessage]
         try:
             im = self._queue.get(block=True, timeout=timeout_secs)
         except Empty:
             im = None
 
-        if im is None:
+        res = self._poll_control()
+        if res is not None:
+            return res
+
+        if (im is None) or (im.kind == InternalMessageKind.WAKE):
             return Ok(None)
         elif im.kind == InternalMessageKind.FROM_NEW_SAMPLE:
             # Note that there is a case we cannot get sample via `pull-sample` while got `new-sample` signal:
@@ -178,20 +957,13 @@ class Inner:
             #
             # While lots of examples (e.g., https://gstreamer.freedesktop.org/documentation/tutorials/basic/short-cutting-the-pipeline.html)
             # emit `pull-sample` in `new-sample` callback, we use this decoupling because this affects performance in python case.
-            sample = self._built_pipeline.sink.emit("pull-sample")
+            # So, we use `try-pull-sample` without waiting, which does not block in this case.
+            # See also `PullInner`, which has no such race.
+            sample = self._built_pipeline.sink.emit("try-pull-sample", 0)
             if sample is None:
                 return Ok(None)
             else:
-                return self._converter.convert_sample(sample)
-        elif im.kind == InternalMessageKind.FROM_MESSAGE:
-            message = im.payload
-            if message.type == self._Gst.MessageType.EOS:
-                self.stop()
-                return Ok(None)
-            elif message.type == self._Gst.MessageType.ERROR:
-                return Err(Exception(message))
-            else:
-                raise RuntimeError("unreachable")
+                return self._deliver(sample)
         else:
             raise RuntimeError("unreachable")
 
@@ -200,12 +972,117 @@ class Inner:
         try:
             self._queue.put_nowait(im)
         except Full:
+            # Coalesced: as many tokens as samples `appsink` holds are pending.  If `appsink` dropped one for this,
+            # it is counted from PTS.
             pass
         return self._Gst.FlowReturn.OK
 
-    def _cb_message(self, _: Any, message: Any):  # type: ignore
-        im = InternalMessage(InternalMessageKind.FROM_MESSAGE, message)
-        self._queue.put(im)
+    def _wake(self) -> None:
+        try:
+            self._queue.put_nowait(InternalMessage(InternalMessageKind.WAKE, None))
+        except Full:
+            # The capturing thread does not wait.
+            pass
+
+
+class PullInner(_InnerBase):
+    """
+    Implementation of :class:`~AppsinkMode.PULL`.
+
+    The capturing thread blocks on `try-pull-sample` and polls the control channel, so that there are no Python
+    callbacks on GStreamer threads other than for bus messages, and no GIL handoffs other than the one in
+    `try-pull-sample` itself.  Waiting is sliced by `_CONTROL_POLL_SECS` to detect faults in time.
+    """
+
+    def __init__(self, built_pipeline: _BuiltPipeline, converter: ConverterBase, options: _InnerOptions):
+        super().__init__(built_pipeline, converter, options)
+
+        self._built_pipeline.sink.set_property("emit-signals", False)
+        self._install_control_channel()
+
+    def capture(self, timeout_secs: float) -> Result[Optional[Any], Exception]:
+        deadline = time.monotonic() + timeout_secs
+        while True:
+            res = self._poll_control()
+            if res is not None:
+                return res
+
+            remaining = max(0.0, deadline - time.monotonic())
+            slice_secs = min(remaining, _CONTROL_POLL_SECS)
+            sample = self._built_pipeline.sink.emit("try-pull-sample", int(slice_secs * self._Gst.SECOND))
+            if sample is not None:
+                return self._deliver(sample)
+            if remaining <= slice_secs:
+                break
+
+        # Timed out or EOS.  Note that `appsink` posts EOS after all samples are pulled (`wait-on-eos`).
+        res = self._poll_control()
+        if res is not None:
+            return res
+        return Ok(None)
+
+
+class DispatchedInner(_InnerBase):
+    """
+    Implementation for a dispatcher shared by streams, e.g., :class:`~GstreamerMultiCapture`.
+
+    `new-sample` and bus messages (EOS/ERROR) are forwarded to `notify` on GStreamer threads.  The dispatcher then
+    calls `capture` or `_handle_message` on its own thread.  Notifications of `new-sample` are coalesced: there is at
+    most one outstanding notification per stream, so a slow dispatcher does not accumulate them.
+    """
+
+    _notify: Callable[[InternalMessage], None]
+    _notified: bool
+    # Whether `appsink` may hold more than one sample.  Then a notification may stand for several samples.
+    _may_hold_many: bool
+
+    def __init__(
+        self,
+        built_pipeline: _BuiltPipeline,
+        converter: ConverterBase,
+        options: _InnerOptions,
+        notify: Callable[[InternalMessage], None],
+    ):
+        super().__init__(built_pipeline, converter, options)
+        self._notify = notify
+        self._notified = False
+        self._may_hold_many = self._built_pipeline.sink.get_property("max-buffers") != 1
+
+        self._built_pipeline.sink.set_property("emit-signals", True)
+        self._built_pipeline.sink.connect("new-sample", self._cb_new_sample)
+        # Sync handler does not need a GLib main loop, unlike `add_signal_watch()`.
+        self._bus.set_sync_handler(self._cb_sync_message)
+
+    def _flush(self) -> None:
+        super()._flush()
+        self._notified = False
+
+    def capture(self, timeout_secs: float) -> Result[Optional[Any], Exception]:
+        # Clear first so that a sample arriving during pulling is notified again.
+        self._notified = False
+        sample = self._built_pipeline.sink.emit("try-pull-sample", int(timeout_secs * self._Gst.SECOND))
+        if sample is None:
+            return Ok(None)
+        else:
+            if self._may_hold_many:
+                # Samples may remain.  Come again; it costs an empty pull at worst.
+                self._notify_new_sample()
+            return self._deliver(sample)
+
+    def _cb_new_sample(self, _: Any) -> "Gst.FlowReturn":  # type: ignore  # noqa F821
+        self._notify_new_sample()
+        return self._Gst.FlowReturn.OK
+
+    def _notify_new_sample(self) -> None:
+        if not self._notified:
+            self._notified = True
+            self._notify(InternalMessage(InternalMessageKind.FROM_NEW_SAMPLE, None))
+
+    def _cb_sync_message(self, _: Any, message: Any) -> "Gst.BusSyncReply":  # type: ignore  # noqa F821
+        if message.type in (self._Gst.MessageType.EOS, self._Gst.MessageType.ERROR):
+            self._notify(InternalMessage(InternalMessageKind.FROM_MESSAGE, message))
+        # No one pops this bus.
+        return self._Gst.BusSyncReply.DROP
 
 
 # For debug.
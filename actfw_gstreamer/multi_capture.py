@@ -0,0 +1,311 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import time
+from contextlib import ExitStack
+from queue import Empty, Queue
+from typing import Any, List, NamedTuple, Optional, Sequence, Tuple
+
+from actfw_core.task import Producer
+
+from .gstreamer.exception import ConnectionLostError, PipelineBuildError
+from .gstreamer.stream import GstStreamBuilder, InternalMessage, InternalMessageKind, _GstStream
+from .restart_handler import Restart, RestartAction, RestartHandlerBase, Stop
+
+__all__ = [
+    "TaggedFrame",
+    "GstreamerMultiCapture",
+]
+
+
+# Interval to check timeouts of streams.
+_TICK_SECS = 0.1
+
+
+class TaggedFrame(NamedTuple):
+    """
+    A frame generated by :class:`~GstreamerMultiCapture` or :class:`~GstreamerProcessPoolCapture`.
+    """
+
+    # Index of `builders` given to :class:`~GstreamerMultiCapture`, or `recipes` to
+    # :class:`~GstreamerProcessPoolCapture`.
+    stream_id: int
+    # Here, Any = ConverterBase::ConvertResult.
+    value: Any
+
+
+class _Slot:
+    """
+    State of a stream in :class:`~GstreamerMultiCapture`.
+    """
+
+    stream_id: int
+    builder: GstStreamBuilder
+    restart_handler: RestartHandlerBase
+    connection_lost_threshold: Optional[float]
+    stream: Optional[_GstStream]
+    # Incremented on every (re)start.  Notifications from older pipelines are ignored.
+    generation: int
+    # Deadline to be PLAYING while starting, `None` otherwise.
+    starting_deadline: Optional[float]
+    # When to start again after `Restart.delay_secs`, `None` if not waiting.
+    restart_at: Optional[float]
+    last_sample: float
+    first_frame_pending: bool
+    closed: bool
+    error: Optional[Exception]
+
+    def __init__(self, stream_id: int, builder: GstStreamBuilder, restart_handler: RestartHandlerBase) -> None:
+        self.stream_id = stream_id
+        self.builder = builder
+        self.restart_handler = restart_handler
+        self.connection_lost_threshold = restart_handler.connection_lost_secs_threshold()
+        self.stream = None
+        self.generation = 0
+        self.starting_deadline = None
+        self.restart_at = None
+        self.last_sample = 0.0
+        self.first_frame_pending = False
+        self.closed = False
+        self.error = None
+
+
+class GstreamerMultiCapture(Producer[TaggedFrame]):
+    _builders: List[GstStreamBuilder]
+    _restart_handlers: List[RestartHandlerBase]
+    _queue: "Queue[Tuple[int, int, InternalMessage]]"
+    _slots: List[_Slot]
+
+    def __init__(self, builders: Sequence[GstStreamBuilder], restart_handlers: Sequence[RestartHandlerBase]):
+        """
+        Captured Frame Producer using GStreamer, which hosts many streams on a single thread.
+
+        Generates :class:`~TaggedFrame`s, i.e., outputs of `ConverterBase` of each builder tagged with stream id.
+
+        All streams share one dispatcher: `new-sample` signals and bus messages of all pipelines are forwarded to one
+        queue, and this task pulls and converts samples as they get ready.  There are no per-stream threads, bus
+        signal watches or polling loops.
+
+        Pipelines are started without blocking: they go to PLAYING concurrently, and a slow or unreachable source
+        delays only its own stream.  A pipeline not PLAYING within `state_change_timeout_secs` of its builder is
+        treated as :class:`~PipelineBuildError`.
+
+        Each stream is restarted independently according to its own restart handler.  If a restart handler says
+        :class:`~Stop` (or raises), only that stream is closed.  Streams of finite pipelines (see
+        :meth:`~PipelineGenerator.is_finite`), e.g., `preconfigured_pipeline.file()`, are closed at EOS without
+        restarting.  This task stops when all streams are closed, and re-raises the first error raised by restart
+        handlers, if any.
+
+        `mode` of builders is ignored.
+
+        args:
+            - builders: sequence of :class:`~GstStreamBuilder`
+            - restart_handlers: sequence of :class:`~RestartHandlerBase`, one for each builder
+        """
+
+        builders = list(builders)
+        restart_handlers = list(restart_handlers)
+
+        assert len(builders) > 0, "builders should not be empty"
+        assert len(builders) == len(
+            restart_handlers
+        ), f"builders and restart_handlers should have the same length, but got: {len(builders)}, {len(restart_handlers)}"
+        for builder in builders:
+            assert isinstance(
+                builder, GstStreamBuilder
+            ), f"builder should be instance of GstStreamBuilder, but got: {type(builder)}"
+        for restart_handler in restart_handlers:
+            assert isinstance(
+                restart_handler, RestartHandlerBase
+            ), f"restart_handler should be instance of RestartHandler, but got: {type(restart_handler)}"
+
+        super().__init__()
+
+        self._builders = builders
+        self._restart_handlers = restart_handlers
+        self._queue = Queue()
+        self._slots = []
+
+    def run(self) -> None:
+        self._slots = [_Slot(i, b, h) for (i, (b, h)) in enumerate(zip(self._builders, self._restart_handlers))]
+
+        try:
+            for slot in self._slots:
+                self._start(slot)
+
+            while self._is_running() and not all(slot.closed for slot in self._slots):
+                try:
+                    # Waiting here means the consumer wants frames: demand for decode gates.
+                    with ExitStack() as demand:
+                        for slot in self._slots:
+                            if slot.stream is not None:
+                                demand.enter_context(slot.stream._demand())
+                        stream_id, generation, im = self._queue.get(timeout=_TICK_SECS)
+                except Empty:
+                    pass
+                else:
+                    self._dispatch(self._slots[stream_id], generation, im)
+
+                self._check_starting()
+                self._check_timeouts()
+                self._check_restarts()
+
+            if all(slot.closed for slot in self._slots):
+                for slot in self._slots:
+                    if slot.error is not None:
+                        raise slot.error
+        finally:
+            for slot in self._slots:
+                self._close_stream(slot)
+            self.stop()
+
+    def _start(self, slot: _Slot) -> None:
+        """
+        Build a pipeline and request PLAYING without waiting.  See :meth:`_check_starting`.
+        Deferred to :meth:`_check_restarts` while waiting `Restart.delay_secs`.
+        """
+
+        while self._is_running() and not slot.closed:
+            if slot.restart_at is not None:
+                if time.monotonic() < slot.restart_at:
+                    return
+                slot.restart_at = None
+
+            slot.generation += 1
+            notify = lambda im, stream_id=slot.stream_id, generation=slot.generation: self._queue.put(  # noqa E731
+                (stream_id, generation, im)
+            )
+            try:
+                stream = slot.builder._start_streaming_dispatched(notify)
+                res = stream._begin_start()
+                if res.is_err():
+                    raise res.unwrap_err()
+            except PipelineBuildError as e:
+                logger.debug(e)
+
+                self._handle_action(slot, e, lambda e=e: slot.restart_handler.pipeline_build_error(e))
+                continue
+
+            now = time.monotonic()
+            timeout_secs = stream._state_change_timeout_secs()
+            slot.stream = stream
+            slot.starting_deadline = float("inf") if timeout_secs is None else now + timeout_secs
+            slot.last_sample = now
+            slot.first_frame_pending = True
+            return
+
+    def _check_starting(self) -> None:
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.stream is None or slot.starting_deadline is None:
+                continue
+
+            res = slot.stream._poll_start(0)
+            if res.is_err():
+                self._start_failed(slot, res.unwrap_err())
+            elif res.unwrap():
+                slot.starting_deadline = None
+                slot.last_sample = now
+            elif now > slot.starting_deadline:
+                self._start_failed(slot, PipelineBuildError(f"stream {slot.stream_id}: timed out in starting pipeline"))
+
+    def _start_failed(self, slot: _Slot, err: PipelineBuildError) -> None:
+        logger.debug(err)
+
+        assert slot.stream is not None
+        slot.stream._abort_start()
+        slot.stream = None
+        slot.starting_deadline = None
+        self._handle_action(slot, err, lambda err=err: slot.restart_handler.pipeline_build_error(err))
+        if not slot.closed:
+            self._start(slot)
+
+    def _dispatch(self, slot: _Slot, generation: int, im: InternalMessage) -> None:
+        if slot.stream is None or slot.generation != generation:
+            return
+
+        try:
+            if im.kind == InternalMessageKind.FROM_NEW_SAMPLE:
+                value = slot.stream.capture(timeout_secs=0)
+                if value is not None:
+                    slot.last_sample = time.monotonic()
+                    if slot.first_frame_pending:
+                        slot.first_frame_pending = False
+                        slot.restart_handler.streaming_started()
+                    self._outlet(TaggedFrame(slot.stream_id, value))
+            elif im.kind == InternalMessageKind.FROM_MESSAGE:
+                slot.stream._handle_message(im.payload)
+                if not slot.stream.is_running():
+                    if slot.builder.is_finite():
+                        # EOS, i.e., completion.  Close this stream without restarting.
+                        self._close_stream(slot)
+                        slot.closed = True
+                        return
+                    raise ConnectionLostError(f"stream {slot.stream_id}: EOS")
+            else:
+                raise RuntimeError("unreachable")
+        except Exception as e:
+            # Errors from the pipeline, e.g., bus ERROR.  Only this stream is affected.
+            if slot.starting_deadline is not None:
+                self._start_failed(slot, PipelineBuildError(f"stream {slot.stream_id}: {e}"))
+            elif isinstance(e, ConnectionLostError):
+                self._connection_lost(slot, e)
+            else:
+                logger.debug(e)
+                self._connection_lost(slot, ConnectionLostError(f"stream {slot.stream_id}: {e}"))
+
+    def _check_timeouts(self) -> None:
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.stream is None or slot.starting_deadline is not None or slot.connection_lost_threshold is None:
+                continue
+            if (now - slot.last_sample) > slot.connection_lost_threshold:
+                self._connection_lost(slot, ConnectionLostError(f"stream {slot.stream_id}: no frames"))
+
+    def _check_restarts(self) -> None:
+        now = time.monotonic()
+        for slot in self._slots:
+            if slot.stream is None and not slot.closed and slot.restart_at is not None and now >= slot.restart_at:
+                self._start(slot)
+
+    def _connection_lost(self, slot: _Slot, err: ConnectionLostError) -> None:
+        logger.debug(err)
+
+        self._close_stream(slot)
+        self._handle_action(slot, err, lambda err=err: slot.restart_handler.connection_lost(err))
+        if not slot.closed:
+            self._start(slot)
+
+    def _handle_action(self, slot: _Slot, err: Exception, f: Any) -> None:
+        """
+        Ask restart handler of `slot` by `f` and close `slot` unless :class:`~Restart`.
+        """
+
+        action: RestartAction
+        try:
+            action = f()
+        except Exception as e:
+            logger.error(f"stream {slot.stream_id}: restart handler gave up: {e}")
+            slot.closed = True
+            slot.error = e
+            return
+
+        if isinstance(action, Stop):
+            slot.closed = True
+        elif isinstance(action, Restart):
+            if action.delay_secs > 0:
+                slot.restart_at = time.monotonic() + action.delay_secs
+        else:
+            raise RuntimeError("unreachable")
+
+    def _close_stream(self, slot: _Slot) -> None:
+        stream = slot.stream
+        slot.stream = None
+        slot.starting_deadline = None
+        if stream is not None:
+            # Also stops a starting pipeline.
+            stream._abort_start()
@@ -0,0 +1,478 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import multiprocessing
+import os
+import pickle
+import time
+from multiprocessing.process import BaseProcess
+from queue import Empty
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from actfw_core.task import Producer
+
+from .capture import GstreamerCapture
+from .gstreamer.stream import GstStreamBuilder
+from .multi_capture import TaggedFrame
+from .restart_handler import RestartHandlerBase
+from .shm import ShmFrameReader, ShmFrameWriter
+
+__all__ = [
+    "StreamRecipe",
+    "GstreamerProcessPoolCapture",
+]
+
+
+# Interval to check workers and their events.
+_TICK_SECS = 0.1
+# Interval to poll rings while none of them has a frame.
+_POLL_SECS = 0.001
+# Delay before restarting a crashed worker, so that a crash loop does not spin.
+_WORKER_RESTART_DELAY_SECS = 1.0
+# Seconds to wait for a worker to exit before killing it.
+_WORKER_STOP_TIMEOUT_SECS = 5.0
+
+
+class StreamRecipe(NamedTuple):
+    """
+    Definition of a stream of :class:`~GstreamerProcessPoolCapture`, which is sent to worker processes.
+
+    Pipelines can't be sent to other processes, so factories are sent and called in workers instead.  They should be
+    picklable, e.g., module-level functions or `functools.partial` of them.
+    """
+
+    # Returns a :class:`~GstStreamBuilder` whose converter generates frames accepted by :class:`~ShmFrameWriter`,
+    # e.g., :class:`~ConverterNumPy`.
+    builder_factory: Callable[[], GstStreamBuilder]
+    # Returns a :class:`~RestartHandlerBase` of the stream.
+    restart_handler_factory: Callable[[], RestartHandlerBase]
+    # Maximum bytes of a frame, e.g., `width * height * 3` for RGB.
+    slot_bytes: int
+    n_slots: int = 4
+
+
+class _RingCapture(GstreamerCapture):
+    """
+    :class:`~GstreamerCapture` in a worker, which writes frames to a ring instead of output queues.
+
+    The pipeline restarts in the worker on bus ERROR or lost frames as the restart handler says, and the stream is
+    closed only when the handler stops or gives up, which is recorded in :attr:`error`.
+    """
+
+    _writer: ShmFrameWriter
+    error: Optional[Exception]
+
+    def __init__(self, builder: GstStreamBuilder, restart_handler: RestartHandlerBase, writer: ShmFrameWriter):
+        super().__init__(builder, restart_handler)
+        self._writer = writer
+        self.error = None
+
+    def run(self) -> None:
+        try:
+            super().run()
+        except Exception as e:
+            self.error = e
+        finally:
+            self._writer.close()
+
+    def _outlet(self, value: Any) -> bool:
+        self._writer.push(value)
+        return True
+
+
+def _worker_main(commands: "multiprocessing.Queue[Any]", events: "multiprocessing.Queue[Any]") -> None:
+    """
+    Entry point of worker processes, which runs a :class:`~_RingCapture` thread for each assigned stream.
+
+    args:
+        - commands: `("add", stream_id, recipe, ring_name)`, `("remove", stream_id)` or `None` to exit.
+        - events: `("removed", stream_id, None)` or `("closed", stream_id, Optional[Exception])`.
+    """
+
+    import gi  # type: ignore[import]
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst  # type: ignore[import]
+
+    Gst.init(None)
+
+    captures: Dict[int, _RingCapture] = {}
+    try:
+        while True:
+            try:
+                command = commands.get(timeout=_TICK_SECS)
+            except Empty:
+                pass
+            else:
+                if command is None:
+                    return
+                elif command[0] == "add":
+                    _, stream_id, recipe, ring_name = command
+                    try:
+                        builder = recipe.builder_factory()
+                        restart_handler = recipe.restart_handler_factory()
+                        capture = _RingCapture(builder, restart_handler, ShmFrameWriter.attach(ring_name))
+                    except Exception as e:
+                        events.put(("closed", stream_id, _picklable(e)))
+                    else:
+                        captures[stream_id] = capture
+                        capture.start()
+                elif command[0] == "remove":
+                    _, stream_id = command
+                    capture = captures.pop(stream_id, None)  # type: ignore
+                    if capture is not None:
+                        capture.stop()
+                        capture.join()
+                    events.put(("removed", stream_id, None))
+                else:
+                    raise RuntimeError("unreachable")
+
+            for stream_id, capture in list(captures.items()):
+                if not capture.is_alive():
+                    del captures[stream_id]
+                    events.put(("closed", stream_id, None if capture.error is None else _picklable(capture.error)))
+    finally:
+        for capture in captures.values():
+            capture.stop()
+        for capture in captures.values():
+            capture.join()
+
+
+def _picklable(e: Exception) -> Exception:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return RuntimeError(repr(e))
+
+
+class _Worker:
+    """
+    State of a worker process of :class:`~GstreamerProcessPoolCapture`.
+    """
+
+    worker_id: int
+    # `None` while waiting for restart.
+    process: Optional[BaseProcess]
+    # Queues are renewed on every (re)start since a crashed process may leave them broken.
+    commands: Optional["multiprocessing.Queue[Any]"]
+    events: Optional["multiprocessing.Queue[Any]"]
+    restart_at: float
+    restarts: int
+
+    def __init__(self, worker_id: int) -> None:
+        self.worker_id = worker_id
+        self.process = None
+        self.commands = None
+        self.events = None
+        self.restart_at = 0.0
+        self.restarts = 0
+
+
+class _Stream:
+    """
+    State of a stream of :class:`~GstreamerProcessPoolCapture`.
+    """
+
+    stream_id: int
+    recipe: StreamRecipe
+    # Owner of the ring, which outlives workers writing to it.
+    ring: ShmFrameWriter
+    reader: ShmFrameReader
+    # Worker running this stream, `None` if not assigned.
+    worker_id: Optional[int]
+    # Worker to run this stream after the current one stops it, `None` if not moving.
+    move_to: Optional[int]
+    frames: int
+    closed: bool
+    error: Optional[Exception]
+
+    def __init__(self, stream_id: int, recipe: StreamRecipe, latest_only: bool) -> None:
+        self.stream_id = stream_id
+        self.recipe = recipe
+        self.ring = ShmFrameWriter(recipe.slot_bytes, recipe.n_slots)
+        self.reader = ShmFrameReader(self.ring.name, latest_only=latest_only)
+        self.worker_id = None
+        self.move_to = None
+        self.frames = 0
+        self.closed = False
+        self.error = None
+
+
+class GstreamerProcessPoolCapture(Producer[TaggedFrame]):
+    _recipes: List[StreamRecipe]
+    _n_workers: int
+    _latest_only: bool
+    _context: Any
+    _workers: List[_Worker]
+    _streams: List[_Stream]
+
+    def __init__(self, recipes: Sequence[StreamRecipe], n_workers: Optional[int] = None, latest_only: bool = False):
+        """
+        Captured Frame Producer using GStreamer, which runs streams in a pool of worker processes, so that per-frame
+        Python work, e.g., converters, is not bound by the GIL of one process.
+
+        Generates :class:`~TaggedFrame`s whose `value` is a :class:`~ShmFrame`.  Each stream has a ring in shared
+        memory; a worker runs :class:`~GstreamerCapture` of the stream and writes converted frames to the ring, and
+        this task reads them without copies.  Frames may be overwritten after `n_slots` of the recipe newer frames,
+        so consumers should check :meth:`~ShmFrame.is_valid` after use or use :meth:`~ShmFrame.copy`.
+
+        Streams are restarted by their own restart handlers in workers.  A crashed worker is restarted, and its
+        streams run on other workers meanwhile.  Streams are kept balanced between live workers by their numbers;
+        moving a stream restarts its pipeline.  This task stops when all streams are closed, and re-raises the first
+        error raised by restart handlers, if any.
+
+        Workers are started by `spawn`, so the main module should be importable, i.e., guarded by
+        `if __name__ == "__main__":`.
+
+        args:
+            - recipes: sequence of :class:`~StreamRecipe`
+            - n_workers: `int`, optional.  Defaults to the number of CPUs, up to the number of streams.
+            - latest_only: `bool`, defaults to false.  See :class:`~ShmFrameReader`.
+        """
+
+        recipes = list(recipes)
+
+        assert len(recipes) > 0, "recipes should not be empty"
+        for recipe in recipes:
+            assert isinstance(recipe, StreamRecipe), f"recipe should be instance of StreamRecipe, but got: {type(recipe)}"
+        if n_workers is None:
+            n_workers = min(os.cpu_count() or 1, len(recipes))
+        assert n_workers > 0, f"n_workers should be positive, but got: {n_workers}"
+
+        super().__init__()
+
+        self._recipes = recipes
+        self._n_workers = n_workers
+        self._latest_only = latest_only
+        self._context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._streams = []
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Snapshot of workers and streams.  Can be called from any thread.
+
+        returns:
+            - `dict`
+                {
+                    'workers': [{'pid': Optional[int], 'alive': bool, 'restarts': int}, ...],
+                    'streams': [{'worker': Optional[int], 'frames': int, 'dropped': int, 'closed': bool}, ...],
+                }
+        """
+
+        workers = []
+        for worker in list(self._workers):
+            process = worker.process
+            workers.append(
+                {
+                    "pid": None if process is None else process.pid,
+                    "alive": process is not None and process.is_alive(),
+                    "restarts": worker.restarts,
+                }
+            )
+        streams = []
+        for stream in list(self._streams):
+            streams.append(
+                {
+                    "worker": stream.worker_id,
+                    "frames": stream.frames,
+                    "dropped": stream.reader.dropped(),
+                    "closed": stream.closed,
+                }
+            )
+        return {"workers": workers, "streams": streams}
+
+    def run(self) -> None:
+        try:
+            self._streams = [_Stream(i, recipe, self._latest_only) for (i, recipe) in enumerate(self._recipes)]
+            self._workers = [_Worker(i) for i in range(self._n_workers)]
+            for worker in self._workers:
+                self._start_worker(worker)
+            self._rebalance()
+
+            next_tick = time.monotonic() + _TICK_SECS
+            while self._is_running() and not all(stream.closed for stream in self._streams):
+                got = self._read_frames()
+
+                now = time.monotonic()
+                if now >= next_tick:
+                    next_tick = now + _TICK_SECS
+                    self._check_workers()
+                    self._handle_events()
+                    self._rebalance()
+
+                if not got:
+                    time.sleep(_POLL_SECS)
+
+            if all(stream.closed for stream in self._streams):
+                for stream in self._streams:
+                    if stream.error is not None:
+                        raise stream.error
+        finally:
+            self._shutdown()
+            self.stop()
+
+    def _read_frames(self) -> bool:
+        """
+        Read at most one frame from each stream, so that a fast stream does not starve others.
+
+        returns:
+            - Whether any frame was read.
+        """
+
+        got = False
+        for stream in self._streams:
+            if stream.closed:
+                continue
+            frame = stream.reader.read(timeout_secs=0)
+            if frame is not None:
+                got = True
+                stream.frames += 1
+                self._outlet(TaggedFrame(stream.stream_id, frame))
+        return got
+
+    def _start_worker(self, worker: _Worker) -> None:
+        worker.commands = self._context.Queue()
+        worker.events = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(worker.commands, worker.events),
+            name=f"actfw-gstreamer-worker-{worker.worker_id}",
+            daemon=True,
+        )
+        process.start()
+        worker.process = process
+
+    def _check_workers(self) -> None:
+        now = time.monotonic()
+        for worker in self._workers:
+            if worker.process is None:
+                if now >= worker.restart_at:
+                    logger.info(f"restarting worker {worker.worker_id}")
+                    self._start_worker(worker)
+                continue
+            if worker.process.is_alive():
+                continue
+
+            logger.error(f"worker {worker.worker_id} exited unexpectedly: exitcode = {worker.process.exitcode}")
+            # Events posted before the crash, e.g., closed streams.
+            self._handle_worker_events(worker)
+            worker.process = None
+            worker.restart_at = now + _WORKER_RESTART_DELAY_SECS
+            worker.restarts += 1
+            for stream in self._streams:
+                if stream.worker_id == worker.worker_id:
+                    stream.worker_id = None
+                    stream.move_to = None
+                elif stream.move_to == worker.worker_id:
+                    stream.move_to = None
+
+    def _handle_events(self) -> None:
+        for worker in self._workers:
+            if worker.process is not None:
+                self._handle_worker_events(worker)
+
+    def _handle_worker_events(self, worker: _Worker) -> None:
+        assert worker.events is not None
+        while True:
+            try:
+                kind, stream_id, error = worker.events.get_nowait()
+            except Empty:
+                return
+            except Exception as e:
+                # Broken by a crash.
+                logger.debug(e)
+                return
+
+            stream = self._streams[stream_id]
+            if stream.worker_id != worker.worker_id:
+                # Stale, e.g., the stream was removed twice and already assigned to another worker.
+                continue
+            if kind == "removed":
+                move_to = stream.move_to
+                stream.worker_id = None
+                stream.move_to = None
+                if move_to is not None and self._workers[move_to].process is not None:
+                    self._assign(stream, self._workers[move_to])
+            elif kind == "closed":
+                if error is not None:
+                    logger.error(f"stream {stream_id}: restart handler gave up: {error}")
+                stream.worker_id = None
+                stream.move_to = None
+                stream.closed = True
+                stream.error = error
+            else:
+                raise RuntimeError("unreachable")
+
+    def _assign(self, stream: _Stream, worker: _Worker) -> None:
+        assert worker.commands is not None
+        stream.worker_id = worker.worker_id
+        worker.commands.put(("add", stream.stream_id, stream.recipe, stream.ring.name))
+
+    def _load(self, worker: _Worker) -> int:
+        """
+        Number of streams on `worker`, where moving streams count for their destinations.
+        """
+
+        n = 0
+        for stream in self._streams:
+            if stream.closed:
+                continue
+            if stream.move_to is None:
+                n += stream.worker_id == worker.worker_id
+            else:
+                n += stream.move_to == worker.worker_id
+        return n
+
+    def _rebalance(self) -> None:
+        """
+        Assign streams without workers, and move streams from the most loaded worker to the least loaded one until
+        they differ by at most one.
+        """
+
+        alive = [worker for worker in self._workers if worker.process is not None]
+        if not alive:
+            return
+
+        for stream in self._streams:
+            if not stream.closed and stream.worker_id is None and stream.move_to is None:
+                self._assign(stream, min(alive, key=self._load))
+
+        while True:
+            src = max(alive, key=self._load)
+            dst = min(alive, key=self._load)
+            if self._load(src) - self._load(dst) <= 1:
+                return
+            candidates = [
+                stream
+                for stream in self._streams
+                if not stream.closed and stream.worker_id == src.worker_id and stream.move_to is None
+            ]
+            if not candidates:
+                return
+            stream = candidates[-1]
+            logger.info(f"moving stream {stream.stream_id} from worker {src.worker_id} to {dst.worker_id}")
+            # Started on `dst` after `src` stopped it, so that only one process writes to the ring.
+            stream.move_to = dst.worker_id
+            assert src.commands is not None
+            src.commands.put(("remove", stream.stream_id))
+
+    def _shutdown(self) -> None:
+        for worker in self._workers:
+            if worker.process is not None and worker.commands is not None:
+                worker.commands.put(None)
+        for worker in self._workers:
+            if worker.process is not None:
+                worker.process.join(_WORKER_STOP_TIMEOUT_SECS)
+                if worker.process.is_alive():
+                    logger.warning(f"worker {worker.worker_id} did not exit; killing it")
+                    worker.process.kill()
+                    worker.process.join()
+        for stream in self._streams:
+            stream.reader.close()
+            stream.ring.close()
@@ -0,0 +1,322 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Deque, List, Optional, Union
+
+from actfw_core.task import Consumer
+
+from .gstreamer.converter import EncodedFrame
+from .gstreamer.exception import PipelineBuildError
+from .gstreamer.pipeline import _link_chain, _make_element
+from .util import _get_gst
+
+__all__ = [
+    "ClipRecorder",
+]
+
+
+# Seconds to wait for a clip to be written.
+_WRITE_TIMEOUT_SECS = 30.0
+
+
+class _PendingClip:
+    frames: List[EncodedFrame]
+    # Frames with PTS up to this are included.
+    end_pts: Optional[int]
+    # Used to set `end_pts` by the first frame if the trigger has no PTS, i.e., the ring was empty.
+    post_ns: int
+    path: Path
+    future: "Future[Path]"
+
+    def __init__(self, frames: List[EncodedFrame], end_pts: Optional[int], post_ns: int, path: Path) -> None:
+        self.frames = frames
+        self.end_pts = end_pts
+        self.post_ns = post_ns
+        self.path = path
+        self.future = Future()
+
+
+class _EncodedRing:
+    """
+    Keyframe-aligned ring of encoded frames, and clips being collected.  Not thread-safe.
+
+    Frames are kept in GOPs, each of which starts with a keyframe.  The oldest GOP is dropped while the next one still
+    covers `max_secs`, so the ring always starts with a keyframe and covers at least `max_secs` if possible.
+    """
+
+    _gops: Deque[List[EncodedFrame]]
+    _max_ns: int
+    _max_bytes: int
+    _bytes: int
+    _last_pts: Optional[int]
+    _pending: List[_PendingClip]
+
+    def __init__(self, max_secs: float, max_bytes: int) -> None:
+        self._gops = deque()
+        self._max_ns = int(max_secs * 1e9)
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._last_pts = None
+        self._pending = []
+
+    def push(self, frame: EncodedFrame) -> List[_PendingClip]:
+        """
+        returns:
+            - Clips completed by `frame`.
+        """
+
+        pts = frame.pts if frame.pts is not None else self._last_pts
+
+        completed = []
+        for clip in self._pending:
+            if clip.end_pts is not None and pts is not None and pts > clip.end_pts:
+                completed.append(clip)
+            elif clip.frames or frame.keyframe:
+                if clip.end_pts is None and pts is not None:
+                    clip.end_pts = pts + clip.post_ns
+                clip.frames.append(frame)
+        self._pending = [clip for clip in self._pending if clip not in completed]
+
+        if frame.keyframe:
+            self._gops.append([frame])
+        elif self._gops:
+            self._gops[-1].append(frame)
+        else:
+            # Waiting for a keyframe.
+            return completed
+        self._bytes += len(frame.data)
+        self._last_pts = pts
+        self._trim()
+
+        return completed
+
+    def _trim(self) -> None:
+        if self._last_pts is not None:
+            horizon = self._last_pts - self._max_ns
+            while len(self._gops) >= 2 and _pts_at_or_before(self._gops[1][0], horizon):
+                self._drop_oldest()
+
+        while self._bytes > self._max_bytes and self._gops:
+            if len(self._gops) == 1:
+                logger.warning(f"a GOP exceeds {self._max_bytes} bytes; dropped until the next keyframe")
+            self._drop_oldest()
+
+    def _drop_oldest(self) -> None:
+        gop = self._gops.popleft()
+        self._bytes -= sum(len(frame.data) for frame in gop)
+
+    def trigger(self, pre_secs: float, post_secs: float, path: Path, at_pts: Optional[int]) -> _PendingClip:
+        """
+        Start collecting a clip from the last keyframe at or before `at_pts - pre_secs` to `at_pts + post_secs`.
+        `at_pts` defaults to the PTS of the newest frame.
+        """
+
+        if at_pts is None:
+            at_pts = self._last_pts
+        post_ns = int(post_secs * 1e9)
+
+        frames: List[EncodedFrame] = []
+        end_pts = None
+        if at_pts is not None:
+            start_pts = at_pts - int(pre_secs * 1e9)
+            end_pts = at_pts + post_ns
+            gops = list(self._gops)
+            first = 0
+            for i, gop in enumerate(gops):
+                if _pts_at_or_before(gop[0], start_pts):
+                    first = i
+            for gop in gops[first:]:
+                frames.extend(frame for frame in gop if frame.pts is None or frame.pts <= end_pts)
+
+        clip = _PendingClip(frames, end_pts, post_ns, path)
+        self._pending.append(clip)
+        return clip
+
+    def take_pending(self) -> List[_PendingClip]:
+        pending = self._pending
+        self._pending = []
+        return pending
+
+
+def _pts_at_or_before(frame: EncodedFrame, pts: int) -> bool:
+    return frame.pts is not None and frame.pts <= pts
+
+
+class ClipRecorder(Consumer[EncodedFrame]):
+    _lock: threading.Lock
+    _ring: _EncodedRing
+    _executor: ThreadPoolExecutor
+
+    def __init__(self, max_pre_secs: float = 10.0, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        Consumer of :class:`~EncodedFrame`s, which keeps the last `max_pre_secs` of the encoded stream in memory and
+        writes clips around events to MP4 files without decoding or encoding.
+
+        Connect it to the encoded branch, e.g., of `preconfigured_pipeline.rtsp_h264(..., record=True)`:
+
+        ```
+        builder = GstStreamBuilder(pipeline, ConverterPIL(), branch_converters={ENCODED_BRANCH: ConverterEncoded()})
+        capture = GstreamerCapture(builder, restart_handler)
+        encoded = capture.branch(ENCODED_BRANCH)
+        recorder = ClipRecorder(max_pre_secs=10)
+        app.register_task(capture)
+        app.register_task(encoded)
+        app.register_task(recorder)
+        app.connect(encoded, recorder)
+        ...
+        recorder.trigger_clip(10, 10, "event.mp4")
+        ```
+
+        Clips start at a keyframe, so they may begin up to a GOP earlier than requested.  Clips are muxed by
+        `appsrc ! h264parse ! mp4mux ! filesink` on a background thread.
+
+        args:
+            - max_pre_secs: `float`, seconds kept before triggers, defaults to 10.
+            - max_bytes: `int`, upper bound of memory for the ring, defaults to 64 MiB.
+        """
+
+        assert max_pre_secs >= 0, f"max_pre_secs should be non-negative, but got: {max_pre_secs}"
+        assert max_bytes > 0, f"max_bytes should be positive, but got: {max_bytes}"
+
+        super().__init__()
+
+        self._lock = threading.Lock()
+        self._ring = _EncodedRing(max_pre_secs, max_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def proc(self, frame: EncodedFrame) -> None:
+        self.push(frame)
+
+    def push(self, frame: EncodedFrame) -> None:
+        """
+        Add a frame.  Called by :meth:`proc`; call this directly if not running as a task.
+        """
+
+        assert isinstance(frame, EncodedFrame), f"frame should be instance of EncodedFrame, but got: {type(frame)}"
+
+        with self._lock:
+            completed = self._ring.push(frame)
+        for clip in completed:
+            self._write(clip)
+
+    def trigger_clip(
+        self,
+        pre_secs: float,
+        post_secs: float,
+        path: Union[str, Path],
+        at_pts: Optional[int] = None,
+    ) -> "Future[Path]":
+        """
+        Write the stream from `pre_secs` before to `post_secs` after a moment to `path`.  Can be called from any
+        thread.  Returns immediately; the clip is written after `post_secs` of the stream arrived.
+
+        args:
+            - pre_secs: `float`, up to `max_pre_secs`.
+            - post_secs: `float`
+            - path: path of the MP4 file.
+            - at_pts: `int`, optional.  PTS of the moment in nanoseconds, e.g., `FrameMeta.pts` of a decoded frame of
+              the same pipeline.  Defaults to the newest frame.
+        returns:
+            - `concurrent.futures.Future` of the path, which fails with :class:`~PipelineBuildError` if writing fails.
+        """
+
+        assert pre_secs >= 0, f"pre_secs should be non-negative, but got: {pre_secs}"
+        assert post_secs >= 0, f"post_secs should be non-negative, but got: {post_secs}"
+
+        with self._lock:
+            clip = self._ring.trigger(pre_secs, post_secs, Path(path), at_pts)
+        return clip.future
+
+    def cleanup(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Write clips being collected with frames so far, and wait for writing.
+        """
+
+        with self._lock:
+            pending = self._ring.take_pending()
+        for clip in pending:
+            self._write(clip)
+        self._executor.shutdown(wait=True)
+
+    def _write(self, clip: _PendingClip) -> None:
+        if not clip.future.set_running_or_notify_cancel():
+            return
+
+        def f() -> None:
+            try:
+                _write_clip(clip.frames, clip.path)
+            except Exception as e:
+                logger.error(f"failed to write clip {clip.path}: {e}")
+                clip.future.set_exception(e)
+            else:
+                clip.future.set_result(clip.path)
+
+        self._executor.submit(f)
+
+
+def _write_clip(frames: List[EncodedFrame], path: Path) -> None:
+    """
+    Mux `frames` into an MP4 file with timestamps starting from 0.
+
+    exceptions:
+        - :class:`~PipelineBuildError`
+    """
+
+    if not frames:
+        raise PipelineBuildError(f"no frames for clip: {path}")
+
+    Gst = _get_gst()
+    base = min((t for frame in frames for t in [frame.dts, frame.pts] if t is not None), default=0)
+
+    appsrc = _make_element(
+        Gst, "appsrc", {"caps": Gst.Caps.from_string(frames[0].caps), "format": Gst.Format.TIME, "is-live": False}
+    )
+    elements = [
+        appsrc,
+        _make_element(Gst, "h264parse", {}),
+        _make_element(Gst, "mp4mux", {}),
+        _make_element(Gst, "filesink", {"location": str(path)}),
+    ]
+    pipeline = Gst.Pipeline()
+    for x in elements:
+        pipeline.add(x)
+    res = _link_chain(elements)
+    if res.is_err():
+        raise res.unwrap_err()
+
+    try:
+        if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            raise PipelineBuildError(f"failed to start writing clip: {path}")
+
+        for frame in frames:
+            buf = Gst.Buffer.new_wrapped(frame.data)
+            buf.pts = Gst.CLOCK_TIME_NONE if frame.pts is None else frame.pts - base
+            buf.dts = Gst.CLOCK_TIME_NONE if frame.dts is None else frame.dts - base
+            buf.duration = Gst.CLOCK_TIME_NONE if frame.duration is None else frame.duration
+            if not frame.keyframe:
+                buf.set_flags(Gst.BufferFlags.DELTA_UNIT)
+            if appsrc.emit("push-buffer", buf) != Gst.FlowReturn.OK:
+                raise PipelineBuildError(f"failed to push a buffer to clip: {path}")
+        appsrc.emit("end-of-stream")
+
+        message = pipeline.get_bus().timed_pop_filtered(
+            int(_WRITE_TIMEOUT_SECS * Gst.SECOND), Gst.MessageType.EOS | Gst.MessageType.ERROR
+        )
+        if message is None:
+            raise PipelineBuildError(f"timed out in writing clip: {path}")
+        elif message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            raise PipelineBuildError(f"failed to write clip {path}: {err}: {debug}")
+    finally:
+        pipeline.set_state(Gst.State.NULL)
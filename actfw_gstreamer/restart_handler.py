@@ -1,5 +1,15 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import enum
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Union
+from typing import Dict, NamedTuple, Optional, Union
 
 from .gstreamer.exception import ConnectionLostError, PipelineBuildError
 
@@ -9,6 +19,9 @@ __all__ = [
     "Restart",
     "RestartHandlerBase",
     "SimpleRestartHandler",
+    "BackoffPolicy",
+    "CircuitState",
+    "BackoffRestartHandler",
 ]
 
 
@@ -17,7 +30,13 @@ class Stop:
 
 
 class Restart:
-    pass
+    # Seconds to wait before restarting.
+    delay_secs: float
+
+    def __init__(self, delay_secs: float = 0.0) -> None:
+        assert delay_secs >= 0, f"delay_secs should be non-negative, but got: {delay_secs}"
+
+        self.delay_secs = delay_secs
 
 
 RestartAction = Union[Stop, Restart]
@@ -49,6 +68,16 @@ class RestartHandlerBase(ABC):
 
         raise NotImplementedError()
 
+    def streaming_started(self) -> None:
+        """
+        Called from :meth:`~GstreamerCapture.run` when got the first frame after the pipeline (re)started.  Also
+        called likewise by :class:`~GstreamerBatchCapture`, :class:`~GstreamerMultiCapture` (for each stream),
+        :class:`~AsyncGstreamerCapture` and, in worker processes, :class:`~GstreamerProcessPoolCapture`.
+        Override this to know whether restarts succeeded.
+        """
+
+        pass
+
 
 class SimpleRestartHandler(RestartHandlerBase):
     _connection_lost_secs_threshold: int
@@ -82,3 +111,159 @@ class SimpleRestartHandler(RestartHandlerBase):
             print("suspicious connection lost.  restarting...", flush=True)
 
             return Restart()
+
+
+class BackoffPolicy(NamedTuple):
+    """
+    Policy of :class:`~BackoffRestartHandler` for a kind of errors.
+
+    The n-th consecutive failure waits `min(initial_delay_secs * multiplier ** (n - 1), max_delay_secs)`, reduced by
+    up to `jitter` of it at random, so that restarts of many streams failed at once spread out in time.
+    """
+
+    initial_delay_secs: float = 1.0
+    max_delay_secs: float = 60.0
+    multiplier: float = 2.0
+    # Fraction in [0, 1].
+    jitter: float = 0.5
+    # Consecutive failures to open the circuit.  `None` means never.
+    max_failures: Optional[int] = 10
+
+    def delay_secs(self, failures: int, rng: random.Random) -> float:
+        delay = min(self.initial_delay_secs * (self.multiplier ** (failures - 1)), self.max_delay_secs)
+        return delay * (1.0 - self.jitter * rng.random())
+
+
+class CircuitState(enum.Enum):
+    """
+    State of the circuit breaker of :class:`~BackoffRestartHandler`.
+
+    - `CLOSED`: Normal.  Restarts are delayed by :class:`~BackoffPolicy`.
+    - `OPEN`: Too many consecutive failures.  Waiting `open_secs` before trying again.
+    - `HALF_OPEN`: Trying again after `open_secs`.  The first frame closes the circuit, and a failure opens it again.
+    """
+
+    CLOSED = enum.auto()
+    OPEN = enum.auto()
+    HALF_OPEN = enum.auto()
+
+
+class BackoffRestartHandler(RestartHandlerBase):
+    _connection_lost_secs_threshold: Optional[float]
+    _policies: Dict[str, BackoffPolicy]
+    _failures: Dict[str, int]
+    _healthy_secs: float
+    _open_secs: float
+    _rng: random.Random
+    _streaming_since: Optional[float]
+    _opened_until: Optional[float]
+
+    def __init__(
+        self,
+        connection_lost_secs_threshold: Optional[float],
+        pipeline_build_error: Optional[BackoffPolicy] = None,
+        connection_lost: Optional[BackoffPolicy] = None,
+        healthy_secs: float = 60.0,
+        open_secs: float = 300.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Restart handler for production: it never gives up, but backs off.
+
+        Restarts are delayed exponentially with jitter, separately for :class:`~PipelineBuildError` and
+        :class:`~ConnectionLostError`.  Counts of failures decay, i.e., are reset, if the stream delivered frames for
+        `healthy_secs` before failing.  After `max_failures` consecutive failures, the circuit opens and restarts are
+        delayed by `open_secs`.  See :class:`~CircuitState` and :meth:`state`.
+
+        Use one instance for each stream.
+
+        args:
+            - connection_lost_secs_threshold: `float`, optional.  See
+              :meth:`~RestartHandlerBase.connection_lost_secs_threshold`.
+            - pipeline_build_error: :class:`~BackoffPolicy` for :class:`~PipelineBuildError`, defaults to `BackoffPolicy()`.
+            - connection_lost: :class:`~BackoffPolicy` for :class:`~ConnectionLostError`, defaults to `BackoffPolicy()`.
+            - healthy_secs: `float`, seconds of streaming to reset counts of failures, defaults to 60.
+            - open_secs: `float`, seconds to wait while the circuit is open, defaults to 300.
+            - seed: `int`, optional.  Seed of jitter.
+        """
+
+        if pipeline_build_error is None:
+            pipeline_build_error = BackoffPolicy()
+        if connection_lost is None:
+            connection_lost = BackoffPolicy()
+        for policy in [pipeline_build_error, connection_lost]:
+            assert isinstance(policy, BackoffPolicy), f"policy should be instance of BackoffPolicy, but got: {type(policy)}"
+            assert 0 <= policy.jitter <= 1, f"jitter should be in [0, 1], but got: {policy.jitter}"
+
+        self._connection_lost_secs_threshold = connection_lost_secs_threshold
+        self._policies = {
+            "pipeline_build_error": pipeline_build_error,
+            "connection_lost": connection_lost,
+        }
+        self._failures = dict((cause, 0) for cause in self._policies)
+        self._healthy_secs = healthy_secs
+        self._open_secs = open_secs
+        self._rng = random.Random(seed)
+        self._streaming_since = None
+        self._opened_until = None
+
+    def connection_lost_secs_threshold(self) -> Optional[float]:
+        return self._connection_lost_secs_threshold
+
+    def pipeline_build_error(self, err: PipelineBuildError) -> RestartAction:
+        return self._on_failure("pipeline_build_error", err)
+
+    def connection_lost(self, err: ConnectionLostError) -> RestartAction:
+        return self._on_failure("connection_lost", err)
+
+    def streaming_started(self) -> None:
+        self._streaming_since = time.monotonic()
+        if self.state() == CircuitState.HALF_OPEN:
+            logger.info("circuit closed: streaming recovered")
+            self._close()
+
+    def state(self) -> CircuitState:
+        """
+        Current state of the circuit breaker.  Can be called from any thread.
+        """
+
+        opened_until = self._opened_until
+        if opened_until is None:
+            return CircuitState.CLOSED
+        elif time.monotonic() < opened_until:
+            return CircuitState.OPEN
+        else:
+            return CircuitState.HALF_OPEN
+
+    def failures(self) -> Dict[str, int]:
+        """
+        Consecutive failures by cause, `'pipeline_build_error'` or `'connection_lost'`.
+        """
+
+        return dict(self._failures)
+
+    def _on_failure(self, cause: str, err: Exception) -> Restart:
+        now = time.monotonic()
+        if (self._streaming_since is not None) and (now - self._streaming_since) >= self._healthy_secs:
+            self._close()
+        self._streaming_since = None
+
+        state = self.state()
+        self._failures[cause] += 1
+        policy = self._policies[cause]
+        if state == CircuitState.HALF_OPEN or (
+            policy.max_failures is not None and self._failures[cause] >= policy.max_failures
+        ):
+            delay = self._open_secs * (1.0 - policy.jitter * self._rng.random())
+            self._opened_until = now + delay
+            logger.warning(f"circuit opened after {self._failures[cause]} failures ({cause}): {err}")
+        else:
+            delay = policy.delay_secs(self._failures[cause], self._rng)
+
+        logger.info(f"{cause}: restarting in {delay:.1f} secs: {err}")
+        return Restart(delay)
+
+    def _close(self) -> None:
+        self._opened_until = None
+        for cause in self._failures:
+            self._failures[cause] = 0
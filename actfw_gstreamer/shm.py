@@ -0,0 +1,519 @@
+import logging as _logging
+
+# noqa idiom
+if True:
+    logger = _logging.getLogger(__name__)
+    logger.addHandler(_logging.NullHandler())
+
+import contextlib
+import mmap
+import os
+import platform
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+from actfw_core.task import Consumer
+from PIL.Image import Image as PIL_Image
+
+from .gstreamer.converter import NumPyFrame
+from .gstreamer.frame import FrameEnvelope, LazyFrame
+from .util import _clock_time_or_none, _get_gst
+
+__all__ = [
+    "ShmFrame",
+    "ShmFrameWriter",
+    "ShmFrameReader",
+]
+
+
+# Layout of the ring, little-endian, for readers in other languages:
+#
+#     header (64 bytes):
+#         0   magic        4s   b"AGSR"
+#         4   version      u32  2
+#         8   n_slots      u32
+#         12  slot_bytes   u32  capacity of frame data in a slot
+#         16  last_seq     u64  sequence number of the newest complete frame, 0 if none
+#         24  closed       u32  1 if the writer is closed
+#         28  flags        u32  bit 0: slots have `checksum`
+#     slots (n_slots, each `128 + slot_bytes` rounded up to 64 bytes), i-th for frames of `(seq - 1) % n_slots == i`:
+#         0   lock         u64  odd while being written
+#         8   seq          u64  sequence number of the frame, from 1
+#         16  pts          i64  PTS in nanoseconds, -1 if none
+#         24  capture_time f64  `CLOCK_MONOTONIC` seconds when written
+#         32  format       8s   e.g. b"RGB", NUL padded, empty if unknown
+#         40  dtype        8s   `numpy.dtype.str`, e.g. b"|u1", NUL padded
+#         48  ndim         u32  up to 4
+#         52  shape        4 x u32
+#         68  checksum     u32  CRC-32 of bytes 8 to 68 of the slot followed by data if flagged, otherwise 0
+#         128 data              C-contiguous
+#
+# Slots are guarded by a sequence lock: read `lock`, then the slot, then `lock` again, and discard the read if the two
+# values differ or are odd.  Python cannot issue memory barriers, so the lock alone is sufficient only where stores
+# and loads are not reordered as it matters here, i.e., x86 (TSO).  On weakly ordered CPUs, e.g., ARM of Raspberry Pi,
+# a reader may see a stable even lock with torn contents, so writers there also write `checksum`, which readers verify
+# on copying.  It costs a pass over the frame on both sides, so it is not written on x86 by default.
+_MAGIC = b"AGSR"
+_VERSION = 2
+_HEADER = struct.Struct("<4sIIIQII")
+_HEADER_BYTES = 64
+_LAST_SEQ = struct.Struct("<Q")
+_LAST_SEQ_OFFSET = 16
+_CLOSED = struct.Struct("<I")
+_CLOSED_OFFSET = 24
+_FLAG_CHECKSUM = 1
+_SLOT_HEADER = struct.Struct("<QQqd8s8sI4II")
+_SLOT_HEADER_BYTES = 128
+_LOCK = struct.Struct("<Q")
+# Range of the slot header covered by the checksum, i.e., `seq` to `shape`.
+_CHECKED_BEGIN = 8
+_CHECKED_END = 68
+_CHECKSUM = struct.Struct("<I")
+_CHECKSUM_OFFSET = 68
+_MAX_NDIM = 4
+# Interval to check for new frames while waiting.
+_POLL_SECS = 0.001
+# CPUs on which the lock alone is sufficient.  See the layout.
+_STRONGLY_ORDERED_MACHINES = ("x86_64", "amd64", "i386", "i686")
+
+
+def _slot_stride(slot_bytes: int) -> int:
+    return (_SLOT_HEADER_BYTES + slot_bytes + 63) // 64 * 64
+
+
+class ShmFrameWriter(Consumer[Any]):
+    _name: str
+    # Owner of the ring, `None` if attached by :meth:`attach`.
+    _shm: Optional[shared_memory.SharedMemory]
+    # `memoryview` of `_shm`, or `mmap.mmap` if attached.  `None` if closed.
+    _buf: Any
+    _n_slots: int
+    _slot_bytes: int
+    _stride: int
+    _checksum: bool
+    _seq: int
+
+    def __init__(self, slot_bytes: int, n_slots: int = 4, name: Optional[str] = None, checksum: Optional[bool] = None) -> None:
+        """
+        Consumer which copies frames into a ring in shared memory, for :class:`~ShmFrameReader`s in other processes.
+
+        Accepts :class:`~NumPyFrame`, `numpy.ndarray` and `PIL.Image.Image`, optionally in :class:`~FrameEnvelope`
+        or :class:`~LazyFrame`.  Frames are copied once into a slot and released, so this should be the last consumer
+        of frames.  The writer never waits for readers; the oldest slot is overwritten.
+
+        args:
+            - slot_bytes: `int`, maximum bytes of a frame, e.g., `width * height * 3` for RGB.
+            - n_slots: `int`, defaults to 4.  Readers fall behind if they are more than `n_slots - 1` frames late.
+            - name: `str`, optional.  Name of the shared memory, which readers attach to.  Defaults to a random one.
+            - checksum: `bool`, optional.  Whether to write a CRC-32 of each frame, with which readers verify frames
+              torn on weakly ordered CPUs.  It costs a pass over the frame.  Defaults to true except on x86, where the
+              lock of the slot is exact.
+        """
+
+        assert slot_bytes > 0, f"slot_bytes should be positive, but got: {slot_bytes}"
+        assert n_slots >= 2, f"n_slots should be at least 2, but got: {n_slots}"
+
+        super().__init__()
+
+        if checksum is None:
+            checksum = platform.machine().lower() not in _STRONGLY_ORDERED_MACHINES
+        flags = _FLAG_CHECKSUM if checksum else 0
+
+        size = _HEADER_BYTES + n_slots * _slot_stride(slot_bytes)
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(self._shm.buf, 0, _MAGIC, _VERSION, n_slots, slot_bytes, 0, 0, flags)
+        self._open(self._shm.name, self._shm.buf)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmFrameWriter":
+        """
+        Attach to a ring created by another writer, possibly in another process, to take over writing.  Sequence
+        numbers continue from the last frame in the ring, and checksums are written if the ring has them.  The ring is
+        not removed by :meth:`close`.
+
+        There should be at most one writer writing to a ring at a time.
+
+        exceptions:
+            - `FileNotFoundError` if no such ring.
+            - `ValueError` if it is not a ring of a supported version.
+        """
+
+        writer = cls.__new__(cls)
+        Consumer.__init__(writer)
+        writer._shm = None
+        buf = _map(name, writable=True)
+        try:
+            writer._open(name, buf)
+        except ValueError:
+            buf.close()
+            raise
+        return writer
+
+    def _open(self, name: str, buf: Any) -> None:
+        n_slots, slot_bytes, last_seq, checksum = _read_header(buf, name)
+        self._name = name
+        self._buf = buf
+        self._n_slots = n_slots
+        self._slot_bytes = slot_bytes
+        self._stride = _slot_stride(slot_bytes)
+        self._checksum = checksum
+        self._seq = last_seq
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def proc(self, frame: Any) -> None:
+        self.push(frame)
+
+    def push(self, frame: Any) -> int:
+        """
+        Write a frame.  Called by :meth:`proc`; call this directly if not running as a task.
+
+        returns:
+            - `int`, sequence number of the frame.
+        exceptions:
+            - `ValueError` if the frame is larger than `slot_bytes` or has more than 4 dimensions.
+            - `TypeError` if the frame is not supported.
+        """
+
+        with _frame_array(frame) as (array, pts, format_):
+            if array.nbytes > self._slot_bytes:
+                raise ValueError(f"frame of {array.nbytes} bytes does not fit in a slot of {self._slot_bytes} bytes")
+            if array.ndim > _MAX_NDIM:
+                raise ValueError(f"frame should have at most {_MAX_NDIM} dimensions, but got: {array.shape}")
+
+            seq = self._seq + 1
+            offset = _HEADER_BYTES + ((seq - 1) % self._n_slots) * self._stride
+            buf = self._buf
+            (lock,) = _LOCK.unpack_from(buf, offset)
+            # Odd if a previous writer died while writing.
+            lock += lock % 2
+            _LOCK.pack_into(buf, offset, lock + 1)
+            shape = (*array.shape, *[0] * (_MAX_NDIM - array.ndim))
+            _SLOT_HEADER.pack_into(
+                buf,
+                offset,
+                lock + 1,
+                seq,
+                -1 if pts is None else pts,
+                time.monotonic(),
+                format_.encode("ascii"),
+                array.dtype.str.encode("ascii"),
+                array.ndim,
+                *shape,
+                0,
+            )
+            # Also compacts strided arrays.
+            np.copyto(np.ndarray(array.shape, array.dtype, buffer=buf, offset=offset + _SLOT_HEADER_BYTES), array)
+            if self._checksum:
+                _CHECKSUM.pack_into(buf, offset + _CHECKSUM_OFFSET, _slot_checksum(buf, offset, array.nbytes))
+            _LOCK.pack_into(buf, offset, lock + 2)
+            _LAST_SEQ.pack_into(buf, _LAST_SEQ_OFFSET, seq)
+            self._seq = seq
+
+        return seq
+
+    def cleanup(self) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Mark the ring closed and remove it.  Readers attached to it can still read the frames written so far.
+        Writers made by :meth:`attach` only detach from the ring.
+        """
+
+        buf = self._buf
+        if buf is None:
+            return
+        self._buf = None
+        if self._shm is None:
+            buf.close()
+        else:
+            _CLOSED.pack_into(buf, _CLOSED_OFFSET, 1)
+            del buf
+            self._shm.close()
+            self._shm.unlink()
+
+
+@contextlib.contextmanager
+def _frame_array(value: Any) -> Iterator[Tuple[np.ndarray, Optional[int], str]]:  # type: ignore
+    """
+    Yields `(array, pts, format)` of a frame and releases the frame after use.
+    """
+
+    if isinstance(value, FrameEnvelope):
+        with _frame_array(value.value) as (array, _, format_):
+            yield (array, value.meta.pts, format_)
+    elif isinstance(value, LazyFrame):
+        try:
+            with _frame_array(value.value) as (array, pts, format_):
+                if pts is None:
+                    pts = _clock_time_or_none(_get_gst(), value.sample.get_buffer().pts)
+                yield (array, pts, format_)
+        finally:
+            value.release()
+    elif isinstance(value, NumPyFrame):
+        with value:
+            yield (value.array, _clock_time_or_none(_get_gst(), value.sample.get_buffer().pts), value.format.name)
+    elif isinstance(value, np.ndarray):
+        yield (value, None, "")
+    elif isinstance(value, PIL_Image):
+        yield (np.asarray(value), None, value.mode)
+    else:
+        raise TypeError(f"frame should be NumPyFrame, numpy.ndarray or PIL.Image.Image, but got: {type(value)}")
+
+
+class ShmFrame:
+    """
+    A frame read by :class:`~ShmFrameReader`.
+
+    :attr:`array` is a read-only view onto the slot, i.e., no copy is made, and the writer may overwrite it at any
+    time.  Use the array, then check :meth:`is_valid`, and discard what was computed from it if false.  Or use
+    :meth:`copy`.
+
+    :meth:`is_valid` checks the lock of the slot only, which is exact on x86 but best effort on weakly ordered CPUs,
+    e.g., ARM.  There, prefer :meth:`copy`, which also verifies the copy by the checksum of the slot if the writer
+    wrote it.
+    """
+
+    seq: int
+    # PTS in nanoseconds, `None` if the buffer has no PTS.
+    pts: Optional[int]
+    # `time.monotonic()` of the writer when the frame was written.  Comparable between processes on Linux.
+    capture_time: float
+    # Name of :class:`~AppsinkColorFormat` or mode of `PIL.Image.Image`, empty if unknown.
+    format: str
+    array: np.ndarray  # type: ignore
+    _buf: mmap.mmap
+    _offset: int
+    _lock: int
+    # `None` if the writer does not write checksums.
+    _checksum: Optional[int]
+
+    def __init__(
+        self,
+        seq: int,
+        pts: Optional[int],
+        capture_time: float,
+        format_: str,
+        array: np.ndarray,  # type: ignore
+        buf: mmap.mmap,
+        offset: int,
+        lock: int,
+        checksum: Optional[int],
+    ) -> None:
+        self.seq = seq
+        self.pts = pts
+        self.capture_time = capture_time
+        self.format = format_
+        self.array = array
+        self._buf = buf
+        self._offset = offset
+        self._lock = lock
+        self._checksum = checksum
+
+    def is_valid(self) -> bool:
+        """
+        Whether the slot is not yet overwritten, i.e., reads of :attr:`array` so far were consistent.
+        """
+
+        return _LOCK.unpack_from(self._buf, self._offset)[0] == self._lock
+
+    def copy(self) -> Optional[np.ndarray]:  # type: ignore
+        """
+        Copy of :attr:`array`, or `None` if it was overwritten during copying.
+        """
+
+        array = self.array.copy()
+        if self._checksum is not None:
+            with memoryview(self._buf) as view:
+                header = view[self._offset + _CHECKED_BEGIN : self._offset + _CHECKED_END]
+                checksum = zlib.crc32(array, zlib.crc32(header))
+                del header
+            if checksum != self._checksum:
+                return None
+        return array if self.is_valid() else None
+
+
+class ShmFrameReader:
+    _buf: mmap.mmap
+    _n_slots: int
+    _slot_bytes: int
+    _stride: int
+    _checksum: bool
+    _latest_only: bool
+    _verify: bool
+    _next_seq: int
+    _dropped: int
+
+    def __init__(self, name: str, latest_only: bool = False, verify: bool = False) -> None:
+        """
+        Reader of a ring written by :class:`~ShmFrameWriter`, possibly in another process.  Does not depend on
+        GStreamer.  The ring is mapped read-only from `/dev/shm`.
+
+        Frames are read in order, from the oldest one in the ring when attached.  If the reader falls behind and frames
+        are overwritten before being read, it skips to the oldest frame remaining, and the number of skipped frames is
+        counted by :meth:`dropped`.
+
+        args:
+            - name: `str`, :attr:`~ShmFrameWriter.name`.
+            - latest_only: `bool`, defaults to false.  If true, :meth:`read` skips to the newest frame, e.g., for
+              inference which should not lag behind.  Skipped frames are also counted by :meth:`dropped`.
+            - verify: `bool`, defaults to false.  If true and the writer writes checksums, :meth:`read` also verifies
+              the checksum of each frame, which costs a pass over its bytes.  :meth:`ShmFrame.copy` verifies its copy
+              regardless of this.
+        exceptions:
+            - `FileNotFoundError` if no such ring.
+            - `ValueError` if it is not a ring of a supported version.
+        """
+
+        buf = _map(name, writable=False)
+        try:
+            n_slots, slot_bytes, last_seq, checksum = _read_header(buf, name)
+        except ValueError:
+            buf.close()
+            raise
+
+        self._buf = buf
+        self._n_slots = n_slots
+        self._slot_bytes = slot_bytes
+        self._stride = _slot_stride(slot_bytes)
+        self._checksum = checksum
+        self._latest_only = latest_only
+        self._verify = verify
+        # Frames written before attaching are not dropped ones, but those still in the ring are readable.
+        self._next_seq = max(1, last_seq - n_slots + 1)
+        self._dropped = 0
+
+    def __enter__(self) -> "ShmFrameReader":
+        return self
+
+    def __exit__(self, _ex_type: Any, _ex_value: Any, _trace: Any) -> bool:  # type: ignore
+        self.close()
+
+        return False
+
+    def dropped(self) -> int:
+        return self._dropped
+
+    def writer_closed(self) -> bool:
+        return _CLOSED.unpack_from(self._buf, _CLOSED_OFFSET)[0] != 0
+
+    def read(self, timeout_secs: float) -> Optional[ShmFrame]:
+        """
+        Read the next frame, waiting up to `timeout_secs`.  Returns `None` if timed out.
+        """
+
+        deadline = time.monotonic() + timeout_secs
+        while True:
+            (last,) = _LAST_SEQ.unpack_from(self._buf, _LAST_SEQ_OFFSET)
+            if last >= self._next_seq:
+                if self._latest_only:
+                    seq = last
+                else:
+                    # The oldest slot is the next to be overwritten, but still readable.
+                    seq = max(self._next_seq, last - self._n_slots + 1)
+                frame = self._read_slot(seq)
+                if frame is not None:
+                    self._dropped += frame.seq - self._next_seq
+                    self._next_seq = frame.seq + 1
+                    return frame
+                # Overwritten or being written.  Look at `last_seq` again.
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(remaining, _POLL_SECS))
+
+    def _read_slot(self, seq: int) -> Optional[ShmFrame]:
+        buf = self._buf
+        offset = _HEADER_BYTES + ((seq - 1) % self._n_slots) * self._stride
+        lock, seq_, pts, capture_time, format_, dtype, ndim, *shape, checksum = _SLOT_HEADER.unpack_from(buf, offset)
+        # Check the lock before using the header, which may be torn.
+        if lock % 2 == 1 or _LOCK.unpack_from(buf, offset)[0] != lock or seq_ != seq or ndim > _MAX_NDIM:
+            return None
+        try:
+            dtype = np.dtype(dtype.rstrip(b"\0").decode("ascii"))
+        except (TypeError, ValueError):
+            # Torn on weakly ordered CPUs.  See the layout.
+            return None
+        shape = tuple(shape[:ndim])
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        if nbytes > self._slot_bytes:
+            return None
+        if self._verify and self._checksum:
+            if _slot_checksum(buf, offset, nbytes) != checksum or _LOCK.unpack_from(buf, offset)[0] != lock:
+                return None
+        # Read-only since the mapping is.
+        array = np.ndarray(shape, dtype, buffer=buf, offset=offset + _SLOT_HEADER_BYTES)
+        return ShmFrame(
+            seq,
+            None if pts < 0 else pts,
+            capture_time,
+            format_.rstrip(b"\0").decode("ascii"),
+            array,
+            buf,
+            offset,
+            lock,
+            checksum if self._checksum else None,
+        )
+
+    def close(self) -> None:
+        """
+        Detach from the ring.  Arrays of frames should not be used after this.
+        """
+
+        try:
+            self._buf.close()
+        except BufferError:
+            # Arrays of frames are still alive.  The mapping is released when they are collected.
+            logger.debug("frames of the ring are still referenced")
+
+
+def _slot_checksum(buf: Any, offset: int, nbytes: int) -> int:
+    """
+    CRC-32 of the slot at `offset` holding `nbytes` of data.  See the layout.
+    """
+
+    with memoryview(buf) as view:
+        header = view[offset + _CHECKED_BEGIN : offset + _CHECKED_END]
+        data = view[offset + _SLOT_HEADER_BYTES : offset + _SLOT_HEADER_BYTES + nbytes]
+        checksum = zlib.crc32(data, zlib.crc32(header))
+        del header, data
+    return checksum
+
+
+def _read_header(buf: Any, name: str) -> Tuple[int, int, int, bool]:
+    """
+    returns:
+        - `(n_slots, slot_bytes, last_seq, checksum)`
+    exceptions:
+        - `ValueError`
+    """
+
+    magic, version, n_slots, slot_bytes, last_seq, _, flags = _HEADER.unpack_from(buf, 0)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"not a frame ring of version {_VERSION}: {name}")
+    return (n_slots, slot_bytes, last_seq, flags & _FLAG_CHECKSUM != 0)
+
+
+def _map(name: str, writable: bool) -> mmap.mmap:
+    """
+    Map the shared memory `name`.
+
+    `multiprocessing.shared_memory.SharedMemory` is not used since, before Python 3.13, it registers attached memory
+    to the resource tracker, which removes it when this process exits.
+    c.f. https://github.com/python/cpython/issues/82300
+    """
+
+    fd = os.open(f"/dev/shm/{name.lstrip('/')}", os.O_RDWR if writable else os.O_RDONLY)
+    try:
+        prot = mmap.PROT_READ | mmap.PROT_WRITE if writable else mmap.PROT_READ
+        return mmap.mmap(fd, os.fstat(fd).st_size, prot=prot)
+    finally:
+        os.close(fd)
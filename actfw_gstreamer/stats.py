@@ -0,0 +1,208 @@
+import bisect
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence
+
+__all__ = [
+    "Histogram",
+    "StreamStats",
+]
+
+
+# Upper bounds of buckets in seconds.
+DEFAULT_BUCKETS_SECS = (
+    # fmt: off
+    50e-6, 100e-6, 200e-6, 500e-6,
+    1e-3, 2e-3, 5e-3, 10e-3, 20e-3, 50e-3, 100e-3, 200e-3, 500e-3,
+    1.0, 2.0, 5.0,
+)
+
+
+class Histogram:
+    """
+    Fixed-size histogram.  Observation is O(log #buckets) and allocation-free.
+
+    Values larger than the last bound are counted in the overflow bucket.
+    """
+
+    _bounds: List[float]
+    _counts: List[int]
+    _count: int
+    _sum: float
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS_SECS) -> None:
+        assert list(bounds) == sorted(bounds), "bounds should be sorted"
+
+        self._bounds = list(bounds)
+        self._counts = [0] * (len(self._bounds) + 1)
+        self._count = 0
+        self._sum = 0.0
+
+    def observe(self, x: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, x)] += 1
+        self._count += 1
+        self._sum += x
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        returns:
+            - `dict`
+                {
+                    'count': int,
+                    'sum': float,
+                    'buckets': [[upper_bound: float, cumulative_count: int], ...],  # Last bound is `inf`.
+                }
+        """
+
+        buckets = []
+        acc = 0
+        for bound, c in zip([*self._bounds, float("inf")], list(self._counts)):
+            acc += c
+            buckets.append([bound, acc])
+        return {
+            "count": self._count,
+            "sum": self._sum,
+            "buckets": buckets,
+        }
+
+
+class StreamStats:
+    """
+    Statistics of a stream, e.g., of :class:`~GstreamerCapture`.
+
+    Recording is done by the capturing thread without locks, and :meth:`snapshot` may be called from any thread.
+    A snapshot may be slightly inconsistent between fields, which is fine for monitoring.
+    """
+
+    _started: float
+    _frames: int
+    _recent: Deque[float]
+    _last_frame: Optional[float]
+    _dropped_appsink: int
+    _dropped_queue: int
+    _convert_time: Histogram
+    _wait_time: Histogram
+    _restarts: Dict[str, int]
+    _last_restart_ttff: Optional[float]
+    _fault_detection_time: Histogram
+    _bus_warnings: int
+    _gated_gops: int
+
+    def __init__(self, fps_window: int = 64) -> None:
+        """
+        args:
+            - fps_window: `int`, number of recent frames to compute delivered fps.
+        """
+
+        assert fps_window >= 2
+
+        self._started = time.monotonic()
+        self._frames = 0
+        self._recent = deque(maxlen=fps_window)
+        self._last_frame = None
+        self._dropped_appsink = 0
+        self._dropped_queue = 0
+        self._convert_time = Histogram()
+        self._wait_time = Histogram()
+        self._restarts = {}
+        self._last_restart_ttff = None
+        self._fault_detection_time = Histogram()
+        self._bus_warnings = 0
+        self._gated_gops = 0
+
+    def record_frame(self, capture_time: float, convert_secs: float, dropped_appsink: int, dropped_queue: int) -> None:
+        """
+        args:
+            - capture_time: `time.monotonic()` when the frame was captured, i.e., before conversion
+        """
+
+        self._frames += 1
+        self._recent.append(capture_time)
+        self._last_frame = capture_time
+        self._convert_time.observe(convert_secs)
+        self._dropped_appsink += dropped_appsink
+        self._dropped_queue += dropped_queue
+
+    def record_wait(self, secs: float) -> None:
+        self._wait_time.observe(secs)
+
+    def record_restart(self, cause: str) -> None:
+        self._restarts[cause] = self._restarts.get(cause, 0) + 1
+
+    def record_restart_ttff(self, secs: float) -> None:
+        self._last_restart_ttff = secs
+
+    def record_fault_detection(self, secs: float) -> None:
+        """
+        args:
+            - secs: seconds from when EOS/ERROR was posted on the bus to when the capturing thread handled it
+        """
+
+        self._fault_detection_time.observe(secs)
+
+    def record_bus_warning(self) -> None:
+        self._bus_warnings += 1
+
+    def record_gated_gop(self) -> None:
+        """
+        Recorded by the decode gate on a GStreamer thread, which is the only writer of this counter.
+        """
+
+        self._gated_gops += 1
+
+    def frames(self) -> int:
+        return self._frames
+
+    def last_frame_time(self) -> Optional[float]:
+        return self._last_frame
+
+    def fps(self) -> float:
+        """
+        Delivered frames per second over recent frames.
+        """
+
+        recent = list(self._recent)
+        if len(recent) < 2 or recent[-1] <= recent[0]:
+            return 0.0
+        return (len(recent) - 1) / (recent[-1] - recent[0])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Plain `dict` of statistics, suitable for metrics exporters.
+
+        returns:
+            - `dict`
+                {
+                    'uptime_secs': float,
+                    'frames': int,
+                    'fps': float,
+                    'secs_since_last_frame': Optional[float],
+                    'dropped_appsink': int,
+                    'dropped_queue': int,
+                    'convert_secs': dict,  # See :meth:`~Histogram.snapshot`.
+                    'wait_secs': dict,  # Time blocked in waiting frames.
+                    'restarts': {cause: int},  # cause = 'pipeline_build_error' | 'connection_lost'
+                    'last_restart_ttff_secs': Optional[float],
+                    'fault_detection_secs': dict,  # From EOS/ERROR posted to handled.
+                    'bus_warnings': int,
+                    'gated_gops': int,  # GOPs dropped by the decode gate since no one captured.
+                }
+        """
+
+        now = time.monotonic()
+        last_frame = self._last_frame
+        return {
+            "uptime_secs": now - self._started,
+            "frames": self._frames,
+            "fps": self.fps(),
+            "secs_since_last_frame": None if last_frame is None else now - last_frame,
+            "dropped_appsink": self._dropped_appsink,
+            "dropped_queue": self._dropped_queue,
+            "convert_secs": self._convert_time.snapshot(),
+            "wait_secs": self._wait_time.snapshot(),
+            "restarts": dict(self._restarts),
+            "last_restart_ttff_secs": self._last_restart_ttff,
+            "fault_detection_secs": self._fault_detection_time.snapshot(),
+            "bus_warnings": self._bus_warnings,
+            "gated_gops": self._gated_gops,
+        }
@@ -1,9 +1,12 @@
+from typing import Optional
+
 from .gstreamer.exception import GstNotInitializedError
 
 __all__ = []  # type: ignore
 
 
 CACHED_GST = None
+CACHED_GST_VIDEO = None
 
 
 def _get_gst() -> "Gst":  # type: ignore  # noqa F821
@@ -23,3 +26,26 @@ def _get_gst() -> "Gst":  # type: ignore  # noqa F821
             raise GstNotInitializedError() from e
 
     return CACHED_GST
+
+
+def _get_gst_video() -> "GstVideo":  # type: ignore  # noqa F821
+    global CACHED_GST_VIDEO
+
+    if CACHED_GST_VIDEO is None:
+        _get_gst()
+
+        import gi  # type: ignore[import]
+
+        gi.require_version("GstVideo", "1.0")
+        from gi.repository import GstVideo  # type: ignore[import]
+
+        CACHED_GST_VIDEO = GstVideo
+
+    return CACHED_GST_VIDEO
+
+
+def _clock_time_or_none(Gst: "Gst", t: int) -> Optional[int]:  # type: ignore  # noqa F821
+    if t == Gst.CLOCK_TIME_NONE:
+        return None
+    else:
+        return t
@@ -0,0 +1,160 @@
+"""
+Helpers shared by benchmark scripts.  Not a part of `actfw_gstreamer`.
+"""
+
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from actfw_gstreamer.gstreamer.frame import FrameEnvelope
+from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat, PipelineBuilder, PipelineGenerator
+from actfw_gstreamer.gstreamer.stream import GstStreamBuilder
+
+
+def init_gst() -> None:
+    import gi  # type: ignore[import]
+
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst  # type: ignore[import]
+
+    Gst.init(None)
+
+
+def videotestsrc_generator(
+    width: int,
+    height: int,
+    framerate: int,
+    format_: Optional[AppsinkColorFormat] = AppsinkColorFormat.RGB,
+    is_live: bool = True,
+    pattern: str = "smpte",
+) -> PipelineGenerator:
+    """
+    `videotestsrc` pipeline for benchmarks.
+
+    If `is_live` is false, the source and the sink run as fast as possible, i.e., measures the maximum throughput.
+    """
+
+    return (
+        PipelineBuilder(force_format=format_)
+        .add("videotestsrc", {"pattern": pattern, "is-live": is_live})
+        .add("videoconvert")
+        .add_appsink_with_caps(
+            {
+                "max-buffers": 1,
+                "drop": True,
+                "sync": is_live,
+            },
+            {
+                "width": width,
+                "height": height,
+                "framerate": framerate,
+            },
+        )
+        .finalize()
+    )
+
+
+class Measurement(NamedTuple):
+    frames: int
+    wall_secs: float
+    cpu_secs: float
+    # Per-frame latencies in seconds, from when a buffer should be rendered to when its conversion finished.
+    # Available only if the builder is `with_meta=True`.
+    latencies_secs: List[float] = []
+    # Resident set size at the end of measurement.
+    rss_bytes: Optional[int] = None
+
+    def fps(self) -> float:
+        return self.frames / self.wall_secs
+
+    def cpu_percent(self) -> float:
+        return 100.0 * self.cpu_secs / self.wall_secs
+
+    def cpu_ms_per_frame(self) -> float:
+        return 1000.0 * self.cpu_secs / max(self.frames, 1)
+
+
+def measure_stream(builder: GstStreamBuilder, duration_secs: float, warmup_secs: float = 1.0) -> Measurement:
+    """
+    Capture frames from `builder` for `warmup_secs + duration_secs` and measure the latter.
+
+    CPU time is of the whole process, i.e., it includes GStreamer's threads.
+    """
+
+    with builder.start_streaming() as stream:
+        deadline = time.monotonic() + warmup_secs
+        while time.monotonic() < deadline:
+            _release(stream.capture(timeout_secs=1))
+
+        frames = 0
+        latencies: List[float] = []
+        wall_start = time.monotonic()
+        cpu_start = time.process_time()
+        deadline = wall_start + duration_secs
+        while time.monotonic() < deadline:
+            value = stream.capture(timeout_secs=1)
+            if value is not None:
+                frames += 1
+                if isinstance(value, FrameEnvelope):
+                    latency = value.meta.latency()
+                    if latency is not None:
+                        latencies.append(latency / 1e9 + (time.monotonic() - value.meta.capture_time))
+                _release(value)
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+        rss = rss_bytes()
+
+    return Measurement(frames, wall, cpu, latencies, rss)
+
+
+def _release(value: Any) -> None:
+    if isinstance(value, FrameEnvelope):
+        value = value.value
+    release = getattr(value, "release", None)
+    if release is not None:
+        release()
+
+
+def rss_bytes() -> Optional[int]:
+    """
+    Current resident set size.  Linux only.
+    """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def percentile(xs: List[float], q: float) -> Optional[float]:
+    if len(xs) == 0:
+        return None
+    ys = sorted(xs)
+    return ys[min(len(ys) - 1, int(q / 100.0 * len(ys)))]
+
+
+def print_rows(rows: List[Dict[str, Any]], as_json: bool) -> None:
+    if as_json:
+        json.dump(rows, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    if len(rows) == 0:
+        return
+    keys = list(rows[0].keys())
+    widths = [max(len(k), *(len(_fmt(r[k])) for r in rows)) for k in keys]
+    print("  ".join(k.rjust(w) for k, w in zip(keys, widths)))
+    for r in rows:
+        print("  ".join(_fmt(r[k]).rjust(w) for k, w in zip(keys, widths)))
+
+
+def _fmt(x: Any) -> str:
+    if x is None:
+        return "-"
+    elif isinstance(x, float):
+        return f"{x:.2f}"
+    else:
+        return str(x)
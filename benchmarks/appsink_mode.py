@@ -0,0 +1,54 @@
+"""
+Compare :class:`~AppsinkMode` `SIGNAL` and `PULL` at high frame rates.
+
+usage:
+    python benchmarks/appsink_mode.py [--duration SECS] [--json]
+"""
+
+import argparse
+from typing import Any, Dict, List
+
+from _common import init_gst, measure_stream, print_rows, videotestsrc_generator
+from actfw_gstreamer.gstreamer.converter import ConverterRaw
+from actfw_gstreamer.gstreamer.stream import AppsinkMode, GstStreamBuilder
+
+CASES = [
+    # (width, height, framerate, is_live)
+    (320, 240, 240, True),
+    (640, 480, 120, True),
+    (640, 480, 240, True),
+    (1280, 720, 120, True),
+    (640, 480, 1000, False),
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    rows: List[Dict[str, Any]] = []
+    for width, height, framerate, is_live in CASES:
+        for mode in AppsinkMode:
+            generator = videotestsrc_generator(width, height, framerate, is_live=is_live)
+            builder = GstStreamBuilder(generator, ConverterRaw(), mode=mode)
+            m = measure_stream(builder, args.duration)
+            rows.append(
+                {
+                    "size": f"{width}x{height}",
+                    "target_fps": framerate if is_live else "max",
+                    "mode": mode.name,
+                    "fps": m.fps(),
+                    "cpu_percent": m.cpu_percent(),
+                    "cpu_ms_per_frame": m.cpu_ms_per_frame(),
+                }
+            )
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark suite of capture throughput and latency on `videotestsrc`.
+
+Sweeps resolution, :class:`~AppsinkColorFormat`, converter and capture strategy (:class:`~AppsinkMode`), and reports
+frames/sec, per-frame latency percentiles, CPU% and RSS.
+
+usage:
+    python benchmarks/capture_suite.py [--quick] [--scenario throughput|live] [--output FILE] [--json]
+    python benchmarks/compare.py BASE.json NEW.json
+
+Scenarios:
+    - throughput: Non-live source and unsynchronized sink, i.e., as fast as possible.
+    - live: Live source at 30 fps.  Latency is meaningful only in this scenario.
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from _common import init_gst, measure_stream, percentile, print_rows, videotestsrc_generator
+from actfw_gstreamer.gstreamer.converter import ConverterBase, ConverterNumPy, ConverterPIL, ConverterRaw
+from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat
+from actfw_gstreamer.gstreamer.stream import AppsinkMode, GstStreamBuilder
+
+RESOLUTIONS = {
+    "VGA": (640, 480),
+    "HD": (1280, 720),
+    "FHD": (1920, 1080),
+    "4K": (3840, 2160),
+}
+CONVERTERS: Dict[str, Callable[[], ConverterBase]] = {
+    "raw": ConverterRaw,
+    "pil": ConverterPIL,
+    "numpy": ConverterNumPy,
+}
+QUICK_RESOLUTIONS = ["VGA", "FHD"]
+QUICK_FORMATS = [AppsinkColorFormat.RGB]
+
+
+def _environment() -> Dict[str, Any]:
+    from gi.repository import Gst  # type: ignore[import]
+
+    try:
+        revision: Optional[str] = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+
+    return {
+        "python": platform.python_version(),
+        "gstreamer": ".".join(map(str, Gst.version())),
+        "machine": platform.machine(),
+        "git_revision": revision,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="run a small subset")
+    parser.add_argument("--scenario", choices=["throughput", "live"], default="throughput")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--output", type=str, default=None, help="write results as JSON to this file")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    is_live = args.scenario == "live"
+    resolutions = QUICK_RESOLUTIONS if args.quick else list(RESOLUTIONS)
+    formats = QUICK_FORMATS if args.quick else list(AppsinkColorFormat)
+
+    rows: List[Dict[str, Any]] = []
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        for format_ in formats:
+            for converter_name, converter in CONVERTERS.items():
+                for mode in AppsinkMode:
+                    generator = videotestsrc_generator(width, height, 30 if is_live else 1000, format_, is_live)
+                    builder = GstStreamBuilder(generator, converter(), mode=mode, with_meta=True)
+                    m = measure_stream(builder, args.duration)
+                    latencies_ms = [1000.0 * x for x in m.latencies_secs]
+                    rows.append(
+                        {
+                            "resolution": resolution,
+                            "format": format_.name,
+                            "converter": converter_name,
+                            "mode": mode.name,
+                            "fps": m.fps(),
+                            "latency_ms_p50": percentile(latencies_ms, 50),
+                            "latency_ms_p90": percentile(latencies_ms, 90),
+                            "latency_ms_p99": percentile(latencies_ms, 99),
+                            "cpu_percent": m.cpu_percent(),
+                            "rss_mib": None if m.rss_bytes is None else m.rss_bytes / 2**20,
+                        }
+                    )
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump({"scenario": args.scenario, "environment": _environment(), "results": rows}, f, indent=2)
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Compare two outputs of `capture_suite.py --output`, e.g., of two releases.
+
+usage:
+    python benchmarks/compare.py BASE.json NEW.json [--json]
+"""
+
+import argparse
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from _common import print_rows
+
+KEYS = ["resolution", "format", "converter", "mode"]
+METRICS = ["fps", "latency_ms_p50", "latency_ms_p99", "cpu_percent", "rss_mib"]
+
+
+def _load(path: str) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+    with open(path) as f:
+        doc = json.load(f)
+    return dict((tuple(r[k] for k in KEYS), r) for r in doc["results"])
+
+
+def _ratio(base: Optional[float], new: Optional[float]) -> Optional[float]:
+    if base is None or new is None or base == 0:
+        return None
+    return new / base
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base", type=str)
+    parser.add_argument("new", type=str)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    base = _load(args.base)
+    new = _load(args.new)
+
+    rows: List[Dict[str, Any]] = []
+    for key in sorted(set(base) & set(new)):
+        row = dict(zip(KEYS, key))
+        for metric in METRICS:
+            row[f"{metric}_ratio"] = _ratio(base[key].get(metric), new[key].get(metric))
+        rows.append(row)
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
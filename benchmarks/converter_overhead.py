@@ -0,0 +1,96 @@
+"""
+Measure per-frame overhead of converters, and how much of it is saved by caching conversion plans per caps.
+
+usage:
+    python benchmarks/converter_overhead.py [--frames N] [--repeat N] [--json]
+
+Samples are captured once from `videotestsrc` and converted repeatedly, so that only converters are measured.
+`plan_us` is the time to compile a plan from caps, which converters used to spend on every frame.
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+from _common import init_gst, print_rows, videotestsrc_generator
+from actfw_gstreamer.gstreamer.converter import ConverterBase, ConverterNumPy, ConverterPIL, ConverterPlanes, ConverterRaw
+from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat
+from actfw_gstreamer.gstreamer.stream import GstStreamBuilder
+from result import Ok, Result
+
+RESOLUTIONS = [(320, 240), (640, 480), (1280, 720)]
+CASES = [
+    (AppsinkColorFormat.RGB, ConverterRaw),
+    (AppsinkColorFormat.RGB, ConverterPIL),
+    (AppsinkColorFormat.RGB, ConverterNumPy),
+    (AppsinkColorFormat.NV12, ConverterPlanes),
+]
+
+
+class _SampleConverter(ConverterBase):
+    def convert_sample(self, sample: Any) -> Result[Any, Exception]:
+        return Ok(sample)
+
+
+def _samples(width: int, height: int, format_: AppsinkColorFormat, n: int) -> List[Any]:
+    generator = videotestsrc_generator(width, height, 30, format_, is_live=False)
+    samples = []
+    with GstStreamBuilder(generator, _SampleConverter()).start_streaming() as stream:
+        while len(samples) < n:
+            sample = stream.capture(timeout_secs=1)
+            if sample is not None:
+                samples.append(sample)
+    return samples
+
+
+def _per_frame_secs(f: Any, samples: List[Any], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            f(sample)
+    return (time.perf_counter() - start) / (repeat * len(samples))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    rows: List[Dict[str, Any]] = []
+    for width, height in RESOLUTIONS:
+        for format_, converter_class in CASES:
+            samples = _samples(width, height, format_, args.frames)
+            converter = converter_class()
+
+            def convert(sample: Any) -> None:
+                value = converter.convert_sample(sample).unwrap()
+                release = getattr(value, "release", None)
+                if release is not None:
+                    release()
+
+            convert_secs = _per_frame_secs(convert, samples, args.repeat)
+            compile_plan = getattr(converter, "_compile_plan", None)
+            plan_secs = None
+            if compile_plan is not None:
+                plan_secs = _per_frame_secs(lambda sample: compile_plan(sample.get_caps()), samples, args.repeat)
+            rows.append(
+                {
+                    "resolution": f"{width}x{height}",
+                    "format": format_.name,
+                    "converter": converter_class.__name__,
+                    "convert_us": 1e6 * convert_secs,
+                    "plan_us": None if plan_secs is None else 1e6 * plan_secs,
+                    "budget_pct_30fps": 100.0 * convert_secs * 30,
+                    "budget_pct_60fps": 100.0 * convert_secs * 60,
+                }
+            )
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
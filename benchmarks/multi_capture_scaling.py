@@ -0,0 +1,104 @@
+"""
+Measure CPU per stream as the number of streams grows, comparing N :class:`~GstreamerCapture`s (a thread per stream)
+with one :class:`~GstreamerMultiCapture` (a shared dispatcher).
+
+usage:
+    python benchmarks/multi_capture_scaling.py [--counts 1,2,4,8,16,32] [--duration SECS] [--json]
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List
+
+from _common import init_gst, print_rows, videotestsrc_generator
+from actfw_core.task import Consumer, Producer
+from actfw_gstreamer.capture import GstreamerCapture
+from actfw_gstreamer.gstreamer.converter import ConverterRaw
+from actfw_gstreamer.gstreamer.stream import GstStreamBuilder
+from actfw_gstreamer.multi_capture import GstreamerMultiCapture
+from actfw_gstreamer.restart_handler import SimpleRestartHandler
+
+
+class Counter(Consumer):  # type: ignore
+    count: int
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def proc(self, _: Any) -> None:
+        self.count += 1
+
+
+def _builder(width: int, height: int, framerate: int) -> GstStreamBuilder:
+    return GstStreamBuilder(videotestsrc_generator(width, height, framerate), ConverterRaw())
+
+
+def _run(producers: List[Producer], duration_secs: float, warmup_secs: float = 1.0) -> Dict[str, float]:  # type: ignore
+    counter = Counter()
+    for p in producers:
+        p.connect(counter)
+    tasks = [*producers, counter]
+    for t in tasks:
+        t.start()
+
+    time.sleep(warmup_secs)
+    count_start = counter.count
+    wall_start = time.monotonic()
+    cpu_start = time.process_time()
+    time.sleep(duration_secs)
+    frames = counter.count - count_start
+    wall = time.monotonic() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    for t in tasks:
+        t.stop()
+    for t in tasks:
+        t.join()
+
+    return {"fps": frames / wall, "cpu_percent": 100.0 * cpu / wall}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--counts", type=str, default="1,2,4,8,16,32")
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--framerate", type=int, default=15)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    rows: List[Dict[str, Any]] = []
+    for n in [int(x) for x in args.counts.split(",")]:
+        for host in ["threads", "multi"]:
+            if host == "threads":
+                producers: List[Producer] = [  # type: ignore
+                    GstreamerCapture(_builder(args.width, args.height, args.framerate), SimpleRestartHandler(10, 0))
+                    for _ in range(n)
+                ]
+            else:
+                producers = [
+                    GstreamerMultiCapture(
+                        [_builder(args.width, args.height, args.framerate) for _ in range(n)],
+                        [SimpleRestartHandler(10, 0) for _ in range(n)],
+                    )
+                ]
+            r = _run(producers, args.duration)
+            rows.append(
+                {
+                    "streams": n,
+                    "host": host,
+                    "fps_per_stream": r["fps"] / n,
+                    "cpu_percent": r["cpu_percent"],
+                    "cpu_percent_per_stream": r["cpu_percent"] / n,
+                }
+            )
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
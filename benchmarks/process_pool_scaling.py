@@ -0,0 +1,107 @@
+"""
+Measure aggregate fps of many streams as the number of worker processes of :class:`~GstreamerProcessPoolCapture`
+grows, compared with one :class:`~GstreamerMultiCapture` in this process.
+
+usage:
+    python benchmarks/process_pool_scaling.py [--streams N] [--workers 1,2,4] [--duration SECS] [--json]
+
+Sources are not live, so each stream runs as fast as its process allows, and fps is bound by per-frame work.
+"""
+
+import argparse
+import functools
+import os
+import time
+from typing import Any, Dict, List
+
+from _common import init_gst, print_rows, videotestsrc_generator
+from actfw_core.task import Consumer, Producer
+from actfw_gstreamer.gstreamer.converter import ConverterNumPy
+from actfw_gstreamer.gstreamer.stream import GstStreamBuilder
+from actfw_gstreamer.multi_capture import GstreamerMultiCapture, TaggedFrame
+from actfw_gstreamer.process_capture import GstreamerProcessPoolCapture, StreamRecipe
+from actfw_gstreamer.restart_handler import SimpleRestartHandler
+
+
+class Counter(Consumer[TaggedFrame]):
+    count: int
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def proc(self, frame: TaggedFrame) -> None:
+        release = getattr(frame.value, "release", None)
+        if release is not None:
+            release()
+        self.count += 1
+
+
+def _builder(width: int, height: int) -> GstStreamBuilder:
+    return GstStreamBuilder(videotestsrc_generator(width, height, 30, is_live=False), ConverterNumPy())
+
+
+def _restart_handler() -> SimpleRestartHandler:
+    return SimpleRestartHandler(10, 0)
+
+
+def _run(producer: Producer, duration_secs: float, warmup_secs: float = 3.0) -> float:  # type: ignore
+    counter = Counter()
+    producer.connect(counter)
+    tasks = [producer, counter]
+    for t in tasks:
+        t.start()
+
+    time.sleep(warmup_secs)
+    count_start = counter.count
+    wall_start = time.monotonic()
+    time.sleep(duration_secs)
+    frames = counter.count - count_start
+    wall = time.monotonic() - wall_start
+
+    for t in tasks:
+        t.stop()
+    for t in tasks:
+        t.join()
+
+    return frames / wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=8)
+    parser.add_argument(
+        "--workers", type=str, default=",".join(str(2**i) for i in range(4) if 2**i <= (os.cpu_count() or 1))
+    )
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    rows: List[Dict[str, Any]] = []
+    n = args.streams
+    producer: Producer = GstreamerMultiCapture(  # type: ignore
+        [_builder(args.width, args.height) for _ in range(n)],
+        [_restart_handler() for _ in range(n)],
+    )
+    fps = _run(producer, args.duration)
+    rows.append({"host": "multi", "workers": 0, "fps": fps, "fps_per_stream": fps / n})
+
+    recipe = StreamRecipe(
+        functools.partial(_builder, args.width, args.height),
+        _restart_handler,
+        slot_bytes=args.width * args.height * 3,
+    )
+    for workers in [int(x) for x in args.workers.split(",")]:
+        producer = GstreamerProcessPoolCapture([recipe] * n, n_workers=workers, latest_only=True)
+        fps = _run(producer, args.duration)
+        rows.append({"host": "process_pool", "workers": workers, "fps": fps, "fps_per_stream": fps / n})
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
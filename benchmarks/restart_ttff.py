@@ -0,0 +1,86 @@
+"""
+Compare time to the first frame after cold restarts (rebuilding the pipeline) and warm restarts (:class:`~WarmRestart`).
+
+usage:
+    python benchmarks/restart_ttff.py [--rtsp LOCATION --decoder libav] [--repeat N] [--json]
+
+Uses `videotestsrc` unless `--rtsp` is given.
+"""
+
+import argparse
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from _common import init_gst, print_rows, videotestsrc_generator
+from actfw_gstreamer.gstreamer import preconfigured_pipeline
+from actfw_gstreamer.gstreamer.converter import ConverterRaw
+from actfw_gstreamer.gstreamer.stream import GstStreamBuilder, WarmRestart, _GstStream
+
+
+def _first_frame(stream: _GstStream, timeout_secs: float = 30.0) -> float:
+    start = time.monotonic()
+    deadline = start + timeout_secs
+    while time.monotonic() < deadline:
+        if stream.capture(timeout_secs=0.1) is not None:
+            return time.monotonic() - start
+    raise RuntimeError("no frame")
+
+
+def _cold(builder: GstStreamBuilder, repeat: int) -> List[float]:
+    xs = []
+    for _ in range(repeat):
+        start = time.monotonic()
+        with builder.start_streaming() as stream:
+            _first_frame(stream)
+            xs.append(time.monotonic() - start)
+    return xs
+
+
+def _warm(builder: GstStreamBuilder, kind: WarmRestart, repeat: int) -> List[float]:
+    xs = []
+    with builder.start_streaming() as stream:
+        _first_frame(stream)
+        for _ in range(repeat):
+            start = time.monotonic()
+            stream.warm_restart(kind).unwrap()
+            _first_frame(stream)
+            xs.append(time.monotonic() - start)
+    return xs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rtsp", type=str, default=None)
+    parser.add_argument("--decoder", type=str, default="libav")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    init_gst()
+
+    def builder() -> GstStreamBuilder:
+        if args.rtsp is None:
+            generator = videotestsrc_generator(640, 480, 30)
+        else:
+            caps = {"width": 640, "height": 480, "framerate": 30}
+            generator = preconfigured_pipeline.rtsp_h264(None, args.rtsp, "tcp", args.decoder, caps)
+        return GstStreamBuilder(generator, ConverterRaw())
+
+    rows: List[Dict[str, Any]] = []
+    cases: List[Optional[WarmRestart]] = [None, *WarmRestart]
+    for kind in cases:
+        xs = _cold(builder(), args.repeat) if kind is None else _warm(builder(), kind, args.repeat)
+        rows.append(
+            {
+                "restart": "cold" if kind is None else kind.name,
+                "ttff_ms_median": 1000.0 * statistics.median(xs),
+                "ttff_ms_max": 1000.0 * max(xs),
+            }
+        )
+
+    print_rows(rows, args.json)
+
+
+if __name__ == "__main__":
+    main()
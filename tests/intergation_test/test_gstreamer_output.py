@@ -1,18 +1,39 @@
+import asyncio
+import os
+import signal
 import threading
+import time
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
 import actfw_core
 import actfw_gstreamer.gstreamer.preconfigured_pipeline as preconfigured_pipeline
 import numpy as np
 import PIL
 from actfw_core.task import Consumer, Pipe
+from actfw_gstreamer.async_capture import AsyncGstreamerCapture
+from actfw_gstreamer.batch_capture import Batch, GstreamerBatchCapture
 from actfw_gstreamer.capture import GstreamerCapture
-from actfw_gstreamer.gstreamer.converter import ConverterPIL
-from actfw_gstreamer.gstreamer.exception import GstNotInitializedError, PipelineBuildError
-from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat, PipelineBuilder
-from actfw_gstreamer.gstreamer.stream import GstStreamBuilder
-from actfw_gstreamer.restart_handler import SimpleRestartHandler
+from actfw_gstreamer.gstreamer.buffering import BoundedFifo, LatestOnly, Lossless
+from actfw_gstreamer.gstreamer.converter import (
+    ConverterEncoded,
+    ConverterNumPy,
+    ConverterPIL,
+    ConverterPlanes,
+    ConverterRaw,
+    EncodedFrame,
+    NumPyFrame,
+)
+from actfw_gstreamer.gstreamer.exception import ConnectionLostError, GstNotInitializedError, PipelineBuildError
+from actfw_gstreamer.gstreamer.frame import FrameEnvelope, LazyFrame
+from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat, PipelineBuilder, PipelineGenerator
+from actfw_gstreamer.gstreamer.stream import AppsinkMode, GstStreamBuilder, WarmRestart, start_streaming_concurrently
+from actfw_gstreamer.multi_capture import GstreamerMultiCapture, TaggedFrame
+from actfw_gstreamer.process_capture import GstreamerProcessPoolCapture, StreamRecipe
+from actfw_gstreamer.recorder import ClipRecorder
+from actfw_gstreamer.restart_handler import RestartAction, SimpleRestartHandler
+from actfw_gstreamer.shm import ShmFrame, ShmFrameReader, ShmFrameWriter
+from actfw_gstreamer.stats import StreamStats
 from PIL.Image import Image as PIL_Image
 
 DEFAULT_CAPS = {
@@ -20,6 +41,8 @@ DEFAULT_CAPS = {
     "height": 480,
     "framerate": 10,
 }
+PACKED_FORMATS = [x for x in AppsinkColorFormat if not x._is_planar()]
+PLANAR_FORMATS = [x for x in AppsinkColorFormat if x._is_planar()]
 
 
 def videotestsrc_capture() -> GstreamerCapture:
@@ -287,11 +310,12 @@ class Validator(Consumer):
 
 
 def test_videotestsrc() -> None:
-    for format_ in [None, *AppsinkColorFormat]:
-        _test_videotestsrc_aux(format_)
+    for mode in AppsinkMode:
+        for format_ in [None, *PACKED_FORMATS]:
+            _test_videotestsrc_aux(format_, mode)
 
 
-def _test_videotestsrc_aux(format_: Optional[AppsinkColorFormat]) -> None:
+def _test_videotestsrc_aux(format_: Optional[AppsinkColorFormat], mode: AppsinkMode) -> None:
     init_gst()
 
     app = actfw_core.Application()
@@ -317,7 +341,7 @@ def _test_videotestsrc_aux(format_: Optional[AppsinkColorFormat]) -> None:
         .finalize()
     )
 
-    builder = GstStreamBuilder(pipeline_generator, ConverterPIL())
+    builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=mode)
     restart_handler = SimpleRestartHandler(10, 5)
     capture = GstreamerCapture(builder, restart_handler)
     app.register_task(capture)
@@ -334,6 +358,988 @@ def _test_videotestsrc_aux(format_: Optional[AppsinkColorFormat]) -> None:
 
     validator.ensure_ok()
 
+    stats = capture.stats()
+    assert stats["frames"] > 10
+    assert stats["fps"] > 0
+    assert stats["convert_secs"]["count"] == stats["frames"]
+    assert stats["restarts"] == {}
+
+
+def _numpy_frame_to_rgb(frame: NumPyFrame) -> np.ndarray:
+    if frame.format == AppsinkColorFormat.BGR:
+        return frame.array[..., ::-1]
+    elif frame.format == AppsinkColorFormat.RGB:
+        return frame.array
+    elif frame.format == AppsinkColorFormat.RGBx:
+        return frame.array[..., :3]
+    else:
+        raise RuntimeError("unreachable")
+
+
+def test_videotestsrc_numpy() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    for format_ in PACKED_FORMATS:
+        pipeline_generator = (
+            PipelineBuilder(force_format=format_)
+            .add(
+                "videotestsrc",
+                {"pattern": "smpte100"},
+            )
+            .add("videoscale")
+            .add_appsink_with_caps(
+                {
+                    "max-buffers": 1,
+                    "drop": True,
+                    "emit-signals": True,
+                },
+                DEFAULT_CAPS,
+            )
+            .finalize()
+        )
+
+        builder = GstStreamBuilder(pipeline_generator, ConverterNumPy())
+        with builder.start_streaming() as stream:
+            frame = None
+            while frame is None:
+                frame = stream.capture(timeout_secs=1)
+
+            with frame:
+                assert frame.format == format_
+                assert frame.shape[:2] == (DEFAULT_CAPS["height"], DEFAULT_CAPS["width"])
+                # Tricky: Do not bind views of `frame.array` to variables; they must be dead before releasing the frame.
+                assert np.array_equal(image, _numpy_frame_to_rgb(frame))
+            assert frame.is_released()
+
+
+def test_videotestsrc_packed_padded() -> None:
+    init_gst()
+
+    # Rows of 637 pixels are padded to 4 bytes for 3-byte formats.
+    caps = {"width": 637, "height": 41, "framerate": 10}
+    rgb = (0x10, 0x20, 0x30)
+
+    for format_ in PACKED_FORMATS:
+        pipeline_generator = (
+            PipelineBuilder(force_format=format_)
+            .add("videotestsrc", {"pattern": "solid-color", "foreground-color": 0xFF102030})
+            .add_appsink_with_caps({"max-buffers": 1, "drop": True}, caps)
+            .finalize()
+        )
+
+        for converter in [ConverterPIL(), ConverterNumPy(), ConverterNumPy(contiguous=True)]:
+            builder = GstStreamBuilder(pipeline_generator, converter, mode=AppsinkMode.PULL)
+            with builder.start_streaming() as stream:
+                value = None
+                while value is None:
+                    value = stream.capture(timeout_secs=1)
+
+            if isinstance(value, NumPyFrame):
+                with value:
+                    assert value.shape[:2] == (caps["height"], caps["width"])
+                    if isinstance(converter, ConverterNumPy) and converter._contiguous:
+                        assert value.array.flags.c_contiguous
+                    assert np.all(_numpy_frame_to_rgb(value) == rgb)
+            else:
+                assert value.size == (caps["width"], caps["height"])
+                assert np.all(np.asarray(value.convert("RGB")) == rgb)
+
+
+def test_videotestsrc_planes() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+    # Odd width makes rows padded.
+    caps = {"width": 638, "height": 480, "framerate": 10}
+
+    for format_ in PLANAR_FORMATS:
+        pipeline_generator = (
+            PipelineBuilder(force_format=format_)
+            .add("videotestsrc", {"pattern": "smpte100"})
+            .add_appsink_with_caps({"max-buffers": 1, "drop": True}, caps)
+            .finalize()
+        )
+
+        builder = GstStreamBuilder(pipeline_generator, ConverterPlanes(), mode=AppsinkMode.PULL)
+        with builder.start_streaming() as stream:
+            frame = None
+            while frame is None:
+                frame = stream.capture(timeout_secs=1)
+
+            with frame:
+                assert frame.format == format_
+                assert frame.planes[0].shape == (caps["height"], caps["width"])
+                rgb = frame.to_rgb()
+            assert frame.is_released()
+
+        if format_ != AppsinkColorFormat.GRAY8:
+            # Chroma subsampling and rounding.
+            diff = np.abs(rgb.astype(np.int32) - image[:, : caps["width"]].astype(np.int32))
+            assert diff.mean() < 8
+
+
+class BatchValidator(Consumer):
+    _count_threshold: int
+    _count: int
+    _batch_size: int
+    _n_sources: int
+    _stop_callback: Callable[[], None]
+    _err: Optional[Exception]
+
+    def __init__(self, count_threshould: int, batch_size: int, n_sources: int, stop_callback: Callable[[], None]) -> None:
+        super().__init__()
+
+        self._count_threshold = count_threshould
+        self._count = 0
+        self._batch_size = batch_size
+        self._n_sources = n_sources
+        self._stop_callback = stop_callback
+        self._image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+        self._err = None
+
+    def ensure_ok(self) -> None:
+        if self._err is None:
+            return None
+        else:
+            raise self._err
+
+    def proc(self, batch: Batch) -> None:
+        try:
+            assert 1 <= batch.size() <= self._batch_size
+            assert batch.frames.shape == (batch.size(), *self._image.shape)
+            assert batch.frames.flags["C_CONTIGUOUS"]
+            assert len(batch.pts) == len(batch.capture_times) == batch.size()
+            assert all(0 <= i < self._n_sources for i in batch.source_ids)
+            for frame in batch.frames:
+                assert np.array_equal(self._image, frame)
+        except Exception as err:
+            self._err = err
+            self.stop()
+            self._stop_callback()
+
+        self._count += 1
+        if self._count_threshold < self._count:
+            self.stop()
+            self._stop_callback()
+
+
+def test_videotestsrc_batch() -> None:
+    init_gst()
+
+    app = actfw_core.Application()
+
+    n_sources = 2
+    batch_size = 4
+    builders = [
+        GstStreamBuilder(preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS), ConverterNumPy())
+        for _ in range(n_sources)
+    ]
+    restart_handler = SimpleRestartHandler(10, 5)
+    capture = GstreamerBatchCapture(builders, restart_handler, batch_size, max_wait_secs=0.5)
+    app.register_task(capture)
+
+    def stop_callback() -> None:
+        app.stop()
+
+    validator = BatchValidator(5, batch_size, n_sources, stop_callback)
+    app.register_task(validator)
+
+    capture.connect(validator)
+
+    app.run()
+
+    validator.ensure_ok()
+
+
+class TaggedValidator(Consumer):
+    """
+    Test that each of `stream_ids` generates correct frames `count_threshould` times.
+    """
+
+    _count_threshold: int
+    _counts: Dict[int, int]
+    _stop_callback: Callable[[], None]
+    _err: Optional[Exception]
+
+    def __init__(self, count_threshould: int, stream_ids: List[int], stop_callback: Callable[[], None]) -> None:
+        super().__init__()
+
+        self._count_threshold = count_threshould
+        self._counts = dict((i, 0) for i in stream_ids)
+        self._stop_callback = stop_callback
+        self._image = PIL.Image.open(SMPTE_100_PATH)
+        self._err = None
+
+    def ensure_ok(self) -> None:
+        if self._err is None:
+            return None
+        else:
+            raise self._err
+
+    def proc(self, frame: TaggedFrame) -> None:
+        try:
+            assert frame.stream_id in self._counts
+            assert np.array_equal(np.asarray(self._image), np.asarray(frame.value))
+        except Exception as err:
+            self._err = err
+            self.stop()
+            self._stop_callback()
+
+        self._counts[frame.stream_id] += 1
+        if all(self._count_threshold < c for c in self._counts.values()):
+            self.stop()
+            self._stop_callback()
+
+
+def test_videotestsrc_multi() -> None:
+    init_gst()
+
+    app = actfw_core.Application()
+
+    good = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+    bad = (
+        PipelineBuilder(force_format=AppsinkColorFormat.RGB)
+        .add("dummy-videotestsrc")
+        .add_appsink_with_caps({}, DEFAULT_CAPS)
+        .finalize()
+    )
+    # Stream 1 fails to build and is closed, but others are not affected.
+    builders = [GstStreamBuilder(x, ConverterPIL()) for x in [good, bad, good]]
+    restart_handlers = [SimpleRestartHandler(10, 0) for _ in builders]
+    capture = GstreamerMultiCapture(builders, restart_handlers)
+    app.register_task(capture)
+
+    def stop_callback() -> None:
+        app.stop()
+
+    validator = TaggedValidator(10, [0, 2], stop_callback)
+    app.register_task(validator)
+
+    capture.connect(validator)
+
+    app.run()
+
+    validator.ensure_ok()
+
+
+def test_videotestsrc_warm_restart() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    for mode in AppsinkMode:
+        pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=mode)
+        with builder.start_streaming() as stream:
+            for kind in [None, *WarmRestart]:
+                if kind is not None:
+                    assert stream.warm_restart(kind).is_ok()
+                assert stream.is_running()
+
+                value = None
+                while value is None:
+                    value = stream.capture(timeout_secs=1)
+                assert np.array_equal(image, np.asarray(value))
+
+
+def test_videotestsrc_meta() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    for mode in AppsinkMode:
+        pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=mode, with_meta=True)
+        with builder.start_streaming() as stream:
+            envelopes: List[FrameEnvelope] = []
+            while len(envelopes) < 5:
+                value = stream.capture(timeout_secs=1)
+                if value is not None:
+                    envelopes.append(value)
+
+        for i, envelope in enumerate(envelopes):
+            assert isinstance(envelope, FrameEnvelope)
+            assert np.array_equal(image, np.asarray(envelope.value))
+            meta = envelope.meta
+            assert meta.sequence == i + 1
+            assert meta.pts is not None
+            assert meta.duration == 10**9 // DEFAULT_CAPS["framerate"]
+            assert meta.latency() is not None
+            assert meta.dropped_appsink >= 0
+            assert meta.dropped_queue >= 0
+        for x, y in zip(envelopes, envelopes[1:]):
+            assert x.meta.pts < y.meta.pts
+            assert x.meta.capture_time < y.meta.capture_time
+
+
+def test_videotestsrc_lazy() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    for with_meta in [False, True]:
+        pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), with_meta=with_meta, lazy=True)
+        with builder.start_streaming() as stream:
+            frames: List[LazyFrame] = []
+            while len(frames) < 3:
+                value = stream.capture(timeout_secs=1)
+                if value is not None:
+                    frames.append(value)
+
+        for i, frame in enumerate(frames):
+            assert isinstance(frame, LazyFrame)
+            assert not frame.is_converted()
+            assert (frame.meta is not None) == with_meta
+            if frame.meta is not None:
+                assert frame.meta.sequence == i + 1
+        value = frames[-1].value
+        assert frames[-1].is_converted()
+        assert frames[-1].value is value
+        assert np.array_equal(image, np.asarray(value))
+        assert not frames[0].is_converted()
+
+
+def test_videotestsrc_tee() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+    small_caps = {"width": 320, "height": 240, "framerate": 10}
+
+    def branch(format_: AppsinkColorFormat, caps: Dict[str, int]) -> PipelineBuilder:
+        return (
+            PipelineBuilder(force_format=format_)
+            .add("videoscale")
+            .add("videoconvert")
+            .add_appsink_with_caps({"max-buffers": 1, "drop": True}, caps)
+        )
+
+    for mode in AppsinkMode:
+        pipeline_generator = (
+            PipelineBuilder()
+            .add("videotestsrc", {"pattern": "smpte100"})
+            .add_capsfilter("video/x-raw,width=640,height=480,framerate=10/1")
+            .tee(
+                {
+                    "full": branch(AppsinkColorFormat.RGB, DEFAULT_CAPS),
+                    "small": branch(AppsinkColorFormat.BGR, small_caps),
+                    "discarded": PipelineBuilder().add("fakesink"),
+                }
+            )
+            .finalize()
+        )
+        assert pipeline_generator.branch_names() == ["full", "small"]
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=mode, branch_converters={"small": ConverterNumPy()})
+        with builder.start_streaming() as stream:
+            value = None
+            while value is None:
+                value = stream.capture(timeout_secs=1)
+            assert np.array_equal(image, np.asarray(value))
+
+            small = None
+            while small is None:
+                small = stream.capture_branch("small", timeout_secs=1)
+            with small:
+                assert small.format == AppsinkColorFormat.BGR
+                assert small.shape == (240, 320, 3)
+
+
+def test_videotestsrc_async() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    async def collect(capture: AsyncGstreamerCapture, n: int) -> List[PIL_Image]:
+        images = []
+        async with capture:
+            async for value in capture:
+                images.append(value)
+                if len(images) == n:
+                    break
+        return images
+
+    pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+    capture = AsyncGstreamerCapture(GstStreamBuilder(pipeline_generator, ConverterPIL()), SimpleRestartHandler(10, 0))
+    images = asyncio.run(collect(capture, 5))
+    assert len(images) == 5
+    for x in images:
+        assert np.array_equal(image, np.asarray(x))
+
+    bad = (
+        PipelineBuilder(force_format=AppsinkColorFormat.RGB)
+        .add("dummy-videotestsrc")
+        .add_appsink_with_caps({}, DEFAULT_CAPS)
+        .finalize()
+    )
+    capture = AsyncGstreamerCapture(GstStreamBuilder(bad, ConverterPIL()), SimpleRestartHandler(10, 2))
+    try:
+        asyncio.run(collect(capture, 1))
+        raise RuntimeError("unreachable")
+    except Exception as err:
+        assert type(err) is PipelineBuildError
+
+
+def test_videotestsrc_frames() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+    n_threads = threading.active_count()
+
+    for prefetch in [0, 1, 3]:
+        pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL())
+        frames = builder.frames(prefetch=prefetch)
+        for i, value in enumerate(frames):
+            assert np.array_equal(image, np.asarray(value))
+            if i == 4:
+                break
+        frames.close()
+        # Teardown is done on close.
+        assert threading.active_count() == n_threads
+
+
+def _write_video_file(path: Path, n_frames: int) -> None:
+    from gi.repository import Gst  # type: ignore[import]
+
+    pipeline = Gst.parse_launch(
+        f"videotestsrc pattern=smpte100 num-buffers={n_frames}"
+        " ! video/x-raw,width=320,height=240,framerate=10/1"
+        f" ! jpegenc ! avimux ! filesink location={path}"
+    )
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(10 * Gst.SECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    assert message is not None and message.type == Gst.MessageType.EOS
+
+
+def test_file(tmp_path: Path) -> None:
+    init_gst()
+
+    n_frames = 30
+    path = tmp_path / "video.avi"
+    _write_video_file(path, n_frames)
+
+    pipeline_generator = preconfigured_pipeline.file(str(path), {"width": 160, "height": 120})
+    assert pipeline_generator.is_finite()
+    builder = GstStreamBuilder(pipeline_generator, ConverterNumPy())
+    assert builder._mode == AppsinkMode.PULL
+
+    count = 0
+    # Far faster than real time (3 secs).
+    for frame in builder.frames(prefetch=2, connection_lost_secs=2):
+        with frame:
+            assert frame.shape == (120, 160, 3)
+        count += 1
+    # Lossless, and EOS finishes the generator.
+    assert count == n_frames
+
+
+def test_file_async_and_multi_capture(tmp_path: Path) -> None:
+    init_gst()
+
+    n_frames = 30
+    path = tmp_path / "video.avi"
+    _write_video_file(path, n_frames)
+
+    def builder() -> GstStreamBuilder:
+        return GstStreamBuilder(preconfigured_pipeline.file(str(path), {"width": 160, "height": 120}), ConverterNumPy())
+
+    async def collect() -> int:
+        count = 0
+        async with AsyncGstreamerCapture(builder(), SimpleRestartHandler(10, 0)) as capture:
+            async for frame in capture:
+                frame.release()
+                count += 1
+        return count
+
+    # EOS ends iteration rather than replaying the file.
+    assert asyncio.run(asyncio.wait_for(collect(), 30)) == n_frames
+
+    class Counter(Consumer[TaggedFrame]):
+        counts: Dict[int, int]
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.counts = {}
+
+        def proc(self, frame: TaggedFrame) -> None:
+            frame.value.release()
+            self.counts[frame.stream_id] = self.counts.get(frame.stream_id, 0) + 1
+
+    # Streams are closed at EOS, and the capture stops when all are closed.
+    capture = GstreamerMultiCapture([builder(), builder()], [SimpleRestartHandler(10, 0) for _ in range(2)])
+    counter = Counter()
+    capture.connect(counter)
+    counter.start()
+    capture.start()
+    capture.join(timeout=30)
+    assert not capture.is_alive()
+    try:
+        _wait_until(lambda: counter.counts == {0: n_frames, 1: n_frames})
+    finally:
+        counter.stop()
+        counter.join()
+
+
+def test_keyframe_filter() -> None:
+    init_gst()
+
+    # 90 frames at 30 fps with keyframes every 10 frames, i.e., at 0, 1/3, ..., 8/3 secs.
+    for interval_secs, expected in [(0.0, 9), (0.5, 5), (1.0, 3)]:
+        pipeline_generator = (
+            PipelineBuilder(force_format=AppsinkColorFormat.RGB, finite=True)
+            .add("videotestsrc", {"num-buffers": 90})
+            .add_capsfilter("video/x-raw,width=160,height=120,framerate=30/1")
+            .add("x264enc", {"key-int-max": 10, "speed-preset": "ultrafast"})
+            .add("h264parse")
+            .add_keyframe_filter(interval_secs)
+            .add("avdec_h264")
+            .add("videoconvert")
+            .add_appsink_with_caps(
+                {"max-buffers": 4, "drop": False, "sync": False}, {"width": 160, "height": 120, "framerate": None}
+            )
+            .finalize()
+        )
+        builder = GstStreamBuilder(pipeline_generator, ConverterRaw(), with_meta=True)
+
+        pts = [envelope.meta.pts for envelope in builder.frames(connection_lost_secs=5)]
+
+        assert len(pts) == expected
+        assert all(y - x >= interval_secs * 1e9 for x, y in zip(pts, pts[1:]))
+
+
+def _decode_gate_pipeline() -> PipelineGenerator:
+    # Keyframes every 10 frames, i.e., 3 GOPs per second.
+    return (
+        PipelineBuilder(force_format=AppsinkColorFormat.RGB)
+        .add("videotestsrc", {"is-live": True})
+        .add_capsfilter("video/x-raw,width=160,height=120,framerate=30/1")
+        .add("x264enc", {"key-int-max": 10, "tune": "zerolatency", "speed-preset": "ultrafast"})
+        .add("h264parse")
+        .add_decode_gate()
+        .add("avdec_h264")
+        .add("videoconvert")
+        .add_appsink_with_caps({"max-buffers": 1, "drop": True}, {"width": 160, "height": 120, "framerate": None})
+        .finalize()
+    )
+
+
+def test_decode_gate() -> None:
+    init_gst()
+
+    builder = GstStreamBuilder(_decode_gate_pipeline(), ConverterRaw(), decode_gate_idle_secs=0.2)
+    stats = StreamStats()
+
+    with builder.start_streaming(stats=stats) as stream:
+        n_captured = 0
+        deadline = time.monotonic() + 1.0
+        while time.monotonic() < deadline:
+            if stream.capture(timeout_secs=0.1) is not None:
+                n_captured += 1
+        assert n_captured > 0
+        assert stats.snapshot()["gated_gops"] == 0
+
+        # Busy consumer.
+        time.sleep(2.0)
+        assert stats.snapshot()["gated_gops"] >= 3
+
+        # Frames come again from the next keyframe.
+        deadline = time.monotonic() + 2.0
+        while stream.capture(timeout_secs=0.1) is None:
+            assert time.monotonic() < deadline
+
+
+def test_decode_gate_async() -> None:
+    init_gst()
+
+    builder = GstStreamBuilder(_decode_gate_pipeline(), ConverterRaw(), decode_gate_idle_secs=0.2)
+    capture = AsyncGstreamerCapture(builder, SimpleRestartHandler(10, 0))
+
+    async def run() -> None:
+        async with capture:
+            await asyncio.wait_for(capture.__anext__(), 5.0)
+
+            # Busy consumer.  The gate closes.
+            await asyncio.sleep(2.0)
+
+            # The first one may be the sample held by `appsink` during the busy period.  Others come only if waiting
+            # for them reopens the gate.
+            for _ in range(3):
+                await asyncio.wait_for(capture.__anext__(), 2.0)
+
+    asyncio.run(run())
+
+
+def test_clip_recorder(tmp_path: Path) -> None:
+    init_gst()
+
+    framerate = 10
+    pipeline_generator = (
+        PipelineBuilder()
+        .add("videotestsrc", {"pattern": "smpte100", "is-live": True})
+        .add_capsfilter(f"video/x-raw,width=320,height=240,framerate={framerate}/1")
+        .add("x264enc", {"key-int-max": framerate, "tune": "zerolatency", "speed-preset": "ultrafast"})
+        .add("h264parse")
+        .tee(
+            {
+                preconfigured_pipeline.DECODED_BRANCH: PipelineBuilder(force_format=AppsinkColorFormat.RGB)
+                .add("avdec_h264")
+                .add("videoconvert")
+                .add_appsink_with_caps({"max-buffers": 1, "drop": True}, {"width": 320, "height": 240, "framerate": None}),
+                preconfigured_pipeline.ENCODED_BRANCH: preconfigured_pipeline.encoded_h264_branch(),
+            }
+        )
+        .finalize()
+    )
+    builder = GstStreamBuilder(
+        pipeline_generator,
+        ConverterRaw(),
+        branch_converters={preconfigured_pipeline.ENCODED_BRANCH: ConverterEncoded()},
+    )
+
+    recorder = ClipRecorder(max_pre_secs=2)
+    path = tmp_path / "clip.mp4"
+    with builder.start_streaming() as stream:
+        future = None
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            frame = stream.capture_branch(preconfigured_pipeline.ENCODED_BRANCH, timeout_secs=1)
+            if frame is None:
+                continue
+            assert isinstance(frame, EncodedFrame)
+            recorder.push(frame)
+            if future is None and frame.pts is not None and frame.pts > 3 * 10**9:
+                future = recorder.trigger_clip(1.0, 1.0, path)
+            if future is not None and future.done():
+                break
+    recorder.close()
+
+    assert future is not None
+    assert future.result(timeout=10) == path
+
+    count = 0
+    for _ in GstStreamBuilder(preconfigured_pipeline.file(str(path), {"width": 160, "height": 120})).frames():
+        count += 1
+    # From the keyframe at or before 1 sec before the trigger to 1 sec after it.
+    assert 2 * framerate <= count <= 3 * framerate + 1
+
+
+def test_videotestsrc_buffering() -> None:
+    init_gst()
+
+    caps = {"width": 320, "height": 240, "framerate": 30}
+    duration = 10**9 // caps["framerate"]
+
+    for mode in AppsinkMode:
+        for policy in [LatestOnly(), BoundedFifo(3), Lossless(3)]:
+            pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", caps)
+            builder = GstStreamBuilder(pipeline_generator, ConverterRaw(), mode=mode, with_meta=True, buffering=policy)
+            with builder.start_streaming() as stream:
+                envelopes: List[FrameEnvelope] = []
+                while len(envelopes) < 10:
+                    value = stream.capture(timeout_secs=1)
+                    if value is not None:
+                        envelopes.append(value)
+                    if len(envelopes) == 1:
+                        # Slow consumer.
+                        time.sleep(0.3)
+
+            dropped = sum(x.meta.dropped_appsink + x.meta.dropped_queue for x in envelopes)
+            gaps = [(y.meta.pts - x.meta.pts) // duration - 1 for x, y in zip(envelopes, envelopes[1:])]
+            if isinstance(policy, Lossless):
+                assert dropped == 0
+                assert all(gap == 0 for gap in gaps)
+            else:
+                # About 9 frames arrived while sleeping.
+                assert dropped > 0
+                assert dropped == sum(gaps)
+
+
+def test_buffering_keeps_branch_sinks() -> None:
+    init_gst()
+
+    pipeline_generator = (
+        PipelineBuilder()
+        .add("videotestsrc", {"pattern": "smpte100", "is-live": True})
+        .add_capsfilter("video/x-raw,width=320,height=240,framerate=10/1")
+        .add("x264enc", {"key-int-max": 10, "tune": "zerolatency", "speed-preset": "ultrafast"})
+        .add("h264parse")
+        .tee(
+            {
+                preconfigured_pipeline.DECODED_BRANCH: PipelineBuilder(force_format=AppsinkColorFormat.RGB)
+                .add("avdec_h264")
+                .add("videoconvert")
+                .add_appsink_with_caps({"max-buffers": 4, "drop": False}, {"width": 320, "height": 240, "framerate": None}),
+                preconfigured_pipeline.ENCODED_BRANCH: preconfigured_pipeline.encoded_h264_branch(),
+            }
+        )
+        .finalize()
+    )
+    builder = GstStreamBuilder(
+        pipeline_generator,
+        ConverterRaw(),
+        branch_converters={preconfigured_pipeline.ENCODED_BRANCH: ConverterEncoded()},
+        buffering=LatestOnly(),
+    )
+    with builder.start_streaming() as stream:
+        built_pipeline = stream._inner._built_pipeline
+        assert built_pipeline.sink.get_property("max-buffers") == 1
+        assert built_pipeline.sink.get_property("drop")
+        # The encoded branch keeps enough buffers for `ClipRecorder`.
+        encoded_sink = built_pipeline.sinks[preconfigured_pipeline.ENCODED_BRANCH]
+        assert encoded_sink.get_property("max-buffers") == 120
+
+
+class _RecordingRestartHandler(SimpleRestartHandler):
+    errors: List[Tuple[float, ConnectionLostError]]
+
+    def __init__(self) -> None:
+        super().__init__(10, 5)
+        self.errors = []
+
+    def connection_lost(self, err: ConnectionLostError) -> RestartAction:
+        self.errors.append((time.monotonic(), err))
+        return super().connection_lost(err)
+
+
+class _FrameCounter(Consumer[PIL_Image]):
+    count: int
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.count = 0
+
+    def proc(self, _frame: PIL_Image) -> None:
+        self.count += 1
+
+
+def _wait_until(cond: Callable[[], bool], timeout_secs: float = 10) -> None:
+    deadline = time.monotonic() + timeout_secs
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _post_error(capture: GstreamerCapture) -> float:
+    """
+    Post a bus ERROR to the running pipeline of `capture`.
+
+    returns:
+        - `float`, when posted by `time.monotonic()`
+    """
+
+    from gi.repository import GLib, Gst  # type: ignore[import]
+
+    stream = capture._stream
+    assert stream is not None
+    pipeline = stream._inner._built_pipeline.pipeline
+    error = GLib.Error.new_literal(Gst.StreamError.quark(), "injected", Gst.StreamError.FAILED)
+    posted = time.monotonic()
+    pipeline.post_message(Gst.Message.new_error(pipeline, error, "test"))
+    return posted
+
+
+def test_error_detection_latency() -> None:
+    init_gst()
+
+    for mode in AppsinkMode:
+        pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+        builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=mode)
+        restart_handler = _RecordingRestartHandler()
+        capture = GstreamerCapture(builder, restart_handler)
+        counter = _FrameCounter()
+        capture.connect(counter)
+        capture.start()
+        counter.start()
+        try:
+            _wait_until(lambda: counter.count > 0)
+
+            stream = capture._stream
+            start = _post_error(capture)
+
+            # The error is detected long before the timeout, even if frames are pending, and the stream restarts.
+            _wait_until(lambda: len(restart_handler.errors) > 0)
+            detected, err = restart_handler.errors[0]
+            assert detected - start < 0.5
+            assert "injected" in err.args[0]
+            assert "injected" in err.__cause__.message  # type: ignore
+            count = counter.count
+            _wait_until(lambda: counter.count > count and capture._stream is not stream)
+        finally:
+            capture.stop()
+            counter.stop()
+            capture.join()
+            counter.join()
+
+        stats = capture.stats()
+        assert stats["fault_detection_secs"]["count"] == 1
+        assert stats["restarts"] == {"connection_lost": 1}
+
+
+def test_pull_mode_error_restarts() -> None:
+    init_gst()
+
+    pipeline_generator = preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS)
+    builder = GstStreamBuilder(pipeline_generator, ConverterPIL(), mode=AppsinkMode.PULL)
+    restart_handler = _RecordingRestartHandler()
+    capture = GstreamerCapture(builder, restart_handler)
+    counter = _FrameCounter()
+    capture.connect(counter)
+    capture.start()
+    counter.start()
+    try:
+        _wait_until(lambda: counter.count > 0)
+        _post_error(capture)
+
+        # `PullInner` reports bus ERROR as `ConnectionLostError`, and the capture asks the restart handler.
+        _wait_until(lambda: len(restart_handler.errors) > 0)
+        assert isinstance(restart_handler.errors[0][1], ConnectionLostError)
+        count = counter.count
+        _wait_until(lambda: counter.count > count)
+        assert capture.is_alive()
+    finally:
+        capture.stop()
+        counter.stop()
+        capture.join()
+        counter.join()
+
+
+def _never_prerolling_builder(timeout_secs: float) -> GstStreamBuilder:
+    # `appsrc` without data never prerolls, like an unreachable camera.
+    pipeline_generator = (
+        PipelineBuilder(force_format=AppsinkColorFormat.RGB).add("appsrc").add_appsink_with_caps({}, DEFAULT_CAPS).finalize()
+    )
+    return GstStreamBuilder(pipeline_generator, ConverterPIL(), state_change_timeout_secs=timeout_secs)
+
+
+def test_state_change_timeout() -> None:
+    init_gst()
+
+    start = time.monotonic()
+    try:
+        with _never_prerolling_builder(0.5).start_streaming():
+            raise RuntimeError("unreachable")
+    except PipelineBuildError as err:
+        assert "timed out" in err.args[0]
+    assert time.monotonic() - start < 2.0
+
+    # Timeouts of streams started concurrently overlap.
+    start = time.monotonic()
+    try:
+        start_streaming_concurrently([_never_prerolling_builder(0.5) for _ in range(4)])
+        raise RuntimeError("unreachable")
+    except PipelineBuildError as err:
+        assert "timed out" in err.args[0]
+    assert time.monotonic() - start < 1.5
+
+
+def test_start_streaming_concurrently() -> None:
+    init_gst()
+
+    image = np.asarray(PIL.Image.open(SMPTE_100_PATH))
+
+    builders = [
+        GstStreamBuilder(preconfigured_pipeline.videotestsrc("smpte100", DEFAULT_CAPS), ConverterPIL()) for _ in range(3)
+    ]
+    streams = start_streaming_concurrently(builders)
+    try:
+        for stream in streams:
+            assert stream.is_running()
+            value = None
+            while value is None:
+                value = stream.capture(timeout_secs=1)
+            assert np.array_equal(image, np.asarray(value))
+    finally:
+        for stream in streams:
+            stream.__exit__(None, None, None)
+
 
 if __name__ == "__main__":
     generate_reference_data()
+
+
+def test_shm_frame_writer() -> None:
+    init_gst()
+
+    pipeline_generator = preconfigured_pipeline.videotestsrc(caps={"width": 322, "height": 240, "framerate": 30})
+    builder = GstStreamBuilder(pipeline_generator, ConverterNumPy(), with_meta=True)
+    writer = ShmFrameWriter(slot_bytes=322 * 240 * 3)
+    reader = ShmFrameReader(writer.name)
+
+    try:
+        pts = []
+        for envelope in builder.frames(connection_lost_secs=5):
+            pts.append(envelope.meta.pts)
+            writer.push(envelope)
+            if len(pts) == 3:
+                break
+
+        for pts_ in pts:
+            frame = reader.read(timeout_secs=0)
+            assert frame is not None
+            assert frame.pts == pts_
+            assert frame.format == "RGB"
+            assert frame.array.shape == (240, 322, 3)
+            assert frame.is_valid()
+    finally:
+        writer.close()
+        reader.close()
+
+
+def _pool_builder() -> GstStreamBuilder:
+    pipeline_generator = preconfigured_pipeline.videotestsrc(caps={"width": 160, "height": 120, "framerate": 30})
+    return GstStreamBuilder(pipeline_generator, ConverterNumPy())
+
+
+def _pool_restart_handler() -> SimpleRestartHandler:
+    return SimpleRestartHandler(10, 5)
+
+
+def test_process_pool_capture() -> None:
+    n_streams = 3
+    recipe = StreamRecipe(_pool_builder, _pool_restart_handler, slot_bytes=160 * 120 * 3)
+    capture = GstreamerProcessPoolCapture([recipe] * n_streams, n_workers=2)
+
+    class Sink(Consumer[TaggedFrame]):
+        frames: Dict[int, int]
+
+        def __init__(self) -> None:
+            super().__init__()
+            self.frames = {}
+
+        def proc(self, frame: TaggedFrame) -> None:
+            assert isinstance(frame.value, ShmFrame)
+            assert frame.value.array.shape == (120, 160, 3)
+            self.frames[frame.stream_id] = self.frames.get(frame.stream_id, 0) + 1
+
+    def wait_frames(sink: Sink, n: int) -> None:
+        start = dict(sink.frames)
+        deadline = time.monotonic() + 30
+        while not all(sink.frames.get(i, 0) - start.get(i, 0) >= n for i in range(n_streams)):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+
+    sink = Sink()
+    capture.connect(sink)
+    capture.start()
+    sink.start()
+    try:
+        wait_frames(sink, 10)
+        workers = capture.stats()["workers"]
+        assert all(worker["alive"] for worker in workers)
+
+        # Streams of a killed worker continue on the other one, and the worker is restarted.
+        os.kill(workers[0]["pid"], signal.SIGKILL)
+        wait_frames(sink, 10)
+        deadline = time.monotonic() + 30
+        while capture.stats()["workers"][0]["restarts"] == 0 or not capture.stats()["workers"][0]["alive"]:
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+        wait_frames(sink, 10)
+    finally:
+        capture.stop()
+        sink.stop()
+        capture.join()
+        sink.join()
@@ -0,0 +1,22 @@
+import pytest
+from actfw_gstreamer.gstreamer.buffering import BoundedFifo, BufferingPolicy, LatestOnly, Lossless
+
+
+@pytest.mark.parametrize(
+    "policy, props",
+    [
+        (LatestOnly(), {"max-buffers": 1, "drop": True}),
+        (BoundedFifo(5), {"max-buffers": 5, "drop": True}),
+        (Lossless(), {"max-buffers": 4, "drop": False}),
+        (Lossless(2), {"max-buffers": 2, "drop": False}),
+    ],
+)
+def test_appsink_props(policy: BufferingPolicy, props: dict) -> None:
+    assert policy.appsink_props() == props
+
+
+def test_invalid_size() -> None:
+    with pytest.raises(AssertionError):
+        BoundedFifo(0)
+    with pytest.raises(AssertionError):
+        Lossless(0)
@@ -4,13 +4,25 @@ import pytest
 @pytest.mark.parametrize(
     "from_, import_",
     [
-        ("actfw_gstreamer.capture", "GstreamerCapture"),
+        ("actfw_gstreamer.capture", "RestartTiming, GstreamerCapture, GstreamerBranchCapture"),
+        ("actfw_gstreamer.batch_capture", "Batch, GstreamerBatchCapture"),
+        ("actfw_gstreamer.multi_capture", "TaggedFrame, GstreamerMultiCapture"),
+        ("actfw_gstreamer.async_capture", "AsyncGstreamerCapture"),
+        ("actfw_gstreamer.recorder", "ClipRecorder"),
+        ("actfw_gstreamer.shm", "ShmFrame, ShmFrameWriter, ShmFrameReader"),
+        ("actfw_gstreamer.process_capture", "StreamRecipe, GstreamerProcessPoolCapture"),
         ("actfw_gstreamer.gstreamer.pipeline", "PipelineBuilder, PipelineGenerator"),
-        ("actfw_gstreamer.gstreamer.converter", "ConverterBase, ConverterRaw, ConverterPIL"),
+        ("actfw_gstreamer.gstreamer.converter", "ConverterBase, ConverterRaw, ConverterPIL, ConverterNumPy, NumPyFrame"),
+        ("actfw_gstreamer.gstreamer.converter", "ConverterPlanes, PlanarFrame, nv12_to_rgb, i420_to_rgb"),
+        ("actfw_gstreamer.gstreamer.converter", "EncodedFrame, ConverterEncoded"),
+        ("actfw_gstreamer.gstreamer.frame", "FrameMeta, FrameEnvelope, LazyFrame"),
+        ("actfw_gstreamer.gstreamer.buffering", "BufferingPolicy, LatestOnly, BoundedFifo, Lossless"),
         ("actfw_gstreamer.gstreamer.exception", "GstNotInitializedError, PipelineBuildError, ConnectionLostError"),
-        ("actfw_gstreamer.gstreamer.preconfigured_pipeline", "videotestsrc, rtsp_h264"),
-        ("actfw_gstreamer.gstreamer.stream", "GstStreamBuilder"),
+        ("actfw_gstreamer.gstreamer.preconfigured_pipeline", "videotestsrc, rtsp_h264, file, encoded_h264_branch"),
+        ("actfw_gstreamer.gstreamer.stream", "AppsinkMode, WarmRestart, GstStreamBuilder, start_streaming_concurrently"),
+        ("actfw_gstreamer.stats", "Histogram, StreamStats"),
         ("actfw_gstreamer.restart_handler", "RestartAction, Stop, Restart, RestartHandlerBase, SimpleRestartHandler"),
+        ("actfw_gstreamer.restart_handler", "BackoffPolicy, CircuitState, BackoffRestartHandler"),
     ],
 )
 def test_import_actfw_gstreamer(from_: str, import_: str) -> None:
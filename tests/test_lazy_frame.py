@@ -0,0 +1,55 @@
+import threading
+from typing import Any, List
+
+import pytest
+from actfw_gstreamer.gstreamer.converter import ConverterBase
+from actfw_gstreamer.gstreamer.frame import LazyFrame
+from result import Err, Ok, Result
+
+
+class _CountingConverter(ConverterBase):
+    calls: List[Any]
+
+    def __init__(self) -> None:
+        self.calls = []
+
+    def convert_sample(self, sample: Any) -> Result[Any, Exception]:
+        self.calls.append(sample)
+        if sample == "broken":
+            return Err(ValueError("broken"))
+        return Ok(f"converted {sample}")
+
+
+def test_lazy_frame_converts_once() -> None:
+    converter = _CountingConverter()
+    frame = LazyFrame("sample", converter)
+
+    assert frame.sample == "sample"
+    assert frame.meta is None
+    assert not frame.is_converted()
+    assert converter.calls == []
+
+    threads = [threading.Thread(target=lambda: frame.value) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert frame.is_converted()
+    assert frame.value == "converted sample"
+    assert converter.calls == ["sample"]
+
+
+def test_lazy_frame_error_and_release() -> None:
+    converter = _CountingConverter()
+    frame = LazyFrame("broken", converter)
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            frame.value
+    assert converter.calls == ["broken"]
+
+    frame.release()
+    assert not frame.is_converted()
+    with pytest.raises(AssertionError):
+        frame.value
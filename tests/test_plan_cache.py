@@ -0,0 +1,52 @@
+from typing import Any, List
+
+from actfw_gstreamer.gstreamer.converter import _PLAN_CACHE_SIZE, _PlanCache
+from result import Err, Ok, Result
+
+
+class _Caps:
+    """
+    Stands for `Gst.Caps`: equality by value, as `gst_caps_is_equal()`.
+    """
+
+    value: str
+
+    def __init__(self, value: str) -> None:
+        self.value = value
+
+    def is_equal(self, other: "_Caps") -> bool:
+        return self.value == other.value
+
+
+def test_plan_cache() -> None:
+    compiled: List[str] = []
+
+    def compile_(caps: Any) -> Result[str, Exception]:
+        compiled.append(caps.value)
+        if caps.value == "bad":
+            return Err(ValueError("bad"))
+        return Ok(f"plan of {caps.value}")
+
+    cache = _PlanCache(compile_)
+    caps = _Caps("a")
+    for _ in range(3):
+        assert cache.get(caps).unwrap() == "plan of a"
+    # Equal caps in another object.
+    assert cache.get(_Caps("a")).unwrap() == "plan of a"
+    assert compiled == ["a"]
+
+    # Renegotiation.
+    assert cache.get(_Caps("b")).unwrap() == "plan of b"
+    assert cache.get(caps).unwrap() == "plan of a"
+    assert compiled == ["a", "b"]
+
+    # Errors are cached as well.
+    assert cache.get(_Caps("bad")).is_err()
+    assert cache.get(_Caps("bad")).is_err()
+    assert compiled == ["a", "b", "bad"]
+
+    # Least recently compiled plans are evicted.
+    for i in range(_PLAN_CACHE_SIZE):
+        cache.get(_Caps(str(i)))
+    cache.get(caps)
+    assert compiled[-1] == "a"
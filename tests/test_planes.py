@@ -0,0 +1,167 @@
+from typing import Any, List, Tuple
+
+import numpy as np
+import PIL.Image
+import pytest
+from actfw_gstreamer.gstreamer.converter import NumPyFrame, _plane_specs, _plane_views, i420_to_rgb, nv12_to_rgb
+from actfw_gstreamer.gstreamer.pipeline import AppsinkColorFormat
+
+
+def _reference_rgb(y: int, u: int, v: int) -> Tuple[int, int, int]:
+    c, d, e = y - 16, u - 128, v - 128
+    r = 1.164 * c + 1.596 * e
+    g = 1.164 * c - 0.392 * d - 0.813 * e
+    b = 1.164 * c + 2.017 * d
+    return tuple(int(min(255, max(0, round(x)))) for x in (r, g, b))  # type: ignore
+
+
+def test_plane_views_nv12_with_padding() -> None:
+    width, height, stride = 5, 3, 8
+    y = np.arange(stride * height, dtype=np.uint8)
+    uv = np.arange(100, 100 + stride * 2, dtype=np.uint8)
+    data = np.concatenate([y, uv])
+
+    specs = _plane_specs(len(data), AppsinkColorFormat.NV12, width, height, [0, len(y)], [stride, stride])
+    planes = _plane_views(data, specs.unwrap())
+
+    assert len(planes) == 2
+    assert np.array_equal(planes[0], y.reshape(height, stride)[:, :width])
+    assert planes[1].shape == (2, 3, 2)
+    assert np.array_equal(planes[1][:, :, 0], [[100, 102, 104], [108, 110, 112]])
+    assert np.array_equal(planes[1][:, :, 1], [[101, 103, 105], [109, 111, 113]])
+    # Views, not copies.
+    assert np.shares_memory(planes[0], data)
+    assert not planes[0].flags.writeable
+
+
+def test_plane_views_i420_and_gray8() -> None:
+    width, height = 4, 2
+    data = np.arange(width * height + 2 + 2, dtype=np.uint8)
+
+    specs = _plane_specs(len(data), AppsinkColorFormat.I420, width, height, [0, 8, 10], [4, 2, 2])
+    y, u, v = _plane_views(data, specs.unwrap())
+    assert np.array_equal(y, data[:8].reshape(2, 4))
+    assert np.array_equal(u, [[8, 9]])
+    assert np.array_equal(v, [[10, 11]])
+
+    specs = _plane_specs(len(data), AppsinkColorFormat.GRAY8, width, height, [0], [4])
+    (gray,) = _plane_views(data, specs.unwrap())
+    assert gray.shape == (2, 4)
+
+
+@pytest.mark.parametrize(
+    "offsets, strides",
+    [
+        ([0, 24], [8, 8]),  # Too short.
+        ([0], [8]),  # Missing planes.
+        ([0, 24], [4, 8]),  # Stride smaller than row.
+    ],
+)
+def test_plane_specs_invalid(offsets: list, strides: list) -> None:
+    assert _plane_specs(30, AppsinkColorFormat.NV12, 5, 3, offsets, strides).is_err()
+
+
+def test_nv12_to_rgb() -> None:
+    rng = np.random.default_rng(0)
+    height, width = 5, 7
+    y = rng.integers(0, 256, (height, width), dtype=np.uint8)
+    uv = rng.integers(0, 256, (3, 4, 2), dtype=np.uint8)
+
+    rgb = nv12_to_rgb(y, uv)
+
+    assert rgb.shape == (height, width, 3)
+    assert rgb.dtype == np.uint8
+    for i in range(height):
+        for j in range(width):
+            u, v = uv[i // 2, j // 2]
+            expected = _reference_rgb(int(y[i, j]), int(u), int(v))
+            assert np.abs(rgb[i, j].astype(int) - expected).max() <= 1, (i, j)
+
+    # Same as I420 with the same samples.
+    out = np.zeros_like(rgb)
+    assert i420_to_rgb(y, np.ascontiguousarray(uv[:, :, 0]), np.ascontiguousarray(uv[:, :, 1]), out) is out
+    assert np.array_equal(out, rgb)
+
+
+def test_nv12_to_rgb_black_and_white() -> None:
+    uv = np.full((1, 1, 2), 128, dtype=np.uint8)
+
+    assert np.array_equal(nv12_to_rgb(np.full((2, 2), 16, dtype=np.uint8), uv), np.zeros((2, 2, 3)))
+    assert np.array_equal(nv12_to_rgb(np.full((2, 2), 235, dtype=np.uint8), uv), np.full((2, 2, 3), 255))
+
+
+def test_plane_views_packed_with_padding() -> None:
+    # RGB rows of 5 pixels are padded to 16 bytes.
+    width, height, stride = 5, 3, 16
+    data = np.arange(stride * height, dtype=np.uint8)
+
+    specs = _plane_specs(len(data), AppsinkColorFormat.RGB, width, height, [0], [stride])
+    (array,) = _plane_views(data, specs.unwrap())
+
+    assert array.shape == (height, width, 3)
+    assert np.array_equal(array, data.reshape(height, stride)[:, : width * 3].reshape(height, width, 3))
+    assert np.shares_memory(array, data)
+    assert not array.flags.c_contiguous
+
+    # Last row needs not be padded.
+    assert _plane_specs(stride * 2 + width * 3, AppsinkColorFormat.RGB, width, height, [0], [stride]).is_ok()
+    assert _plane_specs(stride * 2 + width * 3 - 1, AppsinkColorFormat.RGB, width, height, [0], [stride]).is_err()
+
+
+def test_pil_raw_decoder_with_stride() -> None:
+    # `ConverterPIL` relies on the stride argument of the raw decoder.
+    width, height, stride = 5, 3, 16
+    data = np.arange(stride * height, dtype=np.uint8)
+
+    image = PIL.Image.frombytes("RGB", (width, height), data.tobytes()[: stride * 2 + width * 3], "raw", "RGB", stride)
+
+    assert np.array_equal(np.asarray(image), data.reshape(height, stride)[:, : width * 3].reshape(height, width, 3))
+
+
+class _Buffer:
+    unmapped: List[Any]
+
+    def __init__(self) -> None:
+        self.unmapped = []
+
+    def unmap(self, info: Any) -> None:
+        self.unmapped.append(info)
+
+
+class _MapInfo:
+    data: memoryview
+
+    def __init__(self, data: bytes) -> None:
+        self.data = memoryview(data)
+
+
+def _numpy_frame(buf: _Buffer, info: _MapInfo) -> NumPyFrame:
+    data = np.frombuffer(info.data, dtype=np.uint8)
+    specs = _plane_specs(len(data), AppsinkColorFormat.RGB, 2, 2, [0], [8])
+    (array,) = _plane_views(data, specs.unwrap())
+    return NumPyFrame(None, None, buf, info, data, array, AppsinkColorFormat.RGB)
+
+
+def test_numpy_frame_release_unmaps() -> None:
+    buf, info = _Buffer(), _MapInfo(bytes(16))
+    frame = _numpy_frame(buf, info)
+
+    frame.release()
+    assert frame.is_released()
+    assert buf.unmapped == [info]
+    frame.release()
+    assert buf.unmapped == [info]
+
+
+def test_numpy_frame_release_waits_for_views() -> None:
+    buf, info = _Buffer(), _MapInfo(bytes(range(16)))
+    frame = _numpy_frame(buf, info)
+    row = frame.array[1]
+
+    # Kept mapped while a view derived from the frame is alive.
+    frame.release()
+    assert buf.unmapped == []
+    assert np.array_equal(row, [[8, 9, 10], [11, 12, 13]])
+
+    del row
+    assert buf.unmapped == [info]
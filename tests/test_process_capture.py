@@ -0,0 +1,116 @@
+from queue import Queue
+from typing import Any, Iterator, List
+
+import pytest
+from actfw_gstreamer.process_capture import GstreamerProcessPoolCapture, StreamRecipe, _Stream, _Worker
+
+
+def _factory() -> Any:
+    # Workers are not started in these tests, so recipes are never built.
+    return None
+
+
+class _Process:
+    """
+    Stands for a worker process, which is not started in these tests.
+    """
+
+    alive: bool
+    exitcode: Any
+    pid: int
+
+    def __init__(self) -> None:
+        self.alive = True
+        self.exitcode = None
+        self.pid = 0
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+
+def _start(worker: _Worker) -> None:
+    worker.process = _Process()  # type: ignore
+    worker.commands = Queue()  # type: ignore
+    worker.events = Queue()  # type: ignore
+
+
+def _commands(worker: _Worker) -> List[Any]:
+    assert worker.commands is not None
+    commands = []
+    while not worker.commands.empty():
+        commands.append(worker.commands.get_nowait()[:2])
+    return commands
+
+
+@pytest.fixture
+def pool() -> Iterator[GstreamerProcessPoolCapture]:
+    recipes = [StreamRecipe(_factory, _factory, slot_bytes=16) for _ in range(5)]
+    pool = GstreamerProcessPoolCapture(recipes, n_workers=2)
+    pool._streams = [_Stream(i, recipe, False) for (i, recipe) in enumerate(recipes)]
+    pool._workers = [_Worker(i) for i in range(2)]
+    for worker in pool._workers:
+        _start(worker)
+    yield pool
+    for stream in pool._streams:
+        stream.reader.close()
+        stream.ring.close()
+
+
+def _loads(pool: GstreamerProcessPoolCapture) -> List[int]:
+    return [pool._load(worker) for worker in pool._workers]
+
+
+def test_streams_are_spread(pool: GstreamerProcessPoolCapture) -> None:
+    pool._rebalance()
+
+    assert _loads(pool) == [3, 2]
+    assert _commands(pool._workers[0]) == [("add", 0), ("add", 2), ("add", 4)]
+    assert _commands(pool._workers[1]) == [("add", 1), ("add", 3)]
+
+
+def test_crashed_worker_is_replaced_and_rebalanced(pool: GstreamerProcessPoolCapture) -> None:
+    pool._rebalance()
+    for worker in pool._workers:
+        _commands(worker)
+
+    # Streams of a crashed worker run on others meanwhile.
+    pool._workers[1].process.alive = False  # type: ignore
+    pool._workers[1].restart_at = float("inf")
+    pool._check_workers()
+    assert pool._workers[1].process is None
+    assert pool._workers[1].restarts == 1
+    pool._rebalance()
+    assert _loads(pool) == [5, 0]
+    assert _commands(pool._workers[0]) == [("add", 1), ("add", 3)]
+
+    # Back again.  Streams are moved after the old worker stopped them.
+    _start(pool._workers[1])
+    pool._rebalance()
+    assert _loads(pool) == [3, 2]
+    removed = _commands(pool._workers[0])
+    assert [kind for (kind, _) in removed] == ["remove", "remove"]
+    assert _commands(pool._workers[1]) == []
+
+    for _, stream_id in removed:
+        pool._workers[0].events.put(("removed", stream_id, None))  # type: ignore
+    pool._handle_events()
+    assert _commands(pool._workers[1]) == [("add", stream_id) for (_, stream_id) in removed]
+    assert all(pool._streams[stream_id].worker_id == 1 for (_, stream_id) in removed)
+
+    # Stale notifications are ignored.
+    pool._workers[0].events.put(("removed", removed[0][1], None))  # type: ignore
+    pool._handle_events()
+    assert pool._streams[removed[0][1]].worker_id == 1
+
+
+def test_closed_stream(pool: GstreamerProcessPoolCapture) -> None:
+    pool._rebalance()
+
+    error = RuntimeError("gave up")
+    pool._workers[0].events.put(("closed", 0, error))  # type: ignore
+    pool._handle_events()
+
+    assert pool._streams[0].closed
+    assert pool._streams[0].error is error
+    assert pool.stats()["streams"][0]["closed"]
+    assert _loads(pool) == [2, 2]
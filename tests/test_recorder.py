@@ -0,0 +1,79 @@
+from pathlib import Path
+from typing import List, Optional
+
+from actfw_gstreamer.gstreamer.converter import EncodedFrame
+from actfw_gstreamer.recorder import _EncodedRing
+
+SEC = 10**9
+
+
+def _frame(secs: float, keyframe: bool, size: int = 10) -> EncodedFrame:
+    pts = int(secs * SEC)
+    return EncodedFrame(b"x" * size, pts, pts, SEC // 10, keyframe, "video/x-h264")
+
+
+def _push_stream(ring: _EncodedRing, start: float, end: float, gop_secs: float = 1.0) -> None:
+    t = start
+    while t < end - 1e-9:
+        ring.push(_frame(t, keyframe=abs(t / gop_secs - round(t / gop_secs)) < 1e-9))
+        t = round(t + 0.1, 3)
+
+
+def _secs(frames: List[EncodedFrame]) -> List[Optional[float]]:
+    return [None if f.pts is None else round(f.pts / SEC, 3) for f in frames]
+
+
+def test_ring_is_keyframe_aligned() -> None:
+    ring = _EncodedRing(max_secs=2.0, max_bytes=1 << 20)
+
+    # Delta units before the first keyframe are dropped.
+    ring.push(_frame(0.9, keyframe=False))
+    _push_stream(ring, 1.0, 5.55)
+
+    frames = [f for gop in ring._gops for f in gop]
+    assert frames[0].keyframe
+    # Covers 2 secs before the newest frame, 5.5.
+    assert _secs(frames)[0] == 3.0
+    assert ring._bytes == sum(len(f.data) for f in frames)
+
+
+def test_ring_byte_limit() -> None:
+    ring = _EncodedRing(max_secs=100.0, max_bytes=250)
+    _push_stream(ring, 0.0, 5.0)
+
+    assert ring._bytes <= 250
+    assert ring._gops[0][0].keyframe
+
+
+def test_trigger_clip() -> None:
+    ring = _EncodedRing(max_secs=3.0, max_bytes=1 << 20)
+    _push_stream(ring, 0.0, 5.05)
+
+    clip = ring.trigger(pre_secs=1.5, post_secs=1.0, path=Path("clip.mp4"), at_pts=None)
+    # From the keyframe at or before 5.0 - 1.5.
+    assert _secs(clip.frames)[0] == 3.0
+    assert clip.end_pts == 6 * SEC
+
+    completed = []
+    t = 5.1
+    while not completed:
+        completed = ring.push(_frame(t, keyframe=abs(t - round(t)) < 1e-9))
+        t = round(t + 0.1, 3)
+
+    assert completed == [clip]
+    secs = _secs(clip.frames)
+    assert secs[-1] == 6.0
+    assert secs == sorted(secs)
+    assert len(secs) == 31
+    assert ring.take_pending() == []
+
+
+def test_trigger_clip_before_frames() -> None:
+    ring = _EncodedRing(max_secs=3.0, max_bytes=1 << 20)
+    clip = ring.trigger(pre_secs=1.0, post_secs=0.5, path=Path("clip.mp4"), at_pts=None)
+
+    # Starts at a keyframe.
+    assert ring.push(_frame(0.5, keyframe=False)) == []
+    _push_stream(ring, 1.0, 1.55)
+    assert _secs(clip.frames) == [1.0, 1.1, 1.2, 1.3, 1.4, 1.5]
+    assert ring.push(_frame(1.6, keyframe=False)) == [clip]
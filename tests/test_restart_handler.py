@@ -0,0 +1,97 @@
+from typing import List
+
+import pytest
+from actfw_gstreamer.gstreamer.exception import ConnectionLostError, PipelineBuildError
+from actfw_gstreamer.restart_handler import BackoffPolicy, BackoffRestartHandler, CircuitState, Restart
+
+
+class _Clock:
+    now: float
+
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr("actfw_gstreamer.restart_handler.time.monotonic", clock)
+    return clock
+
+
+def _delays(handler: BackoffRestartHandler, n: int) -> List[float]:
+    delays = []
+    for _ in range(n):
+        action = handler.connection_lost(ConnectionLostError())
+        assert isinstance(action, Restart)
+        delays.append(action.delay_secs)
+    return delays
+
+
+def test_backoff_without_jitter(clock: _Clock) -> None:
+    policy = BackoffPolicy(initial_delay_secs=1.0, max_delay_secs=5.0, jitter=0.0, max_failures=None)
+    handler = BackoffRestartHandler(10, connection_lost=policy)
+
+    assert _delays(handler, 5) == [1.0, 2.0, 4.0, 5.0, 5.0]
+    assert handler.failures() == {"pipeline_build_error": 0, "connection_lost": 5}
+    assert handler.state() == CircuitState.CLOSED
+
+
+def test_jitter_spreads_restarts(clock: _Clock) -> None:
+    policy = BackoffPolicy(initial_delay_secs=8.0, jitter=0.5, max_failures=None)
+    delays = [_delays(BackoffRestartHandler(10, connection_lost=policy, seed=seed), 1)[0] for seed in range(20)]
+
+    assert all(4.0 <= d <= 8.0 for d in delays)
+    assert len(set(delays)) == len(delays)
+
+
+def test_policies_are_separate(clock: _Clock) -> None:
+    handler = BackoffRestartHandler(
+        10,
+        pipeline_build_error=BackoffPolicy(initial_delay_secs=3.0, jitter=0.0),
+        connection_lost=BackoffPolicy(initial_delay_secs=1.0, jitter=0.0),
+    )
+
+    assert handler.pipeline_build_error(PipelineBuildError()).delay_secs == 3.0  # type: ignore
+    assert _delays(handler, 2) == [1.0, 2.0]
+    assert handler.pipeline_build_error(PipelineBuildError()).delay_secs == 6.0  # type: ignore
+
+
+def test_decay_after_healthy_streaming(clock: _Clock) -> None:
+    policy = BackoffPolicy(initial_delay_secs=1.0, jitter=0.0, max_failures=None)
+    handler = BackoffRestartHandler(10, connection_lost=policy, healthy_secs=60.0)
+
+    assert _delays(handler, 3) == [1.0, 2.0, 4.0]
+
+    # Short streaming does not reset counts.
+    handler.streaming_started()
+    clock.now += 10.0
+    assert _delays(handler, 1) == [8.0]
+
+    handler.streaming_started()
+    clock.now += 60.0
+    assert _delays(handler, 1) == [1.0]
+
+
+def test_circuit_breaker(clock: _Clock) -> None:
+    policy = BackoffPolicy(initial_delay_secs=1.0, jitter=0.0, max_failures=3)
+    handler = BackoffRestartHandler(10, connection_lost=policy, open_secs=100.0)
+
+    assert _delays(handler, 3) == [1.0, 2.0, 100.0]
+    assert handler.state() == CircuitState.OPEN
+
+    clock.now += 100.0
+    assert handler.state() == CircuitState.HALF_OPEN
+
+    # A failed trial opens the circuit again.
+    assert _delays(handler, 1) == [100.0]
+    assert handler.state() == CircuitState.OPEN
+
+    clock.now += 100.0
+    handler.streaming_started()
+    assert handler.state() == CircuitState.CLOSED
+    assert handler.failures()["connection_lost"] == 0
+    assert _delays(handler, 1) == [1.0]
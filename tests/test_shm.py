@@ -0,0 +1,222 @@
+import multiprocessing
+from typing import Iterator, List
+
+import numpy as np
+import pytest
+from actfw_gstreamer.shm import _HEADER_BYTES, _SLOT_HEADER_BYTES, ShmFrameReader, ShmFrameWriter, _slot_stride
+from PIL import Image
+
+
+@pytest.fixture
+def writer() -> Iterator[ShmFrameWriter]:
+    writer = ShmFrameWriter(slot_bytes=4 * 6 * 3, n_slots=3)
+    yield writer
+    writer.close()
+
+
+def _frame(i: int) -> np.ndarray:  # type: ignore
+    return np.full((4, 6, 3), i, dtype=np.uint8)
+
+
+def test_round_trip(writer: ShmFrameWriter) -> None:
+    with ShmFrameReader(writer.name) as reader:
+        assert reader.read(timeout_secs=0) is None
+
+        assert writer.push(_frame(1)) == 1
+        assert writer.push(Image.fromarray(_frame(2))) == 2
+
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert frame.seq == 1
+        assert frame.pts is None
+        assert frame.format == ""
+        assert frame.array.shape == (4, 6, 3)
+        assert frame.array.dtype == np.uint8
+        assert not frame.array.flags.writeable
+        assert np.array_equal(frame.array, _frame(1))
+        assert frame.is_valid()
+
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert frame.seq == 2
+        assert frame.format == "RGB"
+        assert np.array_equal(frame.array, _frame(2))
+
+        assert reader.read(timeout_secs=0.01) is None
+        assert reader.dropped() == 0
+
+
+def test_strided_frame_is_compacted(writer: ShmFrameWriter) -> None:
+    padded = np.zeros((4, 8, 3), dtype=np.uint8)
+    padded[:, :6] = _frame(7)
+    writer.push(padded[:, :6])
+
+    with ShmFrameReader(writer.name) as reader:
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert frame.array.flags.c_contiguous
+        assert np.array_equal(frame.array, _frame(7))
+
+
+def test_reader_falls_behind(writer: ShmFrameWriter) -> None:
+    with ShmFrameReader(writer.name) as reader:
+        for i in range(1, 11):
+            writer.push(_frame(i))
+
+        # Slots hold frames 8, 9 and 10.
+        seqs = []
+        while True:
+            frame = reader.read(timeout_secs=0)
+            if frame is None:
+                break
+            assert np.array_equal(frame.array, _frame(frame.seq))
+            seqs.append(frame.seq)
+        assert seqs == [8, 9, 10]
+        assert reader.dropped() == 7
+
+
+def test_late_reader(writer: ShmFrameWriter) -> None:
+    for i in range(1, 11):
+        writer.push(_frame(i))
+
+    # Frames before attaching are not counted as dropped.  Those in the ring are still read.
+    with ShmFrameReader(writer.name) as reader:
+        seqs = []
+        while True:
+            frame = reader.read(timeout_secs=0)
+            if frame is None:
+                break
+            seqs.append(frame.seq)
+        assert seqs == [8, 9, 10]
+        assert reader.dropped() == 0
+
+    with ShmFrameReader(writer.name, latest_only=True) as reader:
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert frame.seq == 10
+        assert reader.dropped() == 2
+
+
+def test_latest_only(writer: ShmFrameWriter) -> None:
+    with ShmFrameReader(writer.name, latest_only=True) as reader:
+        writer.push(_frame(1))
+        writer.push(_frame(2))
+
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert frame.seq == 2
+        assert reader.dropped() == 1
+        assert reader.read(timeout_secs=0) is None
+
+
+def test_overwritten_frame_is_invalid(writer: ShmFrameWriter) -> None:
+    with ShmFrameReader(writer.name) as reader:
+        writer.push(_frame(1))
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert np.array_equal(frame.copy(), _frame(1))  # type: ignore
+
+        for i in range(2, 5):
+            writer.push(_frame(i))
+        assert not frame.is_valid()
+        assert frame.copy() is None
+
+
+def test_attached_writer_takes_over(writer: ShmFrameWriter) -> None:
+    writer.push(_frame(1))
+    attached = ShmFrameWriter.attach(writer.name)
+    assert attached.push(_frame(2)) == 2
+    attached.close()
+
+    with ShmFrameReader(writer.name) as reader:
+        assert not reader.writer_closed()
+        seqs = []
+        while True:
+            frame = reader.read(timeout_secs=0)
+            if frame is None:
+                break
+            assert np.array_equal(frame.array, _frame(frame.seq))
+            seqs.append(frame.seq)
+        assert seqs == [1, 2]
+
+
+def test_torn_slot_is_rejected() -> None:
+    writer = ShmFrameWriter(slot_bytes=4 * 6 * 3, n_slots=3, checksum=True)
+    # Contents changed under a stable lock, as readers may see on weakly ordered CPUs.
+    writer.push(_frame(1))
+    with ShmFrameReader(writer.name, verify=True) as reader:
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        writer._buf[_HEADER_BYTES + _SLOT_HEADER_BYTES] = 2
+        assert frame.is_valid()
+        assert frame.copy() is None
+
+        writer.push(_frame(2))
+        writer._buf[_HEADER_BYTES + _slot_stride(writer._slot_bytes) + _SLOT_HEADER_BYTES] = 3
+        assert reader.read(timeout_secs=0) is None
+    writer.close()
+
+
+def test_ring_without_checksum() -> None:
+    writer = ShmFrameWriter(slot_bytes=4 * 6 * 3, n_slots=3, checksum=False)
+    writer.push(_frame(1))
+    # Readers do not verify what the writer does not write.
+    with ShmFrameReader(writer.name, verify=True) as reader:
+        frame = reader.read(timeout_secs=0)
+        assert frame is not None
+        assert np.array_equal(frame.copy(), _frame(1))  # type: ignore
+
+        writer.push(_frame(2))
+        writer.push(_frame(3))
+        writer.push(_frame(4))
+        assert frame.copy() is None
+    writer.close()
+
+
+def test_writer_errors(writer: ShmFrameWriter) -> None:
+    with pytest.raises(ValueError):
+        writer.push(np.zeros((5, 6, 3), dtype=np.uint8))
+    with pytest.raises(TypeError):
+        writer.push(b"\0" * 8)
+
+
+def test_writer_closed() -> None:
+    writer = ShmFrameWriter(slot_bytes=8)
+    reader = ShmFrameReader(writer.name)
+    writer.push(np.arange(8, dtype=np.uint8))
+    assert not reader.writer_closed()
+
+    writer.close()
+    assert reader.writer_closed()
+    frame = reader.read(timeout_secs=0)
+    assert frame is not None
+    assert np.array_equal(frame.array, np.arange(8, dtype=np.uint8))
+    del frame
+    reader.close()
+
+    with pytest.raises(FileNotFoundError):
+        ShmFrameReader(writer.name)
+
+
+def _read_in_child(name: str, n: int, queue: "multiprocessing.Queue[List[int]]") -> None:
+    with ShmFrameReader(name) as reader:
+        sums = []
+        while len(sums) < n:
+            frame = reader.read(timeout_secs=5)
+            assert frame is not None
+            sums.append(int(frame.array.sum()))
+        queue.put(sums)
+
+
+def test_reader_in_another_process(writer: ShmFrameWriter) -> None:
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    writer.push(_frame(1))
+    writer.push(_frame(2))
+    process = ctx.Process(target=_read_in_child, args=(writer.name, 2, queue))
+    process.start()
+    try:
+        assert queue.get(timeout=30) == [_frame(1).sum(), _frame(2).sum()]
+    finally:
+        process.join()
+    assert process.exitcode == 0
@@ -0,0 +1,42 @@
+from actfw_gstreamer.stats import Histogram, StreamStats
+
+
+def test_histogram() -> None:
+    h = Histogram([1.0, 2.0, 5.0])
+    for x in [0.5, 1.0, 1.5, 3.0, 10.0]:
+        h.observe(x)
+
+    snapshot = h.snapshot()
+    assert snapshot["count"] == 5
+    assert snapshot["sum"] == 16.0
+    assert snapshot["buckets"] == [[1.0, 2], [2.0, 3], [5.0, 4], [float("inf"), 5]]
+
+
+def test_stream_stats() -> None:
+    stats = StreamStats(fps_window=4)
+    assert stats.fps() == 0.0
+    assert stats.snapshot()["secs_since_last_frame"] is None
+
+    for i in range(10):
+        stats.record_frame(100.0 + 0.1 * i, 0.001, 1, 0)
+    stats.record_wait(0.05)
+    stats.record_restart("connection_lost")
+    stats.record_restart("connection_lost")
+    stats.record_restart_ttff(0.5)
+    stats.record_fault_detection(0.002)
+    stats.record_bus_warning()
+    stats.record_gated_gop()
+
+    # Last 4 frames span 0.3 secs.
+    assert abs(stats.fps() - 10.0) < 1e-6
+    snapshot = stats.snapshot()
+    assert snapshot["frames"] == 10
+    assert snapshot["dropped_appsink"] == 10
+    assert snapshot["dropped_queue"] == 0
+    assert snapshot["convert_secs"]["count"] == 10
+    assert snapshot["wait_secs"]["count"] == 1
+    assert snapshot["restarts"] == {"connection_lost": 2}
+    assert snapshot["last_restart_ttff_secs"] == 0.5
+    assert snapshot["fault_detection_secs"]["count"] == 1
+    assert snapshot["bus_warnings"] == 1
+    assert snapshot["gated_gops"] == 1